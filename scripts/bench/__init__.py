@@ -0,0 +1 @@
+"""Shared helpers for the latency benchmark scripts in this folder."""
@@ -0,0 +1,461 @@
+"""
+Backends turn a list of OpenAI style messages into one timed completion.
+
+Heavy SDKs (anthropic, vllm, transformers) are imported when a backend is built,
+so a process only pays for the ones it uses, and only once.
+"""
+
+import time
+
+from bench.clients import ClientConfig, awith_retries, compress, shared_client, with_retries
+from bench.data import content_parts, image_from_url, split_data_url
+from bench.embeddings import EmbeddingStore, expand_image_tokens, processor_kwargs
+from bench.history import content_uuid
+from bench.metrics import TurnMetrics
+from bench.payload import (
+    JSON_HEADERS,
+    ChatRequestBuilder,
+    apost_chat_completion,
+    build_timed,
+    post_chat_completion,
+)
+from bench.streaming import StreamTimer, astream_chat_completion, stream_chat_completion
+from bench.timing import TracedHTTPClient, sdk_call_timing
+
+
+class OpenAIBackend:
+    """Any OpenAI compatible /v1/chat/completions endpoint, e.g. the vLLM server from the Makefile"""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        model_name: str,
+        base_url: str,
+        stream: bool = False,
+        client=None,
+        async_client=None,
+        client_config: ClientConfig | None = None,
+    ):
+        import httpx
+
+        self.model_name = model_name
+        self.stream = stream
+        self.config = client_config or ClientConfig()
+        self.client = client or shared_client(base_url, self.config)
+        self.async_client = async_client or shared_client(
+            base_url, self.config, httpx.AsyncClient
+        )
+        self.builder = ChatRequestBuilder()
+
+    def _params(self, max_tokens: int):
+        params = {"model": self.model_name, "max_tokens": max_tokens, "temperature": 0.0}
+        if self.stream:
+            params.update(stream=True, stream_options={"include_usage": True})
+        return params
+
+    def _body(self, builder: ChatRequestBuilder, messages: list[dict], max_tokens: int):
+        """(body, headers, seconds spent serializing and compressing)"""
+        body, serialize_time = build_timed(builder, messages, **self._params(max_tokens))
+        if not self.config.gzip:
+            return body, JSON_HEADERS, serialize_time
+        start = time.perf_counter()
+        body, headers = compress(body, JSON_HEADERS)
+        return body, headers, serialize_time + time.perf_counter() - start
+
+    def complete(self, messages: list[dict], max_tokens: int) -> TurnMetrics:
+        body, headers, serialize_time = self._body(self.builder, messages, max_tokens)
+
+        def send():
+            if self.stream:
+                return stream_chat_completion(self.client, body, headers)
+            start = time.perf_counter()
+            response, timing = post_chat_completion(self.client, body, headers)
+            timing["time_to_completion"] = time.perf_counter() - start
+            return response.choices[0].message.content, response.usage, timing
+
+        (text, usage, timing), retries, retry_time = with_retries(self.config, send)
+        return TurnMetrics.from_timing(
+            text, usage, timing, serialize_time=serialize_time, retries=retries, retry_time=retry_time
+        )
+
+    async def acomplete(
+        self, messages: list[dict], max_tokens: int, builder: ChatRequestBuilder
+    ) -> TurnMetrics:
+        """async variant for many concurrent conversations, each with its own builder"""
+        body, headers, serialize_time = self._body(builder, messages, max_tokens)
+
+        async def send():
+            if self.stream:
+                return await astream_chat_completion(self.async_client, body, headers)
+            start = time.perf_counter()
+            response, timing = await apost_chat_completion(self.async_client, body, headers)
+            timing["time_to_completion"] = time.perf_counter() - start
+            return response.choices[0].message.content, response.usage, timing
+
+        (text, usage, timing), retries, retry_time = await awith_retries(self.config, send)
+        return TurnMetrics.from_timing(
+            text, usage, timing, serialize_time=serialize_time, retries=retries, retry_time=retry_time
+        )
+
+
+def to_anthropic(message: dict) -> dict:
+    """OpenAI style message -> Anthropic Messages API message"""
+    if message["role"] == "assistant":
+        return {"role": "assistant", "content": message["content"]}
+    content = []
+    for part in content_parts(message):
+        if part.get("type") == "image_url":
+            url = part["image_url"]["url"]
+            if not url:
+                continue  # blanked by a caching strategy, Anthropic has no uuid cache
+            media_type, data = split_data_url(url)
+            content.append(
+                {
+                    "type": "image",
+                    "source": {"type": "base64", "media_type": media_type, "data": data},
+                }
+            )
+        else:
+            content.append({"type": "text", "text": part["text"]})
+    return {"role": "user", "content": content}
+
+
+def wrap_prompt_caching_signature(messages: list[dict]):
+    """
+    For fairness, we use Anthropic's prompt caching to (ideally) speed up inference and save token money.
+
+    Official documentation: https://docs.claude.com/en/docs/build-with-claude/prompt-caching
+
+    Only the last message and its last block are copied; earlier messages (and their
+    base64 images) are shared with the input, which is left untouched.
+    """
+    final_message = messages[-1]
+    content = list(final_message["content"])
+    content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+    return messages[:-1] + [{**final_message, "content": content}]
+
+
+class AnthropicBackend:
+    """
+    Anthropic Messages API with prompt caching on the last user turn (was s2).
+
+    `cache_creation_input_tokens` / `cache_read_input_tokens` are recorded per turn to
+    check that caching actually hits; with `stream=True` ttft and inter-token
+    latencies are timed from the text deltas.
+    """
+
+    name = "anthropic"
+
+    def __init__(
+        self,
+        model_name: str,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        stream: bool = False,
+        client_config: ClientConfig | None = None,
+    ):
+        from anthropic import Anthropic
+
+        self.model_name = model_name
+        self.stream = stream
+        self.config = client_config or ClientConfig()
+        # not shared: last_phases must describe this backend's own last request
+        self.http_client = TracedHTTPClient(**self.config.httpx_kwargs())
+        # retries happen in bench.clients where they are counted, not in the SDK
+        self.client = Anthropic(
+            api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0
+        )
+        self._converted = {}  # id(message) -> (message, converted)
+
+    def _convert(self, messages: list[dict]) -> list[dict]:
+        converted = {}
+        for message in messages:
+            cached = self._converted.get(id(message))
+            if cached is None or cached[0] is not message:
+                cached = (message, to_anthropic(message))
+            converted[id(message)] = cached
+        self._converted = converted
+        return [converted[id(message)][1] for message in messages]
+
+    def _usage(self, usage) -> dict:
+        created = usage.cache_creation_input_tokens
+        read = usage.cache_read_input_tokens
+        return {
+            # input_tokens only counts what comes after the last cache breakpoint; the whole
+            # prompt is comparable with OpenAI's prompt_tokens
+            "prompt_tokens": usage.input_tokens + (created or 0) + (read or 0),
+            "cache_creation_input_tokens": created,
+            "cache_read_input_tokens": read,
+        }
+
+    def _create(self, anthropic_messages: list[dict], max_tokens: int, stream: bool):
+        return self.client.messages.create(
+            model=self.model_name,
+            messages=wrap_prompt_caching_signature(anthropic_messages),
+            max_tokens=max_tokens,
+            temperature=0.0,
+            stream=stream,
+        )
+
+    def complete(self, messages: list[dict], max_tokens: int) -> TurnMetrics:
+        anthropic_messages = self._convert(messages)
+        if self.stream:
+            return self._complete_streaming(anthropic_messages, max_tokens)
+
+        def send():
+            start = time.perf_counter()
+            response = self._create(anthropic_messages, max_tokens, stream=False)
+            return response, start, time.perf_counter()
+
+        (response, start, end), retries, retry_time = with_retries(self.config, send)
+        text = "".join(block.text for block in response.content if block.type == "text")
+        timing = sdk_call_timing(self.http_client, start, end)
+        timing["time_to_completion"] = end - start
+        return TurnMetrics.from_timing(
+            text,
+            None,
+            timing,
+            completion_tokens=response.usage.output_tokens,
+            retries=retries,
+            retry_time=retry_time,
+            **self._usage(response.usage),
+        )
+
+    def _complete_streaming(self, anthropic_messages: list[dict], max_tokens: int) -> TurnMetrics:
+
+        def send():
+            timer = StreamTimer()
+            return timer, self._create(anthropic_messages, max_tokens, stream=True)
+
+        # only opening the stream is retried; a failure mid-stream is the turn's error
+        (timer, events), retries, retry_time = with_retries(self.config, send)
+        text, usage, completion_tokens = [], {}, None
+        for event in events:
+            if event.type == "message_start":
+                usage = self._usage(event.message.usage)
+            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                timer.tick()
+                text.append(event.delta.text)
+            elif event.type == "message_delta":
+                completion_tokens = event.usage.output_tokens
+        timer.stop()
+        timing = {
+            **sdk_call_timing(self.http_client, timer.start, timer.end),
+            **timer.summary(completion_tokens),
+        }
+        return TurnMetrics.from_timing(
+            "".join(text),
+            None,
+            timing,
+            completion_tokens=completion_tokens,
+            retries=retries,
+            retry_time=retry_time,
+            **usage,
+        )
+
+
+def to_hf(messages: list[dict], keep_cached: bool = False):
+    """
+    OpenAI style messages -> (transformers chat messages, [(url, uuid)] per image).
+    Images blanked by a caching strategy are dropped, or with `keep_cached` kept as a
+    placeholder with url None so an engine can serve them by uuid.
+    """
+    hf_messages, images = [], []
+    for message in messages:
+        if message["role"] == "assistant":
+            hf_messages.append(
+                {"role": "assistant", "content": [{"type": "text", "text": message["content"]}]}
+            )
+            continue
+        content = []
+        for part in content_parts(message):
+            if part.get("type") == "image_url":
+                url = part["image_url"]["url"]
+                if url:
+                    images.append((url, part.get("uuid") or content_uuid(url)))
+                elif keep_cached and part.get("uuid"):
+                    images.append((None, part["uuid"]))
+                else:
+                    continue
+                content.append({"type": "image"})
+            else:
+                content.append({"type": "text", "text": part["text"]})
+        hf_messages.append({"role": "user", "content": content})
+    return hf_messages, images
+
+
+class VLLMBackend:
+    """
+    In-process vLLM engine with the multi-modal processor cache (was s4).
+
+    Prompts come from the model's own chat template with one placeholder per image
+    in history, and every image is passed with a stable uuid. Blank urls (see
+    ImageUUIDCached) are passed as None so vLLM serves them from its cache.
+    `complete_batch` steps many conversations with one `generate` call, see
+    bench.engine.run_lockstep. With an EmbeddingStore (bench.embeddings) images are
+    sent as precomputed `image_embeds` instead of pixels; images a caching strategy
+    blanked are then dropped, as embeddings have no uuid cache.
+    """
+
+    name = "vllm"
+
+    def __init__(
+        self,
+        model_name: str,
+        mm_processor_cache_gb: float = 4.0,
+        max_images: int = 128,
+        embeddings: EmbeddingStore | None = None,
+        **llm_kwargs,
+    ):
+        from transformers import AutoProcessor
+        from vllm import LLM, SamplingParams
+
+        self.model_name = model_name
+        self.sampling_params = SamplingParams
+        self.embeddings = embeddings
+        self.processor = AutoProcessor.from_pretrained(model_name, **processor_kwargs(embeddings))
+        llm_kwargs.setdefault("limit_mm_per_prompt", {"image": max_images})
+        if embeddings is not None:
+            # recent vLLM refuses embedding inputs unless asked for them
+            llm_kwargs.setdefault("enable_mm_embeds", True)
+            if embeddings.max_pixels:
+                llm_kwargs.setdefault("mm_processor_kwargs", processor_kwargs(embeddings))
+        self.llm = LLM(
+            model=model_name, mm_processor_cache_gb=mm_processor_cache_gb, **llm_kwargs
+        )
+
+    def _inputs(self, messages: list[dict]) -> dict:
+        hf_messages, images = to_hf(messages, keep_cached=self.embeddings is None)
+        prompt = self.processor.apply_chat_template(
+            hf_messages, tokenize=False, add_generation_prompt=True
+        )
+        inputs = {"prompt": prompt}
+        if images and self.embeddings is not None:
+            import torch
+
+            features = [self.embeddings.get(url) for url, _ in images]
+            inputs["multi_modal_data"] = {
+                "image": {
+                    "image_embeds": torch.cat([embeds for embeds, _ in features]),
+                    "image_grid_thw": torch.stack([grid for _, grid in features]),
+                }
+            }
+        elif images:
+            inputs["multi_modal_data"] = {
+                "image": [image_from_url(url) if url else None for url, _ in images]
+            }
+            inputs["multi_modal_uuids"] = {"image": [image_uuid for _, image_uuid in images]}
+        return inputs
+
+    def complete(self, messages: list[dict], max_tokens: int) -> TurnMetrics:
+        return self.complete_batch([messages], max_tokens)[0]
+
+    def complete_batch(self, conversations: list[list[dict]], max_tokens: int) -> list[TurnMetrics]:
+        """
+        one generate call for the next turn of every conversation; time_to_completion
+        is the wall time of the whole step, ttft comes from the engine's request stats
+        """
+        inputs, serialize_times = [], []
+        for messages in conversations:
+            start = time.perf_counter()
+            inputs.append(self._inputs(messages))
+            serialize_times.append(time.perf_counter() - start)
+        sampling_params = self.sampling_params(temperature=0.0, max_tokens=max_tokens)
+
+        start = time.perf_counter()
+        outputs = self.llm.generate(inputs, sampling_params=sampling_params, use_tqdm=False)
+        end = time.perf_counter()
+
+        return [
+            TurnMetrics(
+                response=output.outputs[0].text,
+                time_to_completion=end - start,
+                time_to_first_token=getattr(output.metrics, "first_token_latency", None),
+                prompt_tokens=len(output.prompt_token_ids),
+                completion_tokens=len(output.outputs[0].token_ids),
+                serialize_time=serialize_time,
+            )
+            for output, serialize_time in zip(outputs, serialize_times)
+        ]
+
+
+class HFBackend:
+    """
+    transformers `generate` with the model's own chat template and processor (was s5).
+    With an EmbeddingStore (bench.embeddings) the vision tower is skipped: precomputed
+    image embeddings are scattered into the prompt's input embeddings instead.
+    """
+
+    name = "hf"
+
+    def __init__(self, model_name: str, embeddings: EmbeddingStore | None = None, **model_kwargs):
+        from transformers import AutoModelForImageTextToText, AutoProcessor
+
+        model_kwargs.setdefault("torch_dtype", "auto")
+        model_kwargs.setdefault("device_map", "auto")
+        self.model_name = model_name
+        self.embeddings = embeddings
+        self.model = AutoModelForImageTextToText.from_pretrained(model_name, **model_kwargs)
+        self.processor = AutoProcessor.from_pretrained(model_name, **processor_kwargs(embeddings))
+
+    def _embedding_inputs(self, text: str, images: list) -> dict:
+        import torch
+
+        features = [self.embeddings.get(url) for url, _ in images]
+        grids = [grid for _, grid in features]
+        text = expand_image_tokens(
+            text, self.processor.image_token, grids, self.processor.image_processor.merge_size
+        )
+        inputs = self.processor.tokenizer([text], return_tensors="pt").to(self.model.device)
+        with torch.inference_mode():
+            inputs_embeds = self.model.get_input_embeddings()(inputs["input_ids"])
+            mask = (inputs["input_ids"] == self.model.config.image_token_id).unsqueeze(-1)
+            embeds = torch.cat([embeds for embeds, _ in features]).to(inputs_embeds)
+            inputs_embeds = inputs_embeds.masked_scatter(mask.expand_as(inputs_embeds), embeds)
+        # input_ids stay for the rotary positions, image_grid_thw for their image layout
+        return {
+            **inputs,
+            "inputs_embeds": inputs_embeds,
+            "image_grid_thw": torch.stack(grids).to(self.model.device),
+        }
+
+    def _inputs(self, messages: list[dict]):
+        hf_messages, images = to_hf(messages)
+        text = self.processor.apply_chat_template(
+            hf_messages, tokenize=False, add_generation_prompt=True
+        )
+        if images and self.embeddings is not None:
+            return self._embedding_inputs(text, images)
+        return self.processor(
+            text=[text],
+            images=[image_from_url(url) for url, _ in images] or None,
+            padding=True,
+            return_tensors="pt",
+        ).to(self.model.device)
+
+    def complete(self, messages: list[dict], max_tokens: int) -> TurnMetrics:
+        start = time.perf_counter()
+        inputs = self._inputs(messages)
+        preprocess_end = time.perf_counter()
+        generated_ids = self.model.generate(**inputs, max_new_tokens=max_tokens, do_sample=False)
+        end = time.perf_counter()
+
+        prompt_tokens = inputs["input_ids"].shape[1]
+        new_ids = generated_ids[0][prompt_tokens:]
+        text = self.processor.decode(
+            new_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False
+        )
+        return TurnMetrics(
+            response=text,
+            time_to_completion=end - start,
+            serialize_time=preprocess_end - start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(new_ids),
+        )
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIBackend, AnthropicBackend, VLLMBackend, HFBackend)
+}
@@ -0,0 +1,174 @@
+"""
+Explicit HTTP client construction for the OpenAI and Anthropic paths.
+
+One tuned httpx pool per (base url, config) is shared by every backend of a
+process. Retries are done here, never inside an SDK, so each one is counted on
+the turn it delayed (`retries`, `times_in_retry`) instead of silently inflating
+its latency. Together with `connection_reused` from bench.timing this lets
+cold-path and warm-path turns be told apart, and `--warmup` keeps the very first
+connection setup out of the measurements altogether.
+"""
+
+import asyncio
+import gzip
+import random
+import time
+from dataclasses import dataclass
+
+import httpx
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    max_connections: int | None = None  # None: unbounded, for load tests
+    max_keepalive_connections: int | None = None
+    keepalive_expiry_s: float = 60.0
+    connect_timeout_s: float = 10.0
+    read_timeout_s: float | None = 600.0
+    http2: bool = False  # needs httpx[http2]
+    gzip: bool = False  # request bodies; only for servers or proxies that inflate them
+    retries: int = 2
+    backoff_s: float = 0.5  # doubled per retry, with full jitter
+    backoff_max_s: float = 8.0
+
+    @classmethod
+    def from_args(cls, args) -> "ClientConfig":
+        return cls(
+            max_connections=args.max_connections,
+            max_keepalive_connections=args.max_connections,
+            keepalive_expiry_s=args.keepalive_expiry,
+            connect_timeout_s=args.connect_timeout,
+            http2=args.http2,
+            gzip=args.gzip,
+            retries=args.retries,
+            backoff_s=args.backoff,
+        )
+
+    def httpx_kwargs(self) -> dict:
+        return {
+            "timeout": httpx.Timeout(self.read_timeout_s, connect=self.connect_timeout_s),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry_s,
+            ),
+            "http2": self.http2,
+        }
+
+
+_clients = {}  # (client class, base url, config) -> client
+
+
+def shared_client(base_url: str, config: ClientConfig | None = None, client_class=httpx.Client):
+    """one pool per base url and config, so backends built for the same server share it"""
+    config = config or ClientConfig()
+    key = (client_class, base_url, config)
+    if key not in _clients:
+        _clients[key] = client_class(base_url=base_url, **config.httpx_kwargs())
+    return _clients[key]
+
+
+def add_client_arguments(parser):
+    group = parser.add_argument_group("client")
+    group.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="throwaway requests before measuring, to open connections and warm the server "
+        "(per replica and concurrently in the async scripts)",
+    )
+    group.add_argument("--max_connections", type=int, default=None)
+    group.add_argument("--keepalive_expiry", type=float, default=60.0)
+    group.add_argument("--connect_timeout", type=float, default=10.0)
+    group.add_argument(
+        "--http2", action="store_true", help="HTTP/2 connections, needs httpx[http2]"
+    )
+    group.add_argument(
+        "--gzip",
+        action="store_true",
+        help="gzip request bodies (OpenAI path; the server or a proxy must inflate them)",
+    )
+    group.add_argument(
+        "--retries", type=int, default=2, help="counted per turn, never hidden in the latency"
+    )
+    group.add_argument("--backoff", type=float, default=0.5, help="seconds before the first retry")
+    return group
+
+
+def compress(body: bytes, headers: dict) -> tuple[bytes, dict]:
+    return gzip.compress(body, compresslevel=6), {**headers, "Content-Encoding": "gzip"}
+
+
+def retryable(error: Exception) -> bool:
+    """connection failures and overload or gateway statuses, from httpx or an SDK"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code in RETRY_STATUS
+    return isinstance(error, httpx.TransportError) or type(error).__name__ in (
+        "APIConnectionError",
+        "APITimeoutError",
+    )
+
+
+def _backoff(config: ClientConfig, attempt: int) -> float:
+    return random.uniform(0, min(config.backoff_max_s, config.backoff_s * 2**attempt))
+
+
+def with_retries(config: ClientConfig, send):
+    """
+    send() until it succeeds. Returns (result, retries, seconds spent in failed
+    attempts and backoff before the attempt that succeeded)
+    """
+    start = time.perf_counter()
+    for attempt in range(config.retries + 1):
+        attempt_start = time.perf_counter()
+        try:
+            return send(), attempt, attempt_start - start if attempt else 0.0
+        except Exception as error:
+            if attempt == config.retries or not retryable(error):
+                raise
+            time.sleep(_backoff(config, attempt))
+
+
+async def awith_retries(config: ClientConfig, send):
+    """with_retries for a coroutine function"""
+    start = time.perf_counter()
+    for attempt in range(config.retries + 1):
+        attempt_start = time.perf_counter()
+        try:
+            return await send(), attempt, attempt_start - start if attempt else 0.0
+        except Exception as error:
+            if attempt == config.retries or not retryable(error):
+                raise
+            await asyncio.sleep(_backoff(config, attempt))
+
+
+WARMUP_MESSAGE = {"role": "user", "content": "Reply with OK."}
+
+
+def warm_up(backend, requests: int = 1):
+    """
+    Throwaway requests before a measured run: open the connection and let the server
+    compile / allocate. A short text prompt, so no benchmark content reaches its cache.
+    """
+    for _ in range(requests):
+        backend.complete([WARMUP_MESSAGE], max_tokens=1)
+
+
+async def awarm_up(backend, connections: int = 1):
+    """
+    warm_up for `acomplete` backends: `connections` concurrent requests per replica,
+    so that many pooled connections are open before measuring
+    """
+    from bench.payload import ChatRequestBuilder
+
+    targets = [replica.backend for replica in getattr(backend, "replicas", [])] or [backend]
+    await asyncio.gather(
+        *(
+            target.acomplete([WARMUP_MESSAGE], 1, ChatRequestBuilder())
+            for target in targets
+            for _ in range(connections)
+        )
+    )
@@ -0,0 +1,148 @@
+import base64
+import glob
+import hashlib
+import io
+import random
+from collections import OrderedDict
+
+from bench.image_cache import payload_cache
+
+IMAGE_QUESTIONS = [
+    "What do you see in this image?",
+    "Describe the content of this image concisely.",
+    "What's in the image?",
+    "Where is this image taken?",
+    "Summarize the content of this image in one sentence.",
+    "What's the main subject of this image?",
+    "What's the background of this image?",
+    "What's the color of the background?",
+    "What's the texture of the background?",
+    "How many objects can you count in this image?",
+    "What emotions or mood does this image convey?",
+    "What time of day do you think this photo was taken?",
+    "Are there any people visible in this image?",
+    "What style or genre would you classify this image as?",
+    "What details can you notice about the lighting?",
+    "What is the meaning of this image?",
+    "How would you name this image?",
+    "What do you find most interesting about this image?",
+    "What is the message of this image?",
+    "What is the moral of this image?",
+    "What did you learn from this image about B2B SaaS?",
+]
+
+TEXT_QUESTIONS = [
+    "What is the main topic of this text?",
+    "Summarize this text in one sentence.",
+    "What is the key message in this text?",
+    "What genre or type of writing is this?",
+    "What is the tone of this text?",
+    "Who is the intended audience for this text?",
+    "What emotions does this text convey?",
+    "What is the author's main argument?",
+    "What evidence does the text provide?",
+    "What conclusions can you draw from this text?",
+    "What is the most important sentence in this text?",
+    "What questions does this text raise?",
+    "What is the writing style of this text?",
+    "What themes are present in this text?",
+    "What is the purpose of this text?",
+    "What did you learn from this text?",
+    "How would you categorize this text?",
+    "What is the central idea of this text?",
+    "What perspective does this text represent?",
+    "What makes this text compelling or interesting?",
+]
+
+
+def load_image_messages(repeat=3, seed=1337, budget=None, workers=None):
+    """
+    Returns a random list of user questions about some 720p images, sent as they are
+    or resized and re-encoded to a bench.resize.ImageBudget
+    """
+    random.seed(seed)
+    img_paths = sorted(glob.glob("data/test-img-*.jpg"))
+    if budget is not None:
+        payload_cache.prepare(img_paths, budget, workers=workers)
+    questions = list(IMAGE_QUESTIONS)
+
+    img_paths = img_paths * repeat
+    questions = questions * repeat
+
+    random.shuffle(img_paths)
+    random.shuffle(questions)
+
+    user_messages = []
+    for image, question in zip(img_paths, questions):
+        # shared across repeats, runs and scripts; see bench/image_cache.py
+        img_url = payload_cache.data_url(image, budget=budget)
+        user_messages.append(
+            {
+                "role": "user",
+                "content": [
+                    {"type": "image_url", "image_url": {"url": img_url}},
+                    {"type": "text", "text": question},
+                ],
+            }
+        )
+    return user_messages
+
+
+def load_text_messages(repeat=3, seed=1337):
+    """Returns a random list of user questions about some 1000+ token texts"""
+    random.seed(seed)
+    txt_paths = sorted(glob.glob("data/test-txt-*.txt"))
+    texts = []
+    for txt_path in txt_paths:
+        with open(txt_path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+    questions = list(TEXT_QUESTIONS)
+
+    texts = texts * repeat
+    questions = questions * repeat
+
+    random.shuffle(texts)
+    random.shuffle(questions)
+
+    user_messages = []
+    for text, question in zip(texts, questions):
+        user_messages.append(
+            {"role": "user", "content": f"{text}\n\n --- \n\n{question}"}
+        )
+    return user_messages
+
+
+LOADERS = {"image": load_image_messages, "text": load_text_messages}
+
+
+def content_parts(message: dict) -> list[dict]:
+    """message content as a list of OpenAI style parts, plain strings become one text part"""
+    content = message["content"]
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return content
+
+
+def split_data_url(url: str):
+    """'data:image/jpeg;base64,XXXX' -> ('image/jpeg', 'XXXX')"""
+    header, data = url.split(",", 1)
+    return header[len("data:") : -len(";base64")], data
+
+
+IMAGE_CACHE_SIZE = 128  # decoded images kept, as many as a vLLM prompt takes by default
+_images = OrderedDict()  # sha256 of the data url -> PIL image, for in-process backends
+
+
+def image_from_url(url: str):
+    """decodes a data URL into a PIL image; the last IMAGE_CACHE_SIZE distinct images are kept"""
+    key = hashlib.sha256(url.encode()).digest()
+    if key in _images:
+        _images.move_to_end(key)
+        return _images[key]
+    from PIL import Image
+
+    _, data = split_data_url(url)
+    image = _images[key] = Image.open(io.BytesIO(base64.b64decode(data))).convert("RGB")
+    if len(_images) > IMAGE_CACHE_SIZE:
+        _images.popitem(last=False)
+    return image
@@ -0,0 +1,408 @@
+"""
+Conversations as lazy iterators of user messages.
+
+`load_image_messages` builds every turn up front from 20 bundled images, so the
+vision encoder and any image cache see a tiny working set. A Dataset instead
+yields one turn at a time: nothing is read, generated or base64 encoded before
+its turn is sent, and only what the history strategy keeps stays in memory.
+A Dataset is also a `build_messages(seed)` callable for s7 / s14.
+"""
+
+import abc
+import base64
+import glob
+import inspect
+import io
+import json
+import mimetypes
+import os
+import random
+
+import numpy as np
+
+from bench.data import IMAGE_QUESTIONS, LOADERS, TEXT_QUESTIONS
+from bench.image_cache import payload_cache
+from bench.resize import MEDIA_TYPES
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+WORDS = (
+    "latency image model token cache server request prefill decode batch vision "
+    "encoder history turn user answer question network payload memory queue"
+).split()
+
+
+def image_message(image_url: str, question: str) -> dict:
+    return {
+        "role": "user",
+        "content": [
+            {"type": "image_url", "image_url": {"url": image_url}},
+            {"type": "text", "text": question},
+        ],
+    }
+
+
+def text_message(text: str, question: str) -> dict:
+    return {"role": "user", "content": f"{text}\n\n --- \n\n{question}" if text else question}
+
+
+def file_data_url(path: str, budget=None) -> str:
+    """data url of an image file, through the payload cache but not kept in memory"""
+    media_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+    return payload_cache.data_url(path, media_type, budget=budget, memo=False)
+
+
+class Dataset(abc.ABC):
+    """one conversation per seed, yielded lazily by `messages(seed)`"""
+
+    name = ""
+
+    @abc.abstractmethod
+    def messages(self, seed: int):
+        """iterator of the user messages of the conversation for `seed`"""
+
+    def __call__(self, seed: int):
+        return self.messages(seed)
+
+    def label(self) -> str:
+        """config value recorded in the results store"""
+        return self.name
+
+
+class Bundled(Dataset):
+    """the repo's 20 images or texts, `repeat` times shuffled (LOADERS)"""
+
+    def __init__(self, kind: str = "image", repeat: int = 3):
+        self.name = kind
+        self.repeat = repeat
+
+    def messages(self, seed):
+        return iter(LOADERS[self.name](repeat=self.repeat, seed=seed))
+
+
+class Directory(Dataset):
+    """
+    Images (and optionally .txt passages) found under a directory of any size.
+    Each conversation samples `turns` of them; a turn carries an image with
+    probability `image_ratio`, otherwise a text passage (or just a question).
+    Files are read when their turn comes up, through the on-disk payload cache.
+    """
+
+    name = "dir"
+
+    def __init__(self, path: str, turns: int = 60, image_ratio: float = 1.0, budget=None):
+        self.path = path
+        self.turns = turns
+        self.image_ratio = image_ratio
+        self.budget = budget
+        files = sorted(glob.glob(os.path.join(path, "**", "*"), recursive=True))
+        self.images = [f for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+        self.texts = [f for f in files if f.lower().endswith(".txt")]
+        if not self.images and image_ratio > 0:
+            raise ValueError(f"no images under {path}")
+
+    def label(self):
+        return f"dir:{os.path.basename(os.path.normpath(self.path))}:r{self.image_ratio:g}"
+
+    def _pick(self, rng: random.Random, files: list[str]):
+        """draws without replacement within a conversation while the directory lasts"""
+        order = rng.sample(range(len(files)), len(files))
+        while True:
+            for index in order:
+                yield files[index]
+            rng.shuffle(order)
+
+    def messages(self, seed):
+        rng = random.Random(seed)
+        images = self._pick(rng, self.images) if self.images else None
+        texts = self._pick(rng, self.texts) if self.texts else None
+        for _ in range(self.turns):
+            if rng.random() < self.image_ratio:
+                yield image_message(
+                    file_data_url(next(images), self.budget), rng.choice(IMAGE_QUESTIONS)
+                )
+            else:
+                text = ""
+                if texts is not None:
+                    with open(next(texts), encoding="utf-8") as f:
+                        text = f.read()
+                yield text_message(text, rng.choice(TEXT_QUESTIONS))
+
+
+def synthetic_image(
+    rng: np.random.Generator, width: int, height: int, entropy: float
+) -> np.ndarray:
+    """
+    uint8 RGB image whose compressibility is set by `entropy` in [0, 1]: 0 is a
+    smooth color field, 1 is independent per-pixel noise, in between a blend
+    """
+    from PIL import Image
+
+    coarse = Image.fromarray(rng.integers(0, 256, (4, 4, 3), dtype=np.uint8))
+    pixels = np.asarray(coarse.resize((width, height), Image.BILINEAR), dtype=np.float32)
+    if entropy > 0:
+        noise = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        pixels = (1 - entropy) * pixels + entropy * noise
+    return pixels.astype(np.uint8)
+
+
+def synthetic_image_url(
+    rng: np.random.Generator,
+    width: int,
+    height: int,
+    entropy: float = 0.5,
+    format: str = "jpeg",
+    quality: int = 85,
+) -> str:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    pixels = synthetic_image(rng, width, height, entropy)
+    Image.fromarray(pixels).save(buffer, format=format.upper(), quality=quality)
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f"data:{MEDIA_TYPES[format]};base64,{data}"
+
+
+def filler_text(rng: random.Random, chars: int) -> str:
+    """about `chars` characters of filler words"""
+    words = rng.choices(WORDS, k=max(1, chars // 7))  # ~7 characters per word and space
+    return " ".join(words)[:chars]
+
+
+class Synthetic(Dataset):
+    """
+    Images generated on the fly at a given resolution and entropy, a fresh one per
+    turn and seed, so the working set is as large as the number of turns sent.
+    Text turns (1 - image_ratio of them) carry ~text_tokens of filler words.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        width: int = 1280,
+        height: int = 720,
+        entropy: float = 0.5,
+        turns: int = 60,
+        image_ratio: float = 1.0,
+        text_tokens: int = 256,
+        format: str = "jpeg",
+        quality: int = 85,
+    ):
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"format must be one of {sorted(MEDIA_TYPES)}")
+        self.width = width
+        self.height = height
+        self.entropy = entropy
+        self.turns = turns
+        self.image_ratio = image_ratio
+        self.text_tokens = text_tokens
+        self.format = format
+        self.quality = quality
+
+    def label(self):
+        return (
+            f"synthetic:{self.width}x{self.height}:e{self.entropy:g}:r{self.image_ratio:g}"
+            f":{self.format}-q{self.quality}"
+        )
+
+    def image_url(self, rng: np.random.Generator) -> str:
+        return synthetic_image_url(
+            rng, self.width, self.height, self.entropy, self.format, self.quality
+        )
+
+    def messages(self, seed):
+        rng = random.Random(seed)
+        pixels = np.random.default_rng(seed)
+        for _ in range(self.turns):
+            if rng.random() < self.image_ratio:
+                yield image_message(self.image_url(pixels), rng.choice(IMAGE_QUESTIONS))
+            else:
+                # ~4 characters per token, like history.TokenBudget's estimate
+                text = filler_text(rng, self.text_tokens * 4)
+                yield text_message(text, rng.choice(TEXT_QUESTIONS))
+
+
+def paint_panels(rng: np.random.Generator, frame: np.ndarray, count: int, box=None):
+    """flat rectangles with a few dark text-like lines, a UI in broad strokes, in place"""
+    top, left, bottom, right = box or (0, 0, *frame.shape[:2])
+    for _ in range(count):
+        y0, y1 = np.sort(rng.integers(top, bottom, 2))
+        x0, x1 = np.sort(rng.integers(left, right, 2))
+        frame[y0 : y1 + 1, x0 : x1 + 1] = rng.integers(0, 256, 3, dtype=np.uint8)
+        for y in range(y0 + 6, y1 - 4, 12):
+            frame[y : y + 3, x0 + 4 : x0 + 4 + (x1 - x0) * 2 // 3] = 32
+    return frame
+
+
+class Screen(Dataset):
+    """
+    A screen recording, as in agentic screen workflows: a synthetic UI frame that
+    mostly stays put. Each turn, with probability `change`, a region of `region`
+    times the frame's width and height is repainted somewhere. `jitter` adds up to
+    that many levels of capture noise to every frame, so unchanged frames are near
+    rather than exact duplicates.
+    """
+
+    name = "screen"
+
+    def __init__(
+        self,
+        width: int = 1280,
+        height: int = 720,
+        turns: int = 60,
+        change: float = 0.3,
+        region: float = 0.1,
+        jitter: int = 0,
+        format: str = "jpeg",
+        quality: int = 85,
+    ):
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"format must be one of {sorted(MEDIA_TYPES)}")
+        self.width = width
+        self.height = height
+        self.turns = turns
+        self.change = change
+        self.region = region
+        self.jitter = jitter
+        self.format = format
+        self.quality = quality
+
+    def label(self):
+        return (
+            f"screen:{self.width}x{self.height}:c{self.change:g}:s{self.region:g}"
+            f":j{self.jitter}:{self.format}-q{self.quality}"
+        )
+
+    def frames(self, seed):
+        """the uint8 RGB frames of a conversation, one per turn"""
+        rng = np.random.default_rng(seed)
+        frame = np.full((self.height, self.width, 3), 240, dtype=np.uint8)
+        paint_panels(rng, frame, 12)
+        h, w = max(1, int(self.height * self.region)), max(1, int(self.width * self.region))
+        for turn in range(self.turns):
+            if turn and rng.random() < self.change:
+                y, x = rng.integers(0, self.height - h + 1), rng.integers(0, self.width - w + 1)
+                paint_panels(rng, frame, 3, (y, x, y + h, x + w))
+            if self.jitter:
+                noise = rng.integers(-self.jitter, self.jitter + 1, frame.shape, dtype=np.int16)
+                yield (frame + noise).clip(0, 255).astype(np.uint8)
+            else:
+                yield frame.copy()
+
+    def messages(self, seed):
+        from PIL import Image
+
+        rng = random.Random(seed)
+        for frame in self.frames(seed):
+            buffer = io.BytesIO()
+            Image.fromarray(frame).save(buffer, format=self.format.upper(), quality=self.quality)
+            data = base64.b64encode(buffer.getvalue()).decode("ascii")
+            yield image_message(f"data:{MEDIA_TYPES[self.format]};base64,{data}", rng.choice(IMAGE_QUESTIONS))
+
+
+class Trace(Dataset):
+    """
+    Conversations recorded as JSONL or Parquet, one row per user turn, in order:
+
+        {"conversation": "c1", "text": "What is this?", "image": "frames/001.jpg"}
+
+    `image` is optional and may be a path (relative to the trace file), a data url
+    or an http(s) url. Seed k replays the k-th conversation of the file (modulo the
+    number of conversations); rows are read when their turn comes up.
+    """
+
+    name = "trace"
+
+    def __init__(self, path: str, budget=None):
+        self.path = path
+        self.budget = budget
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.parquet = path.endswith(".parquet") or os.path.isdir(path)
+        if self.parquet:
+            import pyarrow.compute as pc
+            import pyarrow.dataset as ds
+
+            self.dataset = ds.dataset(path)
+            column = self.dataset.to_table(columns=["conversation"])["conversation"]
+            self.conversations = pc.unique(column).to_pylist()
+        else:
+            self.offsets = {}  # conversation -> byte offsets of its rows
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self.offsets.setdefault(row["conversation"], []).append(offset)
+                    offset += len(line)
+            self.conversations = list(self.offsets)
+        if not self.conversations:
+            raise ValueError(f"no conversations in {path}")
+
+    def label(self):
+        return f"trace:{os.path.basename(os.path.normpath(self.path))}"
+
+    def rows(self, conversation):
+        if self.parquet:
+            import pyarrow.dataset as ds
+
+            batches = self.dataset.to_batches(filter=ds.field("conversation") == conversation)
+            for batch in batches:
+                yield from batch.to_pylist()
+            return
+        with open(self.path, "rb") as f:
+            for offset in self.offsets[conversation]:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def message(self, row: dict) -> dict:
+        image, text = row.get("image"), row.get("text") or ""
+        if not image:
+            return {"role": "user", "content": text}
+        if not image.startswith(("data:", "http://", "https://")):
+            image = file_data_url(os.path.join(self.root, image), self.budget)
+        return image_message(image, text)
+
+    def messages(self, seed):
+        conversation = self.conversations[seed % len(self.conversations)]
+        for row in self.rows(conversation):
+            yield self.message(row)
+
+
+DATASETS = {
+    "image": lambda repeat=3: Bundled("image", repeat),
+    "text": lambda repeat=3: Bundled("text", repeat),
+    "dir": Directory,
+    "synthetic": Synthetic,
+    "screen": Screen,
+    "trace": Trace,
+}
+
+
+def _value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def make_dataset(spec: str, **defaults) -> Dataset:
+    """
+    'synthetic:entropy=0.9:image_ratio=0.5', 'dir:/data/frames:turns=100', 'image:5'
+    -> Dataset; arguments after the name are positional or key=value. `defaults`
+    (e.g. repeat, budget) fill in what the spec leaves out and the dataset accepts.
+    """
+    name, *parts = spec.split(":")
+    if name not in DATASETS:
+        raise ValueError(f"unknown dataset {name!r}, one of {sorted(DATASETS)}")
+    args = [_value(part) for part in parts if "=" not in part]
+    kwargs = dict(part.split("=", 1) for part in parts if "=" in part)
+    kwargs = {key: _value(value) for key, value in kwargs.items()}
+    factory = DATASETS[name]
+    accepted = inspect.signature(factory).parameters
+    positional = list(accepted)[: len(args)]
+    for key, value in defaults.items():
+        if key in accepted and key not in kwargs and key not in positional:
+            kwargs[key] = value
+    return factory(*args, **kwargs)
@@ -0,0 +1,183 @@
+"""
+Cache keys for image content rather than image files or payload bytes.
+
+Two images get the same key when they are
+
+    exact  the same decoded pixels, whatever the file name or encoding
+    near   within `threshold` bits (Hamming distance) of each other's 64-bit
+           perceptual hash (pHash: signs of the low 8x8 DCT coefficients of a
+           32x32 grayscale thumbnail), and no thumbnail pixel more than
+           `tolerance` gray levels apart, e.g. re-encoded or noisy captures
+
+The pHash only sees low frequencies: on the screen dataset a changed panel of up
+to ~10% of the frame is often 0-2 bits away from the frame before. The thumbnail
+check is what tells such a change (several levels on the pixels it covers) from
+encoder noise (at most 1), so raising `tolerance` trades missed changes for hits.
+
+A key is the uuid vLLM's multi-modal cache is addressed by, so a near duplicate
+is served from the encoder cache. With `substitute`, the earlier image's url is
+sent in its place, which also lets backends without uuids (and prefix caching)
+see identical content. The new images of one `assign` call, e.g. a turn's, are
+hashed together with one DCT.
+"""
+
+import base64
+import hashlib
+import io
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+
+from bench.data import split_data_url
+from bench.history import content_uuid
+
+HASH_SIZE = 8
+THUMBNAIL = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """orthonormal DCT-II basis, rows are frequencies"""
+    k, i = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    basis = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    basis[0] /= np.sqrt(2)
+    return basis
+
+
+_DCT = _dct_matrix(THUMBNAIL)[:HASH_SIZE]
+
+
+def thumbnails(images: list) -> np.ndarray:
+    """PIL images -> (n, 32, 32) float32 grayscale"""
+    from PIL import Image
+
+    return np.stack(
+        [
+            np.asarray(image.convert("L").resize((THUMBNAIL, THUMBNAIL), Image.BILINEAR), dtype=np.float32)
+            for image in images
+        ]
+    )
+
+
+def phash(thumbs: np.ndarray) -> np.ndarray:
+    """(n, 32, 32) thumbnails -> (n,) uint64 perceptual hashes, one 2D DCT for the batch"""
+    coefficients = np.einsum("ki,nij,lj->nkl", _DCT, thumbs, _DCT).reshape(len(thumbs), -1)
+    # the DC term only carries overall brightness, it is left out of the median
+    bits = coefficients > np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8")[:, 0].astype(np.uint64)
+
+
+def hamming(hashes: np.ndarray, other) -> np.ndarray:
+    """bits that differ between each of `hashes` and `other`"""
+    xor = np.bitwise_xor(hashes, np.uint64(other))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def decode(url: str):
+    """data url -> RGB PIL image, not kept (bench.data.image_from_url keeps recent ones)"""
+    from PIL import Image
+
+    return Image.open(io.BytesIO(base64.b64decode(split_data_url(url)[1]))).convert("RGB")
+
+
+def pixel_digest(image) -> str:
+    return hashlib.blake2b(image.tobytes(), digest_size=16, person=image.mode.encode()).hexdigest()
+
+
+@dataclass
+class Match:
+    key: str  # cache key (uuid) assigned to the image
+    url: str  # the url to send: the image's own, or with substitution the earlier one
+    kind: str  # "new", "exact" or "near"
+    distance: int = 0  # pHash bits from the image it matched
+
+
+class ImageIndex:
+    """
+    Every image seen so far, by url, pixels and perceptual hash. `assign` gives each
+    new image the key of the first earlier one it duplicates, or a key of its own.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 4,
+        tolerance: float = 1.0,
+        substitute: bool = False,
+        namespace: str = "",
+    ):
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.substitute = substitute
+        # keys of another namespace never collide, so runs sharing a server stay independent
+        self.namespace = namespace
+        self._by_url = {}  # data url -> Match of its first occurrence
+        self._by_pixels = {}  # pixel digest -> index into the arrays below
+        # preallocated and doubled when full; the first len(self._keys) rows are used
+        self._hash_buffer = np.zeros(64, dtype=np.uint64)
+        self._thumb_buffer = np.zeros((64, THUMBNAIL, THUMBNAIL), dtype=np.float32)
+        self._keys, self._urls = [], []
+        self.counts = {"new": 0, "exact": 0, "near": 0}
+
+    @property
+    def _hashes(self) -> np.ndarray:
+        return self._hash_buffer[: len(self._keys)]
+
+    @property
+    def _thumbs(self) -> np.ndarray:
+        return self._thumb_buffer[: len(self._keys)]
+
+    def _add(self, image_hash, thumb, key: str, url: str) -> int:
+        index = len(self._keys)
+        if index == len(self._hash_buffer):
+            self._hash_buffer = np.concatenate([self._hash_buffer, np.zeros_like(self._hash_buffer)])
+            self._thumb_buffer = np.concatenate([self._thumb_buffer, np.zeros_like(self._thumb_buffer)])
+        self._hash_buffer[index] = image_hash
+        self._thumb_buffer[index] = thumb
+        self._keys.append(key)
+        self._urls.append(url)
+        return index
+
+    def _match(self, url: str, digest: str, image_hash, thumb) -> Match:
+        if digest in self._by_pixels:
+            index = self._by_pixels[digest]
+            return Match(self._keys[index], self._urls[index], "exact")
+        if len(self._hashes):
+            distances = hamming(self._hashes, image_hash)
+            candidates = np.flatnonzero(distances <= self.threshold)
+            if len(candidates):
+                change = np.abs(self._thumbs[candidates] - thumb).max(axis=(1, 2))
+                close = candidates[change <= self.tolerance]
+                if len(close):
+                    index = int(close[np.argmin(distances[close])])
+                    return Match(self._keys[index], self._urls[index], "near", int(distances[index]))
+        key = content_uuid(url)
+        if self.namespace:
+            key = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.namespace}:{key}"))
+        self._by_pixels[digest] = self._add(image_hash, thumb, key, url)
+        return Match(key, url, "new")
+
+    def assign(self, urls: list[str]) -> list[Match]:
+        """one Match per data url; images not seen before are decoded and hashed as a batch"""
+        fresh = list(dict.fromkeys(url for url in urls if url not in self._by_url))
+        if fresh:
+            images = [decode(url) for url in fresh]
+            thumbs = thumbnails(images)
+            for url, image, image_hash, thumb in zip(fresh, images, phash(thumbs), thumbs):
+                self._by_url[url] = self._match(url, pixel_digest(image), image_hash, thumb)
+        matches, first = [], set(fresh)
+        for url in urls:
+            match = self._by_url[url]
+            if url in first:
+                first.discard(url)
+            else:  # the very same payload again
+                match = Match(match.key, match.url, "exact")
+            self.counts[match.kind] += 1
+            if not self.substitute:
+                match = Match(match.key, url, match.kind, match.distance)
+            matches.append(match)
+        return matches
+
+    def hit_rate(self) -> float:
+        """share of images whose key was already known: what an encoder cache could serve"""
+        total = sum(self.counts.values())
+        return (self.counts["exact"] + self.counts["near"]) / total if total else float("nan")
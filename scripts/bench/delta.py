@@ -0,0 +1,138 @@
+"""
+Frame deltas for conversations about a mostly static screen.
+
+The frame is cut into the 28px blocks Qwen2.5-VL makes one visual token each (see
+bench.resize). A block has changed when its pixels differ from what the model last
+saw by more than `tolerance` levels on average, which stays above capture noise and
+JPEG artifacts but catches a changed line of text. Changed blocks are grouped into
+8-connected regions, padded by a block and merged where they overlap; each region
+is then sent as a crop on the same grid, so it costs exactly its blocks in tokens.
+"""
+
+import base64
+import io
+from collections import deque
+
+import numpy as np
+
+from bench.data import split_data_url
+from bench.resize import MEDIA_TYPES, PATCH, smart_resize, visual_tokens
+
+BLOCK = PATCH
+
+
+def block_changes(frame: np.ndarray, reference: np.ndarray, block: int = BLOCK) -> np.ndarray:
+    """(rows, cols) mean absolute difference per block; partial blocks at the edges count"""
+    diff = np.abs(frame.astype(np.int16) - reference.astype(np.int16)).mean(axis=2)
+    rows, cols = -(-diff.shape[0] // block), -(-diff.shape[1] // block)
+    padded = np.zeros((rows * block, cols * block), dtype=np.float32)
+    padded[: diff.shape[0], : diff.shape[1]] = diff
+    return padded.reshape(rows, block, cols, block).mean(axis=(1, 3))
+
+
+def regions(mask: np.ndarray, pad: int = 1) -> list[tuple[int, int, int, int]]:
+    """bounding boxes (top, left, bottom, right; in blocks, exclusive) of the changed areas"""
+    rows, cols = mask.shape
+    seen = np.zeros_like(mask, dtype=bool)
+    boxes = []
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue, box = deque([start]), [start[0], start[1], start[0] + 1, start[1] + 1]
+        while queue:
+            y, x = queue.popleft()
+            box = [min(box[0], y), min(box[1], x), max(box[2], y + 1), max(box[3], x + 1)]
+            for ny in range(max(0, y - 1), min(rows, y + 2)):
+                for nx in range(max(0, x - 1), min(cols, x + 2)):
+                    if mask[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        queue.append((ny, nx))
+        boxes.append((max(0, box[0] - pad), max(0, box[1] - pad), min(rows, box[2] + pad), min(cols, box[3] + pad)))
+    return merge_boxes(boxes)
+
+
+def merge_boxes(boxes: list) -> list:
+    """unions of overlapping boxes, until none overlap"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(boxes)
+
+
+def decode_frame(url: str) -> tuple[np.ndarray, str]:
+    """data url -> (uint8 RGB array, media type)"""
+    from PIL import Image
+
+    media_type, data = split_data_url(url)
+    with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+        return np.asarray(image.convert("RGB")), media_type
+
+
+def encode_frame(pixels: np.ndarray, media_type: str, quality: int = 85) -> str:
+    """uint8 RGB array -> data url"""
+    from PIL import Image
+
+    image_format = {v: k for k, v in MEDIA_TYPES.items()}.get(media_type, "png")
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(pixels)).save(buffer, format=image_format.upper(), quality=quality)
+    return f"data:{MEDIA_TYPES[image_format]};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def image_payload(message: dict) -> tuple[int, int, int]:
+    """(images, base64 bytes, visual tokens) of a message's image parts, sizes read from headers"""
+    from PIL import Image
+
+    images = size = tokens = 0
+    content = message["content"]
+    for part in content if isinstance(content, list) else []:
+        if part.get("type") != "image_url" or not part["image_url"]["url"]:
+            continue
+        data = split_data_url(part["image_url"]["url"])[1]
+        with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+            tokens += visual_tokens(*smart_resize(image.height, image.width, None))
+        images += 1
+        size += len(data)
+    return images, size, tokens
+
+
+class FrameDelta:
+    """
+    What the model has seen of the screen so far, and what of a new frame it has not:
+    `update` returns the changed boxes in pixels (top, left, bottom, right), or None
+    when more than `max_area` of the frame changed and it should be sent whole
+    """
+
+    def __init__(self, max_area: float = 0.25, tolerance: float = 4.0):
+        self.max_area = max_area
+        self.tolerance = tolerance
+        self.view = None
+
+    def update(self, frame: np.ndarray):
+        if self.view is None or self.view.shape != frame.shape:
+            self.view = frame.copy()
+            return None
+        mask = block_changes(frame, self.view) > self.tolerance
+        height, width = frame.shape[:2]
+        boxes = [
+            (top * BLOCK, left * BLOCK, min(height, bottom * BLOCK), min(width, right * BLOCK))
+            for top, left, bottom, right in regions(mask)
+        ]
+        area = sum((bottom - top) * (right - left) for top, left, bottom, right in boxes)
+        if area > self.max_area * height * width:
+            self.view = frame.copy()
+            return None
+        for top, left, bottom, right in boxes:
+            self.view[top:bottom, left:right] = frame[top:bottom, left:right]
+        return boxes
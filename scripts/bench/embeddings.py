@@ -0,0 +1,128 @@
+"""
+Precomputed vision-encoder embeddings, so each unique image goes through the vision
+tower once instead of on every turn and session that shows it again.
+
+Embeddings live under `<cache_dir>/embeddings/<model>/<sha256 of data url>.safetensors`,
+next to bench.image_cache's payloads, one file per image holding its visual tokens
+(`embeds`, [tokens, hidden]) and its patch grid (`grid_thw`, [3]). They are read
+memory-mapped and kept per process, so a repeated image costs a dict lookup.
+
+Written for the Qwen2-VL family (Qwen2-VL, Qwen2.5-VL), whose processor returns
+`image_grid_thw` and whose vLLM models accept `image_embeds`. Embeddings depend on
+the processor's pixel limits, so those are part of the store's directory.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from bench.data import content_parts, image_from_url
+from bench.image_cache import DEFAULT_CACHE_DIR
+
+
+def url_digest(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def unique_image_urls(conversations) -> list[str]:
+    """image data urls of the user messages of `conversations`, first occurrence order"""
+    urls = {}
+    for messages in conversations:
+        for message in messages:
+            for part in content_parts(message):
+                if part.get("type") == "image_url" and part["image_url"]["url"]:
+                    urls.setdefault(url_digest(part["image_url"]["url"]), part["image_url"]["url"])
+    return list(urls.values())
+
+
+class EmbeddingStore:
+    def __init__(self, model_name: str, max_pixels: int | None = None, cache_dir: str = DEFAULT_CACHE_DIR):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "--", model_name)
+        if max_pixels:
+            slug += f"--max_pixels={max_pixels}"
+        self.model_name = model_name
+        self.max_pixels = max_pixels
+        self.root = os.path.join(cache_dir, "embeddings", slug)
+        self._digests = {}  # data url -> sha256 hex
+        self._loaded = {}  # sha256 hex -> (embeds, grid_thw)
+
+    def path(self, url: str) -> str:
+        if url not in self._digests:
+            self._digests[url] = url_digest(url)
+        return os.path.join(self.root, f"{self._digests[url]}.safetensors")
+
+    def __contains__(self, url: str) -> bool:
+        return os.path.exists(self.path(url))
+
+    def put(self, url: str, embeds, grid_thw):
+        from safetensors.torch import save_file
+
+        path = self.path(url)
+        os.makedirs(self.root, exist_ok=True)
+        tensors = {"embeds": embeds.detach().cpu().contiguous(), "grid_thw": grid_thw.cpu()}
+        # write then rename, so a concurrent reader never sees half a file
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        save_file(tensors, tmp)
+        os.replace(tmp, path)
+
+    def get(self, url: str):
+        """(embeds [tokens, hidden], grid_thw [3]) of a precomputed image"""
+        path = self.path(url)
+        digest = self._digests[url]
+        if digest not in self._loaded:
+            from safetensors import safe_open
+
+            if not os.path.exists(path):
+                raise KeyError(
+                    f"no embedding for image {digest[:12]} in {self.root}, "
+                    "precompute it with scripts/s5_image_embed_input.py"
+                )
+            with safe_open(path, framework="pt", device="cpu") as f:
+                self._loaded[digest] = (f.get_tensor("embeds"), f.get_tensor("grid_thw"))
+        return self._loaded[digest]
+
+
+def processor_kwargs(store: "EmbeddingStore | None") -> dict:
+    """what AutoProcessor.from_pretrained needs to see images as the store did"""
+    return {"max_pixels": store.max_pixels} if store is not None and store.max_pixels else {}
+
+
+def expand_image_tokens(text: str, image_token: str, grids: list, merge_size: int) -> str:
+    """one image placeholder -> as many as the image has visual tokens, like the processor does"""
+    parts = text.split(image_token)
+    if len(parts) != len(grids) + 1:
+        raise ValueError(f"{len(parts) - 1} image placeholders for {len(grids)} images")
+    counts = [int(grid.prod()) // merge_size**2 for grid in grids]
+    return parts[0] + "".join(image_token * n + part for n, part in zip(counts, parts[1:]))
+
+
+def image_features(model, pixel_values, grid_thw) -> list:
+    """the vision tower (and merger) on a batch of images -> one [tokens, hidden] per image"""
+    import torch
+
+    pixel_values = pixel_values.to(model.device, model.dtype)
+    grid_thw = grid_thw.to(model.device)
+    with torch.inference_mode():
+        embeds = model.get_image_features(pixel_values, grid_thw)
+    if torch.is_tensor(embeds):  # older transformers return them concatenated
+        merge = model.config.vision_config.spatial_merge_size
+        embeds = torch.split(embeds, (grid_thw.prod(-1) // merge**2).tolist())
+    return list(embeds)
+
+
+def precompute(model, processor, store: EmbeddingStore, urls: list[str], batch_size: int = 8) -> int:
+    """encodes the images of `urls` missing from `store`, `batch_size` at a time; returns how many"""
+    missing = [url for url in urls if url not in store]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        inputs = processor.image_processor(
+            images=[image_from_url(url) for url in batch], return_tensors="pt"
+        )
+        grid_thw = inputs["image_grid_thw"]
+        for url, embeds, grid in zip(
+            batch, image_features(model, inputs["pixel_values"], grid_thw), grid_thw
+        ):
+            store.put(url, embeds, grid)
+    return len(missing)
@@ -0,0 +1,136 @@
+import itertools
+
+from bench.history import FullHistory
+from bench.metrics import TurnMetrics
+from bench.payload import ChatRequestBuilder
+from bench.steady import flag_turns
+
+
+def report_turn(metrics: TurnMetrics):
+    i = metrics.turn
+    print(f"Turn {i} Time to completion: {metrics.time_to_completion:.3f}s")
+    if metrics.time_to_first_token is not None:
+        print(f"Turn {i} Time to first token: {metrics.time_to_first_token:.3f}s")
+    if metrics.request_bytes is not None and metrics.server_time is not None:
+        print(
+            f"Turn {i} Request: {metrics.request_bytes / 1e6:.2f}MB, "
+            f"upload {metrics.upload_time:.3f}s, server {metrics.server_time:.3f}s"
+        )
+    if metrics.server_prefill_time is not None:
+        hit_rate = metrics.prefix_cache_hit_rate
+        print(
+            f"Turn {i} Server: queue {metrics.server_queue_time:.3f}s, "
+            f"prefill {metrics.server_prefill_time:.3f}s, decode {metrics.server_decode_time:.3f}s, "
+            f"prefix cache hits {'n/a' if hit_rate is None else f'{hit_rate:.0%}'}"
+        )
+    print(f"Turn {i} Response: {metrics.response}")
+    print(f"Turn {i} Tokens: prompt {metrics.prompt_tokens}, completion {metrics.completion_tokens}")
+    print()
+
+
+def run_conversation(
+    backend,
+    user_messages: list[dict],
+    max_tokens: int,
+    strategy=None,
+    verbose: bool = True,
+    warmup_turns: int = 0,
+) -> list[TurnMetrics]:
+    """
+    have LLM answer each user message in one multi-turn conversation and record per-turn
+    metrics; warm-up and outlier turns are flagged at the end, see bench.steady
+    """
+    turns = list(conversation_turns(backend, user_messages, max_tokens, strategy, verbose))
+    return flag_turns(turns, warmup_turns)
+
+
+def conversation_turns(
+    backend,
+    user_messages,
+    max_tokens: int,
+    strategy=None,
+    verbose: bool = True,
+    resume: list | None = None,
+):
+    """
+    run_conversation one turn at a time: yields each turn's TurnMetrics, unflagged.
+    The turns of `resume` (from bench.live) are replayed with their recorded answers
+    instead of being sent, and not yielded again
+    """
+    strategy = strategy or FullHistory()
+    done = resume or []
+    history = []
+    for i, user_message in enumerate(user_messages):
+        user_message = strategy.prepare(user_message)
+        if i < len(done):
+            history = strategy.advance(history, user_message, done[i].response)
+            continue
+        metrics = backend.complete(history + [user_message], max_tokens)
+        metrics.turn = i + 1
+        if verbose:
+            report_turn(metrics)
+        yield metrics
+        history = strategy.advance(history, user_message, metrics.response)
+
+
+async def arun_conversation(
+    backend,
+    user_messages: list[dict],
+    max_tokens: int,
+    strategy=None,
+    on_turn=None,
+) -> list[TurnMetrics]:
+    """async run_conversation for backends with `acomplete`, used for concurrent load"""
+    strategy = strategy or FullHistory()
+    builder = ChatRequestBuilder()
+    turns = []
+    history = []
+    for i, user_message in enumerate(user_messages):
+        user_message = strategy.prepare(user_message)
+        metrics = await backend.acomplete(history + [user_message], max_tokens, builder)
+        metrics.turn = i + 1
+        if on_turn is not None:
+            on_turn(metrics)
+        turns.append(metrics)
+        history = strategy.advance(history, user_message, metrics.response)
+    return turns
+
+
+def run_lockstep(
+    backend,
+    conversations: list,
+    max_tokens: int,
+    strategy_factory=None,
+    verbose: bool = True,
+    warmup_turns: int = 0,
+) -> list[list[TurnMetrics]]:
+    """
+    run_conversation for many conversations at once on a backend with `complete_batch`:
+    step i sends turn i of every conversation that is still going in one batch.
+    Conversations may be lazy iterators (bench.datasets)
+    """
+    conversations = [iter(messages) for messages in conversations]
+    strategies = [(strategy_factory or FullHistory)() for _ in conversations]
+    histories = [[] for _ in conversations]
+    turns = [[] for _ in conversations]
+    for i in itertools.count():
+        pending = {k: next(messages, None) for k, messages in enumerate(conversations)}
+        active = [k for k, message in pending.items() if message is not None]
+        if not active:
+            break
+        user_messages = {k: strategies[k].prepare(pending[k]) for k in active}
+        batch = backend.complete_batch(
+            [histories[k] + [user_messages[k]] for k in active], max_tokens
+        )
+        for k, metrics in zip(active, batch):
+            metrics.turn = i + 1
+            turns[k].append(metrics)
+            histories[k] = strategies[k].advance(histories[k], user_messages[k], metrics.response)
+        if verbose:
+            tokens = sum(metrics.completion_tokens or 0 for metrics in batch)
+            step_time = batch[0].time_to_completion
+            print(
+                f"Step {i + 1}: {len(active)} conversations in {step_time:.3f}s, "
+                f"{tokens / step_time:.1f} completion tok/s"
+            )
+    return [flag_turns(conversation, warmup_turns) for conversation in turns]
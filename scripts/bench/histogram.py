@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram: log-spaced buckets with a bounded relative error, so any
+    percentile of millions of samples is exact to `precision` at fixed memory and
+    histograms from many sessions, runs or processes merge by adding counts.
+    """
+
+    def __init__(self, lowest_s: float = 1e-6, highest_s: float = 3600.0, precision: float = 0.01):
+        self.lowest_s = lowest_s
+        self.precision = precision
+        self._log_step = np.log1p(precision)
+        size = int(np.ceil(np.log(highest_s / lowest_s) / self._log_step)) + 2
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.total = 0
+        self.max_s = 0.0
+
+    def _index(self, values: np.ndarray) -> np.ndarray:
+        values = np.maximum(values, self.lowest_s)
+        index = np.ceil(np.log(values / self.lowest_s) / self._log_step).astype(np.int64)
+        return np.minimum(index, len(self.counts) - 1)
+
+    def record(self, *values_s: float):
+        self.record_many(np.asarray(values_s, dtype=float))
+
+    def record_many(self, values_s):
+        values = np.asarray(values_s, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        np.add.at(self.counts, self._index(values), 1)
+        self.total += len(values)
+        self.max_s = max(self.max_s, float(values.max()))
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts += other.counts
+        self.total += other.total
+        self.max_s = max(self.max_s, other.max_s)
+
+    def bucket_upper_bounds(self) -> np.ndarray:
+        return self.lowest_s * np.exp(np.arange(len(self.counts)) * self._log_step)
+
+    def percentile(self, q):
+        """value at percentile q (0-100), as the upper bound of its bucket"""
+        if not self.total:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+        ranks = np.ceil(np.asarray(q, dtype=float) / 100 * self.total).clip(1)
+        index = np.searchsorted(np.cumsum(self.counts), ranks)
+        values = np.minimum(self.bucket_upper_bounds()[index], self.max_s)
+        return values if np.ndim(q) else float(values)
+
+    def summary(self, percentiles=(50, 90, 95, 99, 99.9)) -> dict:
+        values = self.percentile(list(percentiles))
+        return {
+            "count": self.total,
+            **{f"p{p:g}": float(v) for p, v in zip(percentiles, values)},
+            "max": self.max_s,
+        }
+
+    def to_frame(self):
+        """non-empty buckets as (upper bound seconds, count, cumulative fraction)"""
+        import pandas as pd
+
+        nonzero = np.flatnonzero(self.counts)
+        return pd.DataFrame(
+            {
+                "upper_bound_s": self.bucket_upper_bounds()[nonzero],
+                "count": self.counts[nonzero],
+                "cumulative": np.cumsum(self.counts)[nonzero] / max(self.total, 1),
+            }
+        )
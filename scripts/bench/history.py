@@ -0,0 +1,317 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+from bench.data import content_parts
+
+UUID_CACHE_SIZE = 4096
+# (hash, length) of the url -> uuid: str caches its hash, so a url sent again is not
+# rehashed, and the cache keeps no url alive
+_uuids = OrderedDict()
+_uuids_lock = threading.Lock()
+
+
+def content_uuid(url: str) -> str:
+    """stable uuid of an image url's content, the same across turns, runs and processes"""
+    key = (hash(url), len(url))
+    with _uuids_lock:
+        if key in _uuids:
+            _uuids.move_to_end(key)
+            return _uuids[key]
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    image_uuid = str(uuid.uuid5(uuid.NAMESPACE_URL, digest))
+    with _uuids_lock:
+        _uuids[key] = image_uuid
+        if len(_uuids) > UUID_CACHE_SIZE:
+            _uuids.popitem(last=False)
+    return image_uuid
+
+
+class FullHistory:
+    """Sends the whole conversation, images included, on every turn"""
+
+    name = "full"
+
+    def prepare(self, user_message: dict) -> dict:
+        """the message as it is sent on its own turn"""
+        return user_message
+
+    def advance(self, history: list, user_message: dict, response: str) -> list:
+        """history to carry into the next turn. Never edit messages in place,
+        request builders cache sent messages by identity"""
+        history.append(user_message)
+        history.append({"role": "assistant", "content": response})
+        return history
+
+
+class ImageDropped(FullHistory):
+    """Images are only sent on the turn they arrive; later turns keep just the text"""
+
+    name = "image_dropped"
+
+    def advance(self, history, user_message, response):
+        content = user_message["content"]
+        if isinstance(content, list):
+            content = [part for part in content if part.get("type") != "image_url"]
+            user_message = {**user_message, "content": content}
+        return super().advance(history, user_message, response)
+
+
+class ImageUUIDCached(FullHistory):
+    """
+    Tags each image with a content derived uuid and blanks its url once it has been
+    sent, so vLLM can serve later turns from its multi-modal cache (was s3/s4)
+    """
+
+    name = "image_uuid_cached"
+
+    def prepare(self, user_message):
+        content = user_message["content"]
+        if not isinstance(content, list):
+            return user_message
+        content = [
+            {**part, "uuid": content_uuid(part["image_url"]["url"])}
+            if part.get("type") == "image_url"
+            else part
+            for part in content
+        ]
+        return {**user_message, "content": content}
+
+    def advance(self, history, user_message, response):
+        content = user_message["content"]
+        if isinstance(content, list):
+            content = [
+                {**part, "image_url": {"url": ""}}
+                if part.get("type") == "image_url"
+                else part
+                for part in content
+            ]
+            user_message = {**user_message, "content": content}
+        return super().advance(history, user_message, response)
+
+
+class ImageDedup(ImageUUIDCached):
+    """
+    image_uuid_cached with keys from bench.dedup: an image within `threshold` pHash
+    bits (and `tolerance` gray levels) of an earlier one gets that image's uuid, and
+    with `substitute` its url as well. A turn's images are matched in one batch;
+    `matches` holds the last turn's bench.dedup.Match
+    """
+
+    name = "image_dedup"
+
+    def __init__(self, threshold: int = 4, tolerance: int = 1, substitute: int = 0):
+        from bench.dedup import ImageIndex
+
+        self.index = ImageIndex(threshold, tolerance, bool(substitute))
+        self.matches = []
+
+    def prepare(self, user_message):
+        content = user_message["content"]
+        if not isinstance(content, list):
+            self.matches = []
+            return user_message
+        urls = [part["image_url"]["url"] for part in content if part.get("type") == "image_url"]
+        self.matches = self.index.assign(urls)
+        matches = iter(self.matches)
+        content = [
+            {**part, "image_url": {"url": match.url}, "uuid": match.key}
+            if part.get("type") == "image_url" and (match := next(matches))
+            else part
+            for part in content
+        ]
+        return {**user_message, "content": content}
+
+
+class RegionCrop(FullHistory):
+    """
+    For a conversation about one screen: after the first frame, a turn whose frame
+    changed in at most `max_area` percent of its area sends only crops of the changed
+    regions, their pixel boxes in text, or no image when nothing changed (see
+    bench.delta). Larger changes send the whole frame. `mode` is the last turn's
+    decision, "full", "crop", "unchanged" or "text", which s17 reports per turn
+    """
+
+    name = "region_crop"
+
+    def __init__(self, max_area: int = 25, tolerance: int = 4):
+        from bench.delta import FrameDelta
+
+        self.delta = FrameDelta(max_area / 100, tolerance)
+        self.mode = None
+
+    def prepare(self, user_message):
+        from bench.delta import decode_frame, encode_frame
+
+        content = user_message["content"]
+        images = [part for part in content_parts(user_message) if part.get("type") == "image_url"]
+        if len(images) != 1 or not isinstance(content, list):
+            self.mode = "full" if images else "text"
+            return user_message
+        frame, media_type = decode_frame(images[0]["image_url"]["url"])
+        boxes = self.delta.update(frame)
+        if boxes is None:
+            self.mode = "full"
+            return user_message
+        text = [part for part in content if part.get("type") != "image_url"]
+        height, width = frame.shape[:2]
+        if not boxes:
+            self.mode = "unchanged"
+            note = f"The {width}x{height} screen has not changed since the last screenshot."
+            return {**user_message, "content": [{"type": "text", "text": note}, *text]}
+        self.mode = "crop"
+        parts = [
+            {
+                "type": "text",
+                "text": f"Only {len(boxes)} region(s) of the {width}x{height} screen changed since "
+                "the last screenshot. Each crop follows its box (x, y, width, height):",
+            }
+        ]
+        for k, (top, left, bottom, right) in enumerate(boxes, 1):
+            parts.append({"type": "text", "text": f"Region {k}: ({left}, {top}, {right - left}, {bottom - top})"})
+            crop = encode_frame(frame[top:bottom, left:right], media_type)
+            parts.append({"type": "image_url", "image_url": {"url": crop}})
+        return {**user_message, "content": parts + text}
+
+
+class SingleImage(FullHistory):
+    """
+    Only the current user turn is sent with the history of answers; each answer is
+    repeated 10x to keep the prompt growing like a text-heavy history (was s6)
+    """
+
+    name = "single_image"
+
+    def advance(self, history, user_message, response):
+        history.append({"role": "assistant", "content": response * 10})
+        return history
+
+
+def _without_images(message: dict) -> dict:
+    content = message["content"]
+    if not isinstance(content, list) or not any(
+        part.get("type") == "image_url" for part in content
+    ):
+        return message
+    return {**message, "content": [part for part in content if part.get("type") != "image_url"]}
+
+
+def _image_count(message: dict) -> int:
+    content = message["content"]
+    if not isinstance(content, list):
+        return 0
+    return sum(part.get("type") == "image_url" for part in content)
+
+
+class ImageWindow(FullHistory):
+    """
+    Every request carries the images of at most the last `k` user turns, the current
+    one included; older turns keep their text. k=1 behaves like image_dropped.
+    """
+
+    name = "image_window"
+
+    def __init__(self, k: int = 3):
+        self.k = k
+
+    def advance(self, history, user_message, response):
+        history = super().advance(history, user_message, response)
+        seen = 0
+        for i in range(len(history) - 1, -1, -1):
+            if history[i]["role"] != "user" or not _image_count(history[i]):
+                continue
+            seen += 1
+            if seen >= self.k:
+                # everything further back was already stripped on an earlier turn
+                history[i] = _without_images(history[i])
+                break
+        return history
+
+
+class SummarizeOldTurns(FullHistory):
+    """
+    Keeps the last `k` turns verbatim and folds older ones into a single leading text
+    message: the question plus the first `summary_chars` of the answer, images dropped.
+    Extractive, so it costs no extra model calls inside the measured turns.
+    """
+
+    name = "summarize"
+
+    def __init__(self, k: int = 4, summary_chars: int = 80):
+        self.k = k
+        self.summary_chars = summary_chars
+        self.summary_lines = []
+
+    def _summarize(self, user_message: dict, response: str) -> str:
+        question = " ".join(
+            part["text"] for part in content_parts(_without_images(user_message))
+        )
+        question = question.rsplit("---", 1)[-1].strip()  # text turns lead with a long document
+        return f"- Q: {question} A: {response[: self.summary_chars]}"
+
+    def advance(self, history, user_message, response):
+        turns = history[1:] if self.summary_lines else history
+        turns = super().advance(turns, user_message, response)
+        while len(turns) > 2 * self.k:
+            old_user, old_answer = turns.pop(0), turns.pop(0)
+            self.summary_lines.append(self._summarize(old_user, old_answer["content"]))
+        if not self.summary_lines:
+            return turns
+        summary = "Summary of the earlier conversation:\n" + "\n".join(self.summary_lines)
+        # a new dict every turn it changes, builders cache messages by identity
+        if history and history[0].get("content") == summary:
+            return [history[0]] + turns
+        return [{"role": "user", "content": summary}] + turns
+
+
+class TokenBudget(FullHistory):
+    """
+    Drops the oldest turns until the estimated history fits in `max_tokens`: text at
+    ~4 characters per token, `image_tokens` per image (1196 = a 720p image on
+    Qwen2.5-VL's 28px grid, see bench.resize).
+    """
+
+    name = "token_budget"
+
+    def __init__(self, max_tokens: int = 16384, image_tokens: int = 1196):
+        self.max_tokens = max_tokens
+        self.image_tokens = image_tokens
+
+    def estimate_tokens(self, message: dict) -> int:
+        text = sum(
+            len(part["text"]) for part in content_parts(message) if part.get("type") == "text"
+        )
+        return text // 4 + self.image_tokens * _image_count(message)
+
+    def advance(self, history, user_message, response):
+        history = super().advance(history, user_message, response)
+        total = sum(self.estimate_tokens(message) for message in history)
+        dropped = 0
+        while total > self.max_tokens and len(history) - dropped > 2:
+            total -= self.estimate_tokens(history[dropped])
+            total -= self.estimate_tokens(history[dropped + 1])
+            dropped += 2
+        return history[dropped:]
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (
+        FullHistory,
+        ImageDropped,
+        ImageUUIDCached,
+        ImageDedup,
+        RegionCrop,
+        SingleImage,
+        ImageWindow,
+        SummarizeOldTurns,
+        TokenBudget,
+    )
+}
+
+
+def make_strategy(spec: str):
+    """'image_window:5' -> ImageWindow(5); positional int arguments after the name"""
+    name, *args = spec.split(":")
+    return STRATEGIES[name](*(int(arg) for arg in args))
@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from bench.resize import ImageBudget, encode_image
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "VLM_BENCH_CACHE", os.path.expanduser("~/.cache/vlm-latency-bench")
+)
+
+
+class ImagePayloadCache:
+    """
+    Content-addressed cache of base64 encoded images.
+
+    Payloads live on disk under `<cache_dir>/payloads/<sha256 of file>.b64` so every
+    script and every run shares them, and are memory-mapped on first use. Within a
+    process each distinct image is read, hashed and turned into a data URL exactly
+    once, and repeated occurrences share the same string object.
+
+    With an ImageBudget the payload is the resized and re-encoded image instead,
+    stored as `<sha256>.<budget key>.b64`; `prepare` encodes many in a process pool.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.payload_dir = os.path.join(cache_dir, "payloads")
+        self._digests = {}  # (path, mtime_ns, size) -> sha256 hex
+        self._payloads = {}  # (sha256 hex, budget) -> mmap of base64 bytes
+        self._b64 = {}  # (sha256 hex, budget) -> base64 str
+        self._data_urls = {}  # (sha256 hex, budget, media type) -> data url str
+
+    def digest(self, image_path: str) -> str:
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        if key not in self._digests:
+            with open(image_path, "rb") as image_file:
+                self._digests[key] = hashlib.file_digest(image_file, "sha256").hexdigest()
+        return self._digests[key]
+
+    def payload_path(self, image_path: str, budget: ImageBudget | None = None) -> str:
+        digest = self.digest(image_path)
+        name = f"{digest}.b64" if budget is None else f"{digest}.{budget.key}.b64"
+        return os.path.join(self.payload_dir, name)
+
+    def payload(self, image_path: str, budget: ImageBudget | None = None) -> mmap.mmap:
+        """memory-mapped base64 bytes of the image, encoded on first sight"""
+        key = (self.digest(image_path), budget)
+        if key in self._payloads:
+            return self._payloads[key]
+
+        payload_path = self.payload_path(image_path, budget)
+        if not os.path.exists(payload_path):
+            _write_payload(image_path, payload_path, budget)
+
+        with open(payload_path, "rb") as payload_file:
+            payload = mmap.mmap(payload_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._payloads[key] = payload
+        return payload
+
+    def prepare(self, image_paths: list[str], budget: ImageBudget, workers: int | None = None):
+        """encodes every image missing from the disk cache for `budget`, in parallel"""
+        missing = {}
+        for image_path in image_paths:
+            payload_path = self.payload_path(image_path, budget)
+            if not os.path.exists(payload_path):
+                missing[payload_path] = image_path
+        if not missing:
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [
+                pool.submit(_write_payload, image_path, payload_path, budget)
+                for payload_path, image_path in missing.items()
+            ]
+            for job in jobs:
+                job.result()
+
+    def b64(self, image_path: str, budget: ImageBudget | None = None, memo: bool = True) -> str:
+        """
+        With memo=False the payload is read without being kept (no mmap, no string),
+        for workloads with more distinct images than should stay in memory or open
+        """
+        key = (self.digest(image_path), budget)
+        if key in self._b64:
+            return self._b64[key]
+        if memo:
+            self._b64[key] = self.payload(image_path, budget)[:].decode("ascii")
+            return self._b64[key]
+        payload_path = self.payload_path(image_path, budget)
+        if not os.path.exists(payload_path):
+            _write_payload(image_path, payload_path, budget)
+        with open(payload_path, "rb") as payload_file:
+            return payload_file.read().decode("ascii")
+
+    def data_url(
+        self,
+        image_path: str,
+        media_type: str = "image/jpeg",
+        budget: ImageBudget | None = None,
+        memo: bool = True,
+    ) -> str:
+        if budget is not None:
+            media_type = budget.media_type
+        key = (self.digest(image_path), budget, media_type)
+        if key in self._data_urls:
+            return self._data_urls[key]
+        data_url = f"data:{media_type};base64,{self.b64(image_path, budget, memo)}"
+        if memo:
+            self._data_urls[key] = data_url
+        return data_url
+
+
+def _write_payload(image_path: str, payload_path: str, budget: ImageBudget | None):
+    """base64 of the file (or of its budget re-encoding), module level so pools can run it"""
+    if budget is None:
+        with open(image_path, "rb") as image_file:
+            encoded = base64.b64encode(image_file.read())
+    else:
+        encoded = base64.b64encode(encode_image(image_path, budget))
+    payload_dir = os.path.dirname(payload_path)
+    os.makedirs(payload_dir, exist_ok=True)
+    # write-then-rename so concurrent runs never see a half written payload
+    fd, tmp_path = tempfile.mkstemp(dir=payload_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(encoded)
+    os.replace(tmp_path, payload_path)
+
+
+payload_cache = ImagePayloadCache()
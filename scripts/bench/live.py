@@ -0,0 +1,311 @@
+"""
+Watching long runs while they go, and not losing them when they die.
+
+    sink        every finished turn is appended to a JSONL file as one line, keyed by
+                its run (e.g. "seed=66"), and fsynced every `fsync_every` turns or
+                `fsync_interval` seconds, whichever comes first. A crash loses at most
+                that much, and a torn last line is skipped when reading back
+    resume      runs continue after their last turn in the sink: earlier turns are
+                replayed through the history strategy with their recorded answers,
+                without calling the server (see bench.engine.conversation_turns)
+    dashboard   one status line on stderr: turns, requests in flight, rolling p50 /
+                p95 time to completion, completion tokens per second
+    abort       when the rolling median is `abort_ratio` times a baseline run's at the
+                same turns, or the rolling p95 above `abort_p95` seconds, the run stops
+                and what it did stays in the sink
+
+The sink belongs to one configuration; resuming with other settings mixes them.
+"""
+
+import contextlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, fields
+
+import numpy as np
+import pandas as pd
+
+from bench.metrics import CSV_COLUMNS, TurnMetrics
+
+
+class RegressionAbort(Exception):
+    pass
+
+
+class TurnSink:
+    """
+    append-only JSONL of TurnMetrics; `resume` keeps what is there, `overwrite` replaces
+    it, and a sink with turns in it is otherwise refused (FileExistsError)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        resume: bool = False,
+        fsync_every: int = 16,
+        fsync_interval: float = 2.0,
+        overwrite: bool = False,
+    ):
+        if not resume and not overwrite and os.path.exists(path) and os.path.getsize(path):
+            raise FileExistsError(f"{path} already has turns in it")
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.turns = read_turns(path) if resume else {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume and os.path.exists(path):
+            _drop_torn_line(path)
+        self._file = open(path, "a" if resume else "w")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def done(self, run: str) -> list[TurnMetrics]:
+        """turns of `run` already in the sink"""
+        return self.turns.get(run, [])
+
+    def write(self, run: str, metrics: TurnMetrics):
+        line = json.dumps({"run": run, **asdict(metrics)}) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def _drop_torn_line(path: str):
+    """cuts a last line without its newline, left by a crash mid-write"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_turns(path: str) -> dict[str, list[TurnMetrics]]:
+    """run -> its TurnMetrics in turn order, from a sink; a torn last line is skipped"""
+    known = {f.name for f in fields(TurnMetrics)}
+    turns = {}
+    if not os.path.exists(path):
+        return turns
+    with open(path) as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            metrics = TurnMetrics(**{key: value for key, value in row.items() if key in known})
+            turns.setdefault(row["run"], []).append(metrics)
+    return {run: sorted(run_turns, key=lambda m: m.turn) for run, run_turns in turns.items()}
+
+
+def baseline_latencies(path: str) -> dict[int, float]:
+    """turn -> median time to completion over the runs of an earlier CSV or sink"""
+    if path.endswith(".jsonl"):
+        df = pd.DataFrame(
+            [asdict(m) for run_turns in read_turns(path).values() for m in run_turns]
+        ).rename(columns=CSV_COLUMNS)
+    else:
+        df = pd.read_csv(path)
+    return df.groupby("turn")["times_to_completion"].median().to_dict()
+
+
+class Dashboard:
+    """one line of rolling statistics on `stream`, redrawn at most every `interval` s"""
+
+    def __init__(self, window: int = 50, interval: float = 0.5, stream=None):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.latencies = deque(maxlen=window)
+        self.finished = deque(maxlen=window)  # (wall time, completion tokens)
+        self.turns = 0
+        self.in_flight = 0
+        self._drawn_at = 0.0
+
+    def line(self) -> str:
+        p50, p95 = (np.percentile(self.latencies, [50, 95]) if self.latencies else (math.nan, math.nan))
+        tokens = sum(n for _, n in self.finished)
+        span = self.finished[-1][0] - self.finished[0][0] if len(self.finished) > 1 else 0.0
+        rate = (tokens - self.finished[0][1]) / span if span > 0 else math.nan
+        return (
+            f"turns {self.turns} | in flight {self.in_flight} | "
+            f"p50 {p50:.3f}s p95 {p95:.3f}s | {rate:.1f} tok/s"
+        )
+
+    def draw(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._drawn_at < self.interval:
+            return
+        self._drawn_at = now
+        if self.stream.isatty():
+            self.stream.write("\r\033[K" + self.line())
+        else:
+            self.stream.write(self.line() + "\n")
+        self.stream.flush()
+
+
+class LiveRun:
+    """
+    The sink, dashboard and abort rule of one invocation, fed by bench.parallel.run_seeds
+    (or any loop running turns inside `in_flight` and passing them to `record`); each
+    part is optional
+    """
+
+    def __init__(
+        self,
+        sink: TurnSink | None = None,
+        dashboard: Dashboard | None = None,
+        baseline: dict[int, float] | None = None,
+        abort_ratio: float | None = None,
+        abort_p95: float | None = None,
+        min_turns: int = 10,
+        window: int = 20,
+    ):
+        self.sink = sink
+        self.dashboard = dashboard
+        self.baseline = baseline or {}
+        self.abort_ratio = abort_ratio
+        self.abort_p95 = abort_p95
+        self.min_turns = min_turns
+        self.recent = deque(maxlen=window)  # (turn, time to completion)
+        self.aborted = None  # the reason, once aborted
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, args):
+        sink = None
+        if args.sink:
+            try:
+                sink = TurnSink(args.sink, args.resume, args.fsync_every, overwrite=args.overwrite_sink)
+            except FileExistsError as error:
+                raise SystemExit(f"{error}: pass --resume to continue it or --overwrite_sink to start over")
+        elif args.resume:
+            raise SystemExit("--resume needs the --sink of the run to resume")
+        return cls(
+            sink=sink,
+            dashboard=Dashboard() if args.dashboard else None,
+            baseline=baseline_latencies(args.baseline) if args.baseline else None,
+            abort_ratio=args.abort_ratio,
+            abort_p95=args.abort_p95,
+        )
+
+    def done(self, run: str) -> list[TurnMetrics]:
+        return self.sink.done(run) if self.sink else []
+
+    @contextlib.contextmanager
+    def in_flight(self):
+        """around a turn; refuses to start one once the run is aborted"""
+        if self.aborted:
+            raise RegressionAbort(self.aborted)
+        self._count_in_flight(1)
+        try:
+            yield
+        finally:
+            self._count_in_flight(-1)
+
+    def step(self, run: str, iterator, turns: list):
+        """the next turn of `iterator`, appended to `turns` and recorded; None when done"""
+        with self.in_flight():
+            metrics = next(iterator, None)
+        if metrics is not None:
+            turns.append(metrics)
+            self.record(run, metrics)
+        return metrics
+
+    def _count_in_flight(self, change: int):
+        if self.dashboard:
+            with self._lock:
+                self.dashboard.in_flight += change
+                self.dashboard.draw()
+
+    def record(self, run: str, metrics: TurnMetrics):
+        if self.sink:
+            self.sink.write(run, metrics)
+        with self._lock:
+            if self.dashboard:
+                board = self.dashboard
+                board.turns += 1
+                if metrics.time_to_completion is not None:
+                    board.latencies.append(metrics.time_to_completion)
+                board.finished.append((time.monotonic(), metrics.completion_tokens or 0))
+                board.draw()
+            if metrics.time_to_completion is not None:
+                self.recent.append((metrics.turn, metrics.time_to_completion))
+            self.aborted = self.aborted or self._regression()
+        if self.aborted:
+            raise RegressionAbort(self.aborted)
+
+    def _regression(self) -> str | None:
+        if len(self.recent) < min(self.min_turns, self.recent.maxlen):
+            return None
+        latencies = [seconds for _, seconds in self.recent]
+        if self.abort_p95 is not None and np.percentile(latencies, 95) > self.abort_p95:
+            return f"rolling p95 {np.percentile(latencies, 95):.3f}s is above {self.abort_p95:.3f}s"
+        matched = [(seconds, self.baseline[turn]) for turn, seconds in self.recent if turn in self.baseline]
+        if self.abort_ratio is None or len(matched) < min(self.min_turns, self.recent.maxlen):
+            return None
+        ratio = np.median([s for s, _ in matched]) / np.median([b for _, b in matched])
+        if ratio > self.abort_ratio:
+            return f"rolling median is {ratio:.2f}x the baseline's at the same turns"
+        return None
+
+    def close(self):
+        if self.sink:
+            self.sink.close()
+        if self.dashboard:
+            self.dashboard.draw(force=True)
+            self.dashboard.stream.write("\n")
+
+    def finish(self):
+        """close, then exit after an abort, leaving the turns in the sink only"""
+        self.close()
+        if self.aborted:
+            raise SystemExit(f"aborted: {self.aborted}")
+
+
+def add_live_arguments(parser):
+    group = parser.add_argument_group("live")
+    group.add_argument(
+        "--sink",
+        default=None,
+        help="JSONL every turn is appended to as it finishes (default: none)",
+    )
+    group.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue each run after its last turn in the sink instead of starting over",
+    )
+    group.add_argument(
+        "--overwrite_sink",
+        action="store_true",
+        help="start the sink over even if it has turns in it",
+    )
+    group.add_argument("--fsync_every", type=int, default=16, help="turns between fsyncs of the sink")
+    group.add_argument("--dashboard", action="store_true", help="rolling latency and throughput on stderr")
+    group.add_argument("--baseline", default=None, help="CSV or sink of an earlier run to compare against")
+    group.add_argument(
+        "--abort_ratio",
+        type=float,
+        default=None,
+        help="stop when the rolling median time to completion is this many times the baseline's",
+    )
+    group.add_argument(
+        "--abort_p95", type=float, default=None, help="stop when the rolling p95 is above this many seconds"
+    )
+    return group
@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import random
+import time
+from dataclasses import asdict
+
+import pandas as pd
+
+from bench.engine import arun_conversation
+
+PERCENTILES = [0.5, 0.9, 0.95, 0.99]
+
+
+async def run_session(
+    backend,
+    session_id: int,
+    seed: int,
+    user_messages: list[dict],
+    max_tokens: int,
+    load_start: float,
+    strategy=None,
+):
+    """one multi-turn conversation; rows carry the session and when each turn was sent"""
+    rows = []
+
+    def on_turn(metrics):
+        sent_at = time.perf_counter() - metrics.time_to_completion - load_start
+        rows.append({"session": session_id, "seed": seed, "sent_at": sent_at, **asdict(metrics)})
+
+    await arun_conversation(
+        backend, user_messages, max_tokens, strategy=strategy, on_turn=on_turn
+    )
+    return rows
+
+
+async def run_load(
+    backend,
+    build_messages,
+    max_tokens: int,
+    num_conversations: int,
+    base_seed: int = 1337,
+    concurrency: int | None = None,
+    arrival_rate: float | None = None,
+    strategy_factory=None,
+):
+    """
+    Runs num_conversations independent conversations against one endpoint.
+
+    Conversation k uses `build_messages(base_seed + k)`. With `concurrency` at most
+    that many conversations are in flight at once; with `arrival_rate` conversations
+    start as a Poisson process with that many arrivals per second. Both may be combined.
+    `backend` needs `acomplete`, see OpenAIBackend.
+    Returns (per-turn rows as a DataFrame, wall clock seconds).
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    arrivals = random.Random(base_seed)
+    load_start = time.perf_counter()
+
+    async def session(k: int, start_offset: float):
+        await asyncio.sleep(start_offset)
+        seed = base_seed + k
+        async with semaphore or contextlib.nullcontext():
+            # build lazily so only in-flight conversations hold their messages
+            messages = build_messages(seed)
+            strategy = strategy_factory() if strategy_factory else None
+            return await run_session(
+                backend, k, seed, messages, max_tokens, load_start, strategy
+            )
+
+    start_offsets = []
+    offset = 0.0
+    for _ in range(num_conversations):
+        start_offsets.append(offset)
+        if arrival_rate:
+            offset += arrivals.expovariate(arrival_rate)
+
+    results = await asyncio.gather(
+        *(session(k, start_offsets[k]) for k in range(num_conversations))
+    )
+    wall_time = time.perf_counter() - load_start
+    rows = [row for session_rows in results for row in session_rows]
+    return pd.DataFrame(rows), wall_time
+
+
+def summarize(df: pd.DataFrame, wall_time: float):
+    """per-turn latency percentiles and aggregate throughput over the whole load"""
+    metrics = ["time_to_completion"]
+    if df["time_to_first_token"].notna().any():
+        metrics.append("time_to_first_token")
+    per_turn = df.groupby("turn")[metrics].quantile(PERCENTILES).unstack()
+    per_turn.columns = [f"{metric}_p{int(q * 100)}" for metric, q in per_turn.columns]
+    per_turn.insert(0, "requests", df.groupby("turn").size())
+
+    totals = {
+        "conversations": df["session"].nunique(),
+        "requests": len(df),
+        "wall_time_s": wall_time,
+        "requests_per_s": len(df) / wall_time,
+        "completion_tokens_per_s": df["completion_tokens"].sum() / wall_time,
+        "prompt_tokens_per_s": df["prompt_tokens"].sum() / wall_time,
+    }
+    for q in PERCENTILES:
+        totals[f"time_to_completion_p{int(q * 100)}"] = df["time_to_completion"].quantile(q)
+    return per_turn.reset_index(), totals
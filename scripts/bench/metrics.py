@@ -0,0 +1,107 @@
+import json
+from dataclasses import asdict, dataclass, field, fields
+
+import pandas as pd
+
+
+@dataclass
+class TurnMetrics:
+    """
+    What every backend reports for one turn. Fields a backend cannot measure stay
+    None, e.g. network phases for in-process engines or ttft without streaming.
+    """
+
+    turn: int = 0
+    response: str = ""
+    time_to_completion: float | None = None
+    time_to_first_token: float | None = None
+    inter_token_latencies: list[float] = field(default_factory=list)
+    decode_tokens_per_s: float | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    cache_creation_input_tokens: int | None = None
+    cache_read_input_tokens: int | None = None
+    request_bytes: int | None = None
+    response_bytes: int | None = None
+    serialize_time: float | None = None
+    connect_time: float | None = None
+    upload_time: float | None = None
+    server_time: float | None = None
+    download_time: float | None = None
+    parse_time: float | None = None
+    connection_reused: bool | None = None  # False when the turn opened a new connection
+    retries: int | None = None  # failed attempts before the one measured, see bench.clients
+    retry_time: float | None = None  # what those attempts and their backoff added
+    # from the server's /metrics around the turn, see bench.server_metrics
+    prefix_cache_queries: float | None = None
+    prefix_cache_hits: float | None = None
+    prefix_cache_hit_rate: float | None = None
+    mm_cache_hit_rate: float | None = None
+    kv_cache_usage: float | None = None
+    server_queue_time: float | None = None
+    server_prefill_time: float | None = None
+    server_decode_time: float | None = None
+    endpoint: str | None = None  # replica that served the turn, see bench.routing
+    # set after the run, see bench.steady
+    warmup: bool | None = None
+    outlier: bool | None = None
+
+    @classmethod
+    def from_timing(cls, response: str, usage, timing: dict, **extra):
+        """builds metrics from the timing dicts of bench.payload / bench.streaming / bench.timing"""
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in timing.items() if key in known}
+        values["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+        values["completion_tokens"] = getattr(usage, "completion_tokens", None)
+        # OpenAI style prefix cache reads (vLLM with --enable-prompt-tokens-details)
+        details = getattr(usage, "prompt_tokens_details", None)
+        values["cache_read_input_tokens"] = getattr(details, "cached_tokens", None)
+        values.update(extra)
+        return cls(response=response, **values)
+
+
+# field -> CSV column, keeping the names the notebook and results/*.csv already use
+CSV_COLUMNS = {
+    "turn": "turn",
+    "time_to_completion": "times_to_completion",
+    "response": "assistant_responses",
+    "time_to_first_token": "times_to_first_token",
+    "inter_token_latencies": "inter_token_latencies",
+    "decode_tokens_per_s": "decode_tokens_per_s",
+    "prompt_tokens": "prompt_tokens",
+    "completion_tokens": "completion_tokens",
+    "cache_creation_input_tokens": "cache_creation_input_tokens",
+    "cache_read_input_tokens": "cache_read_input_tokens",
+    "request_bytes": "request_bytes",
+    "response_bytes": "response_bytes",
+    "serialize_time": "times_to_serialize",
+    "connect_time": "times_to_connect",
+    "upload_time": "times_to_upload",
+    "server_time": "times_on_server",
+    "download_time": "times_to_download",
+    "parse_time": "times_to_parse",
+    "connection_reused": "connection_reused",
+    "retries": "retries",
+    "retry_time": "times_in_retry",
+    "prefix_cache_queries": "prefix_cache_queries",
+    "prefix_cache_hits": "prefix_cache_hits",
+    "prefix_cache_hit_rate": "prefix_cache_hit_rates",
+    "mm_cache_hit_rate": "mm_cache_hit_rates",
+    "kv_cache_usage": "kv_cache_usages",
+    "server_queue_time": "times_in_server_queue",
+    "server_prefill_time": "times_to_prefill",
+    "server_decode_time": "times_to_decode",
+    "endpoint": "endpoint",
+    "warmup": "warmup",
+    "outlier": "outlier",
+}
+
+
+def to_frame(turns: list[TurnMetrics], **metadata) -> pd.DataFrame:
+    """one row per turn; metadata (model, strategy, seed, ...) becomes leading columns"""
+    df = pd.DataFrame([asdict(turn) for turn in turns], columns=list(CSV_COLUMNS))
+    df["inter_token_latencies"] = df["inter_token_latencies"].map(json.dumps)
+    df = df.rename(columns=CSV_COLUMNS)
+    for position, (key, value) in enumerate(metadata.items()):
+        df.insert(position, key, value)
+    return df
@@ -0,0 +1,434 @@
+"""
+Stand-in for a vLLM / Anthropic server, for exercising the harness without GPUs.
+
+Serves `/v1/models`, `/v1/chat/completions` and `/v1/messages` (streaming and not)
+on asyncio + h11, answering after a parametric latency model:
+
+    ttft   = base + prefill_per_token * uncached tokens + prefill_per_image * uncached images
+    decode = decode_per_token per completion token
+
+A simulated prefix cache remembers message chains, like vLLM's prefix caching at
+message instead of block granularity, so a turn only pays prefill for what is new.
+An optional encoder cache spares `prefill_per_image` for an image outside the
+cached prefix that was seen before (same uuid, else same content).
+`/metrics` exposes the vLLM Prometheus series bench.server_metrics reads.
+gzip request bodies are inflated, and `error_rate` of the completions are
+answered 503 so client retries can be exercised.
+Sleeps run against deadlines set when the request arrives, so the mock's own JSON
+parsing hides inside the modeled latency instead of adding to it.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import io
+import json
+import random
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+
+import h11
+
+from bench.resize import smart_resize, visual_tokens
+
+WORDS = "the quick brown fox jumps over the lazy dog while the image shows".split()
+
+
+@dataclass
+class LatencyModel:
+    base_s: float = 0.005
+    prefill_per_token_s: float = 0.0001
+    prefill_per_image_s: float = 0.02
+    decode_per_token_s: float = 0.01
+    completion_tokens: int = 32  # answer length when max_tokens allows it
+    cache_tokens: int = 2_000_000  # prefix cache capacity
+    encoder_cache_images: int = 0  # images whose encoding is kept, by uuid or content
+
+
+class PrefixCache:
+    """LRU of message chain hashes -> tokens of that prefix"""
+
+    def __init__(self, capacity_tokens: int):
+        self.capacity_tokens = capacity_tokens
+        self.entries = OrderedDict()  # chain hash -> tokens of the message it ends with
+        self.tokens = 0
+        self.queries = 0
+        self.hits = 0
+
+    def lookup(self, chain: list[tuple[bytes, int, int]]):
+        """
+        chain: (prefix hash, tokens, images) per message. Returns cached (tokens, images)
+        of the longest known prefix, then inserts the whole chain.
+        """
+        cached_tokens = cached_images = 0
+        hit = True
+        for key, tokens, images in chain:
+            hit = hit and key in self.entries
+            if hit:
+                self.entries.move_to_end(key)
+                cached_tokens += tokens
+                cached_images += images
+            elif key not in self.entries:
+                self.entries[key] = tokens
+                self.tokens += tokens
+        while self.tokens > self.capacity_tokens and self.entries:
+            self.tokens -= self.entries.popitem(last=False)[1]
+        total = sum(tokens for _, tokens, _ in chain)
+        self.queries += total
+        self.hits += cached_tokens
+        return cached_tokens, cached_images
+
+
+class MockServer:
+    def __init__(
+        self,
+        latency: LatencyModel | None = None,
+        models: list[str] | None = None,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency or LatencyModel()
+        self.models = models  # None serves any model name
+        self.error_rate = error_rate
+        self._errors = random.Random(seed)
+        self.cache = PrefixCache(self.latency.cache_tokens)
+        self.encoded = OrderedDict()  # image identity -> None, LRU of encoder outputs
+        self._image_tokens = {}  # (url length, url tail) -> visual tokens
+        self.running = 0
+        self.stats = defaultdict(lambda: defaultdict(float))  # model -> series -> value
+        for name in models or ["mock"]:
+            self.stats[name]  # exported from startup, like vLLM's labelled series
+
+    # -- prompt accounting -------------------------------------------------
+
+    def image_tokens(self, url: str) -> int:
+        """visual tokens of a data url image on Qwen2.5-VL's grid, read from its header"""
+        key = (len(url), url[-64:])
+        if key not in self._image_tokens:
+            tokens = 1196  # a 720p image, also used for blank (uuid cached) urls
+            if url.startswith("data:"):
+                from PIL import Image
+
+                head = url.split(",", 1)[1][:65536]
+                try:
+                    with Image.open(io.BytesIO(base64.b64decode(head[: len(head) // 4 * 4]))) as image:
+                        tokens = visual_tokens(*smart_resize(image.height, image.width, 12845056))
+                except Exception:
+                    pass
+            self._image_tokens[key] = tokens
+        return self._image_tokens[key]
+
+    def message_chain(self, messages: list[dict], identities: list | None = None):
+        """
+        (chain hash, tokens, images) per message; images hash by uuid when given, and
+        their identities are appended to `identities` in prompt order
+        """
+        chain, prefix = [], hashlib.sha256()
+        for message in messages:
+            content = message.get("content") or ""
+            parts = [{"type": "text", "text": content}] if isinstance(content, str) else content
+            tokens = images = 0
+            prefix.update(message.get("role", "").encode())
+            for part in parts:
+                kind = part.get("type")
+                if kind == "text":
+                    prefix.update(part["text"].encode())
+                    tokens += len(part["text"]) // 4 + 1
+                elif kind in ("image_url", "image"):
+                    if kind == "image_url":
+                        url = part["image_url"]["url"]
+                    else:
+                        url = "data:{media_type};base64,{data}".format(**part["source"])
+                    identity = part.get("uuid") or f"{len(url)}:{url[-64:]}"
+                    prefix.update(identity.encode())
+                    if identities is not None:
+                        identities.append(identity)
+                    tokens += self.image_tokens(url)
+                    images += 1
+            chain.append((prefix.copy().digest(), tokens, images))
+        return chain
+
+    def plan(self, model_name: str, messages: list[dict], max_tokens: int):
+        """prompt tokens, cached tokens, time to first token and completion length"""
+        identities = []
+        chain = self.message_chain(messages, identities)
+        cached_tokens, cached_images = self.cache.lookup(chain)
+        # images past the cached prefix are encoded again unless the encoder cache has them
+        encoded = self.encoder_lookup(model_name, identities[cached_images:])
+        prompt_tokens = sum(tokens for _, tokens, _ in chain)
+        self.stats[model_name]["prefix_cache_queries"] += prompt_tokens
+        self.stats[model_name]["prefix_cache_hits"] += cached_tokens
+        images = sum(n for _, _, n in chain)
+        model = self.latency
+        ttft = (
+            model.base_s
+            + model.prefill_per_token_s * (prompt_tokens - cached_tokens)
+            + model.prefill_per_image_s * (images - cached_images - encoded)
+        )
+        completion_tokens = max(1, min(max_tokens or model.completion_tokens, model.completion_tokens))
+        return prompt_tokens, cached_tokens, ttft, completion_tokens
+
+    def encoder_lookup(self, model_name: str, identities: list[str]) -> int:
+        """how many of `identities` the encoder cache holds, then inserts them all"""
+        capacity = self.latency.encoder_cache_images
+        if not capacity:
+            return 0
+        hits = 0
+        for identity in identities:
+            if identity in self.encoded:
+                self.encoded.move_to_end(identity)
+                hits += 1
+            else:
+                self.encoded[identity] = None
+                if len(self.encoded) > capacity:
+                    self.encoded.popitem(last=False)
+        self.stats[model_name]["mm_cache_queries"] += len(identities)
+        self.stats[model_name]["mm_cache_hits"] += hits
+        return hits
+
+    def finish(self, model_name: str, ttft: float, completion_tokens: int):
+        """records a request in the histograms, before its last bytes are sent like vLLM"""
+        stats = self.stats[model_name]
+        decode = (completion_tokens - 1) * self.latency.decode_per_token_s
+        for name, value in (("queue_time", 0.0), ("prefill_time", ttft), ("decode_time", decode)):
+            stats[f"request_{name}_seconds_sum"] += value
+            stats[f"request_{name}_seconds_count"] += 1
+        stats["e2e_request_latency_seconds_sum"] += ttft + decode
+        stats["e2e_request_latency_seconds_count"] += 1
+
+    def metrics_text(self) -> str:
+        """Prometheus text exposition with vLLM's metric names"""
+        usage = self.cache.tokens / self.cache.capacity_tokens if self.cache.capacity_tokens else 0.0
+        lines = []
+        for model_name, stats in self.stats.items():
+            label = f'{{model_name="{model_name}"}}'
+            lines += [
+                f"vllm:num_requests_running{label} {self.running}",
+                f"vllm:kv_cache_usage_perc{label} {usage}",
+                f"vllm:prefix_cache_queries_total{label} {stats['prefix_cache_queries']}",
+                f"vllm:prefix_cache_hits_total{label} {stats['prefix_cache_hits']}",
+            ]
+            if self.latency.encoder_cache_images:
+                lines += [
+                    f"vllm:mm_cache_queries_total{label} {stats['mm_cache_queries']}",
+                    f"vllm:mm_cache_hits_total{label} {stats['mm_cache_hits']}",
+                ]
+            for name in ("request_queue_time", "request_prefill_time", "request_decode_time", "e2e_request_latency"):
+                lines += [
+                    f"vllm:{name}_seconds_sum{label} {stats[name + '_seconds_sum']}",
+                    f"vllm:{name}_seconds_count{label} {stats[name + '_seconds_count']}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    # -- endpoints ---------------------------------------------------------
+
+    def models_body(self) -> dict:
+        names = self.models or ["mock"]
+        return {
+            "object": "list",
+            "data": [{"id": name, "object": "model", "created": 0, "owned_by": "mock"} for name in names],
+        }
+
+    async def tokens(self, start: float, ttft: float, n: int):
+        """yields token texts on the modeled schedule"""
+        for i in range(n):
+            deadline = start + ttft + i * self.latency.decode_per_token_s
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+            yield WORDS[i % len(WORDS)] if i == 0 else " " + WORDS[i % len(WORDS)]
+
+    async def chat_completions(self, body: dict, start: float, send):
+        prompt_tokens, cached, ttft, n = self.plan(body["model"], body["messages"], body.get("max_tokens"))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": n,
+            "total_tokens": prompt_tokens + n,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            text = "".join([token async for token in self.tokens(start, ttft, n)])
+            self.finish(body["model"], ttft, n)
+            await send(
+                200,
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "length" if n == body.get("max_tokens") else "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+            return
+        stream = await send(200, None)
+        async for token in self.tokens(start, ttft, n):
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            await stream(f"data: {json.dumps(chunk)}\n\n")
+        self.finish(body["model"], ttft, n)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            await stream(f"data: {json.dumps(chunk)}\n\n")
+        await stream("data: [DONE]\n\n")
+
+    async def messages(self, body: dict, start: float, send):
+        """
+        Anthropic Messages API. Usage follows cache breakpoints: the prompt up to the
+        last message with a `cache_control` block is read from the cache as far as the
+        prefix cache has it and written for the rest; only the tokens after it are
+        `input_tokens`. Without a breakpoint nothing is read or written
+        """
+        messages = body["messages"]
+        prompt_tokens, cached, ttft, n = self.plan(body["model"], messages, body.get("max_tokens"))
+        marked = [
+            k
+            for k, message in enumerate(messages)
+            if isinstance(message.get("content"), list)
+            and any("cache_control" in part for part in message["content"])
+        ]
+        cacheable = sum(tokens for _, tokens, _ in self.message_chain(messages[: marked[-1] + 1])) if marked else 0
+        read = min(cached, cacheable)
+        usage = {
+            "input_tokens": prompt_tokens - cacheable,
+            "output_tokens": n,
+            "cache_creation_input_tokens": cacheable - read,
+            "cache_read_input_tokens": read,
+        }
+        message = {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        if not body.get("stream"):
+            text = "".join([token async for token in self.tokens(start, ttft, n)])
+            message.update(content=[{"type": "text", "text": text}], stop_reason="end_turn")
+            self.finish(body["model"], ttft, n)
+            await send(200, message)
+            return
+        stream = await send(200, None)
+
+        async def event(name: str, data: dict):
+            await stream(f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n")
+
+        await event("message_start", {"message": {**message, "usage": {**usage, "output_tokens": 0}}})
+        await event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        async for token in self.tokens(start, ttft, n):
+            await event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": token}})
+        await event("content_block_stop", {"index": 0})
+        self.finish(body["model"], ttft, n)
+        await event(
+            "message_delta",
+            {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": n}},
+        )
+        await event("message_stop", {})
+
+    async def route(self, method: str, path: str, body: bytes, start: float, send):
+        path = path.split("?", 1)[0].rstrip("/")
+        if method == "GET" and path == "/v1/models":
+            await send(200, self.models_body())
+        elif method == "GET" and path == "/metrics":
+            await send(200, self.metrics_text())
+        elif method == "POST" and path in ("/v1/chat/completions", "/v1/messages"):
+            if self._errors.random() < self.error_rate:
+                await send(503, {"error": {"message": "injected overload"}})
+                return
+            request = json.loads(body)
+            if self.models is not None and request.get("model") not in self.models:
+                await send(404, {"error": {"message": f"model {request.get('model')} not served"}})
+                return
+            self.running += 1
+            try:
+                if path == "/v1/messages":
+                    await self.messages(request, start, send)
+                else:
+                    await self.chat_completions(request, start, send)
+            finally:
+                self.running -= 1
+        else:
+            await send(404, {"error": {"message": f"no route {method} {path}"}})
+
+    # -- HTTP/1.1 plumbing ---------------------------------------------------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        conn = h11.Connection(h11.SERVER)
+
+        async def next_event():
+            while True:
+                event = conn.next_event()
+                if event is not h11.NEED_DATA:
+                    return event
+                conn.receive_data(await reader.read(1 << 16))
+
+        try:
+            while True:
+                request = await next_event()
+                if not isinstance(request, h11.Request):
+                    break
+                start = time.perf_counter()
+                chunks = []
+                while not isinstance(event := await next_event(), h11.EndOfMessage):
+                    chunks.append(event.data)
+                body = b"".join(chunks)
+                if dict(request.headers).get(b"content-encoding") == b"gzip":
+                    body = gzip.decompress(body)
+
+                async def send(status: int, payload):
+                    """JSON or text payload -> complete response; None -> returns a writer for SSE"""
+                    if payload is not None:
+                        if isinstance(payload, str):
+                            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                        else:
+                            data, content_type = json.dumps(payload).encode(), "application/json"
+                        headers = [("content-type", content_type), ("content-length", str(len(data)))]
+                        writer.write(conn.send(h11.Response(status_code=status, headers=headers)))
+                        writer.write(conn.send(h11.Data(data=data)))
+                        writer.write(conn.send(h11.EndOfMessage()))
+                        await writer.drain()
+                        return None
+                    headers = [("content-type", "text/event-stream"), ("cache-control", "no-cache")]
+                    writer.write(conn.send(h11.Response(status_code=status, headers=headers)))
+
+                    async def stream(text: str):
+                        writer.write(conn.send(h11.Data(data=text.encode())))
+                        await writer.drain()
+
+                    return stream
+
+                try:
+                    await self.route(
+                        request.method.decode(), request.target.decode(), body, start, send
+                    )
+                except (ValueError, KeyError, TypeError) as error:
+                    if conn.our_state is not h11.SEND_RESPONSE:
+                        raise
+                    await send(400, {"error": {"message": f"bad request: {error!r}"}})
+                if conn.our_state is h11.SEND_BODY:
+                    writer.write(conn.send(h11.EndOfMessage()))
+                    await writer.drain()
+                if conn.our_state is h11.MUST_CLOSE or conn.their_state is h11.MUST_CLOSE:
+                    break
+                conn.start_next_cycle()
+        except (ConnectionError, h11.RemoteProtocolError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
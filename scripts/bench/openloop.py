@@ -0,0 +1,211 @@
+"""
+Open-loop load: turns are issued on a fixed or Poisson schedule, whether or not
+earlier ones came back, so a slow server cannot lower the offered load.
+
+Each scheduled request advances an idle conversation (its next turn needs the
+previous answer); when every conversation is busy the request waits for one, and
+that wait counts. Latency is measured from the intended send time, which is what
+a user arriving on schedule would see, and not from when the client got around to
+sending (coordinated omission).
+"""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict
+
+import pandas as pd
+
+from bench.histogram import LatencyHistogram
+from bench.history import FullHistory
+from bench.metrics import CSV_COLUMNS
+from bench.payload import ChatRequestBuilder
+
+
+class Session:
+    """one conversation advanced by whichever scheduled request picks it up"""
+
+    def __init__(self, session_id: int, seed: int, user_messages, strategy):
+        self.session_id = session_id
+        self.seed = seed
+        self.user_messages = iter(user_messages)  # lists or lazy bench.datasets iterators
+        self.next_message = next(self.user_messages, None)
+        self.strategy = strategy
+        self.builder = ChatRequestBuilder()
+        self.history = []
+        self.turn = 0
+
+    @property
+    def done(self) -> bool:
+        return self.next_message is None
+
+    def close(self):
+        """ends the conversation early, e.g. after a failed turn left its history unusable"""
+        self.next_message = None
+
+    async def step(self, backend, max_tokens: int):
+        user_message = self.strategy.prepare(self.next_message)
+        metrics = await backend.acomplete(self.history + [user_message], max_tokens, self.builder)
+        self.turn += 1
+        metrics.turn = self.turn
+        self.history = self.strategy.advance(self.history, user_message, metrics.response)
+        # lazy datasets read or generate the next turn here, off the event loop
+        self.next_message = await asyncio.to_thread(next, self.user_messages, None)
+        return metrics
+
+
+def issue_offsets(rate: float, duration_s: float, arrival: str, rng: random.Random) -> list[float]:
+    """send times (seconds from start) of a fixed-interval or Poisson schedule"""
+    offsets, offset = [], 0.0
+    while offset < duration_s:
+        offsets.append(offset)
+        offset += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+    return offsets
+
+
+async def run_open_loop(
+    backend,
+    build_messages,
+    max_tokens: int,
+    rate: float,
+    duration_s: float,
+    arrival: str = "poisson",
+    num_sessions: int = 64,
+    base_seed: int = 1337,
+    strategy_factory=None,
+):
+    """
+    Issues requests at `rate` per second for `duration_s`, then waits for all of them.
+    Returns (one row per request, {"latency", "service_time", "queue_delay"} histograms).
+
+    latency = done - intended send time, service_time = done - actual send time,
+    queue_delay = actual - intended send time (waiting for an idle conversation or
+    for the event loop). `backend` needs `acomplete`, see OpenAIBackend.
+    """
+    next_seed = base_seed
+
+    def new_session(session_id: int) -> Session:
+        nonlocal next_seed
+        session = Session(
+            session_id, next_seed, build_messages(next_seed), (strategy_factory or FullHistory)()
+        )
+        next_seed += 1
+        return session
+
+    idle = asyncio.Queue()
+    for session_id in range(num_sessions):
+        idle.put_nowait(new_session(session_id))
+
+    histograms = {
+        name: LatencyHistogram() for name in ("latency", "service_time", "queue_delay")
+    }
+    rows = []
+    start = time.perf_counter()
+
+    async def issue(request_id: int, intended: float):
+        session = await idle.get()
+        sent = time.perf_counter() - start
+        row = {
+            "request": request_id,
+            "session": session.session_id,
+            "seed": session.seed,
+            "intended_at": intended,
+            "sent_at": sent,
+        }
+        try:
+            metrics = await session.step(backend, max_tokens)
+            row.update(asdict(metrics), error=None)
+        except Exception as error:  # a failed request is a result, not a crash
+            row.update(turn=session.turn + 1, error=repr(error))
+            session.close()
+        done = time.perf_counter() - start
+        row.update(done_at=done, latency=done - intended, service_time=done - sent)
+        if row["error"] is None:
+            histograms["latency"].record(done - intended)
+            histograms["service_time"].record(done - sent)
+        histograms["queue_delay"].record(sent - intended)
+        rows.append(row)
+        idle.put_nowait(new_session(session.session_id) if session.done else session)
+
+    offsets = issue_offsets(rate, duration_s, arrival, random.Random(base_seed))
+    tasks = []
+    for request_id, intended in enumerate(offsets):
+        delay = intended - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(issue(request_id, intended)))
+    await asyncio.gather(*tasks)
+
+    df = pd.DataFrame(rows).sort_values("request").reset_index(drop=True)
+    # same columns as metrics.to_frame, so runs land in the store next to the others
+    df["inter_token_latencies"] = df["inter_token_latencies"].map(
+        lambda values: json.dumps(values) if isinstance(values, list) else None
+    )
+    return df.rename(columns=CSV_COLUMNS), histograms
+
+
+def trial_summary(rate: float, df: pd.DataFrame, histograms: dict) -> dict:
+    latency = histograms["latency"].summary()
+    errors = int(df["error"].notna().sum())
+    span = df["intended_at"].max() or 1.0
+    return {
+        "offered_rate": rate,
+        "requests": len(df),
+        "errors": errors,
+        "achieved_rate": (len(df) - errors) / (df["done_at"].max() or 1.0),
+        "issue_span_s": span,
+        **{f"latency_{key}": value for key, value in latency.items() if key != "count"},
+        "service_time_p99": histograms["service_time"].percentile(99),
+        "queue_delay_p99": histograms["queue_delay"].percentile(99),
+    }
+
+
+async def find_max_rate(
+    run_trial,
+    slo_p99_s: float,
+    start_rate: float = 0.5,
+    max_rate: float = 256.0,
+    growth: float = 2.0,
+    tolerance: float = 0.05,
+    max_error_rate: float = 0.0,
+):
+    """
+    Highest offered rate whose p99 latency (from intended send time) meets the SLO.
+    Grows the rate geometrically until a trial fails, then bisects between the last
+    passing and first failing rate until they are within `tolerance` of each other.
+    `run_trial(rate)` -> (df, histograms) as from run_open_loop.
+    Returns (best passing rate or None, one summary per trial).
+    """
+    trials = []
+
+    async def passes(rate: float) -> bool:
+        df, histograms = await run_trial(rate)
+        summary = trial_summary(rate, df, histograms)
+        summary["passed"] = (
+            summary["latency_p99"] <= slo_p99_s
+            and summary["errors"] <= max_error_rate * summary["requests"]
+        )
+        trials.append(summary)
+        print(
+            f"rate {rate:.2f}/s: p99 {summary['latency_p99']:.3f}s, "
+            f"errors {summary['errors']}, {'pass' if summary['passed'] else 'fail'}"
+        )
+        return summary["passed"]
+
+    good, bad, rate = None, None, start_rate
+    while rate <= max_rate:
+        if await passes(rate):
+            good, rate = rate, rate * growth
+        else:
+            bad = rate
+            break
+    if good is None or bad is None:
+        return good, trials  # fails at the lowest rate, or never fails below max_rate
+    while (bad - good) / good > tolerance:
+        middle = (good + bad) / 2
+        if await passes(middle):
+            good = middle
+        else:
+            bad = middle
+    return good, trials
@@ -0,0 +1,113 @@
+"""
+Several seeds of one configuration in one process, so they share the server's
+spare capacity and the same stretch of time instead of running back to back.
+
+    serial       one seed after another, as separate invocations used to
+    concurrent   every seed runs its conversation on its own thread, free-running
+    interleaved  turn i of every seed (on up to `workers` threads at once) before
+                 any seed starts turn i + 1, so all seeds see the server equally warm
+
+Each seed is its own conversation with its own history strategy, a run "seed=N" in
+the bench.live sink; results come back per seed so every seed keeps its own CSV and
+store partition. Threads suffice, the work is waiting on the server. Backends keep
+per-conversation state (a request builder, a traced client's last request), so
+`turns_of` gives every seed a backend of its own.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.live import LiveRun, RegressionAbort
+from bench.steady import flag_turns
+
+SCHEDULES = ("serial", "concurrent", "interleaved")
+
+
+def run_seeds(
+    turns_of,
+    seeds: list[int],
+    schedule: str = "serial",
+    workers: int | None = None,
+    warmup_turns: int = 0,
+    live: LiveRun | None = None,
+) -> dict[int, list]:
+    """
+    `turns_of(seed, done)` -> iterator of a conversation's new TurnMetrics after the
+    turns `done`, e.g. bench.engine.conversation_turns with resume=done. Every turn
+    goes through `live` (bench.live: sink, dashboard, abort rule), whose earlier turns
+    are resumed. Returns {seed: flagged turns} in `seeds` order; after an abort, the
+    turns run so far
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"schedule must be one of {SCHEDULES}")
+    live = live or LiveRun()
+    workers = workers or len(seeds)
+    runs = {seed: f"seed={seed}" for seed in seeds}
+    turns = {seed: list(live.done(runs[seed])) for seed in seeds}
+
+    def step(seed, iterator):
+        return live.step(runs[seed], iterator, turns[seed])
+
+    def run(seed):
+        iterator = iter(turns_of(seed, list(turns[seed])))
+        while step(seed, iterator) is not None:
+            pass
+
+    try:
+        if schedule == "serial":
+            for seed in seeds:
+                run(seed)
+        elif schedule == "concurrent":
+            with ThreadPoolExecutor(workers) as pool:
+                list(pool.map(run, seeds))
+        else:
+            running = {seed: iter(turns_of(seed, list(turns[seed]))) for seed in seeds}
+            with ThreadPoolExecutor(workers) as pool:
+                while running:
+                    active = list(running)
+                    for seed, metrics in zip(active, pool.map(step, active, [running[s] for s in active])):
+                        if metrics is None:
+                            del running[seed]
+    except RegressionAbort as abort:
+        print(f"=== aborting: {abort}")
+    return {seed: flag_turns(seed_turns, warmup_turns) for seed, seed_turns in turns.items()}
+
+
+def seed_path(path: str, seed: int, seeds: list[int]) -> str:
+    """`path` for a single seed, else with the seed before its extension"""
+    if len(seeds) == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_seed{seed}{ext}"
+
+
+def add_seed_arguments(parser, default: int = 1337):
+    group = parser.add_argument_group("seeds")
+    group.add_argument(
+        "--seeds",
+        "--data_seed",
+        dest="seeds",
+        nargs="+",
+        type=int,
+        default=[default],
+        help="one conversation per seed; with several, each gets its own CSV (_seedN) and store partition",
+    )
+    group.add_argument(
+        "--schedule",
+        choices=SCHEDULES,
+        default="interleaved",
+        help="how several seeds share the server, see bench/parallel.py",
+    )
+    group.add_argument(
+        "--parallel_seeds",
+        type=int,
+        default=None,
+        help="seeds in flight at once (default: all)",
+    )
+    group.add_argument(
+        "--warmup_turns",
+        type=int,
+        default=0,
+        help="leading turns of each seed flagged as warm-up, before MSER looks for more",
+    )
+    return group
@@ -0,0 +1,125 @@
+import json
+import time
+
+from openai.types.chat import ChatCompletion
+
+from bench.timing import RequestPhases
+
+JSON_HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer EMPTY"}
+
+
+class ChatRequestBuilder:
+    """
+    Builds /chat/completions request bodies out of pre-serialized message fragments.
+
+    A message is serialized once, the first time it is sent, and its bytes are reused
+    on every later turn. Image URLs are serialized once per distinct string, so the
+    shared data URLs from `ImagePayloadCache` are JSON-encoded once per image rather
+    than once per turn. Treat messages as immutable after they were sent: replace a
+    history entry instead of editing it in place.
+    """
+
+    def __init__(self):
+        self._messages = {}  # id(message) -> (message, fragment); holding message pins the id
+        self._urls = {}  # url str -> json fragment
+
+    def _url(self, url: str) -> bytes:
+        fragment = self._urls.get(url)
+        if fragment is None:
+            fragment = self._urls[url] = json.dumps(url).encode()
+        return fragment
+
+    def _part(self, part: dict) -> bytes:
+        if part.get("type") != "image_url":
+            return json.dumps(part).encode()
+        fields = [
+            b'"image_url": {"url": ' + self._url(part["image_url"]["url"]) + b"}"
+            if key == "image_url"
+            else json.dumps(key).encode() + b": " + json.dumps(value).encode()
+            for key, value in part.items()
+        ]
+        return b"{" + b", ".join(fields) + b"}"
+
+    def message(self, message: dict) -> bytes:
+        cached = self._messages.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+
+        fields = []
+        for key, value in message.items():
+            if key == "content" and isinstance(value, list):
+                encoded = b"[" + b", ".join(self._part(part) for part in value) + b"]"
+            else:
+                encoded = json.dumps(value).encode()
+            fields.append(json.dumps(key).encode() + b": " + encoded)
+        fragment = b"{" + b", ".join(fields) + b"}"
+        self._messages[id(message)] = (message, fragment)
+        return fragment
+
+    def build(self, messages: list[dict], **params) -> bytes:
+        fragments = [self.message(m) for m in messages]
+        # forget messages, and image urls, that left the history so memory tracks the
+        # current request
+        if len(self._messages) > len(messages):
+            keep = {id(m) for m in messages}
+            self._messages = {k: v for k, v in self._messages.items() if k in keep}
+            urls = {
+                part["image_url"]["url"]
+                for m in messages
+                if isinstance(m["content"], list)
+                for part in m["content"]
+                if part.get("type") == "image_url"
+            }
+            self._urls = {url: fragment for url, fragment in self._urls.items() if url in urls}
+        body = b'{"messages": [' + b", ".join(fragments) + b"]"
+        if params:
+            body += b", " + json.dumps(params).encode()[1:-1]
+        return body + b"}"
+
+
+def build_timed(builder: ChatRequestBuilder, messages: list[dict], **params):
+    """returns (body, seconds spent serializing) so it can be kept out of the latency"""
+    start = time.perf_counter()
+    body = builder.build(messages, **params)
+    return body, time.perf_counter() - start
+
+
+def post_chat_completion(client, body: bytes, headers: dict = JSON_HEADERS):
+    """
+    Sends a pre-built body with an httpx.Client whose base_url ends in /v1.
+    Returns (ChatCompletion, per-phase timing dict, see RequestPhases.summary)
+    """
+    phases = RequestPhases()
+    response = client.post(
+        "/chat/completions",
+        content=body,
+        headers=headers,
+        extensions={"trace": phases},
+    )
+    response.raise_for_status()
+    return _parse(response, body, phases)
+
+
+async def apost_chat_completion(client, body: bytes, headers: dict = JSON_HEADERS):
+    """async twin of post_chat_completion for an httpx.AsyncClient"""
+    phases = RequestPhases()
+    response = await client.post(
+        "/chat/completions",
+        content=body,
+        headers=headers,
+        extensions={"trace": phases.atrace},
+    )
+    response.raise_for_status()
+    return _parse(response, body, phases)
+
+
+def _parse(response, body: bytes, phases: RequestPhases):
+    start = time.perf_counter()
+    completion = ChatCompletion.model_validate_json(response.content)
+    timing = {
+        "request_bytes": len(body),
+        "response_bytes": len(response.content),
+        **phases.summary(),
+        "parse_time": time.perf_counter() - start,
+    }
+    return completion, timing
@@ -0,0 +1,207 @@
+"""
+Replay of recorded sessions with their original timing.
+
+A trace is anonymized: one row per user turn with when it was sent, which
+session it belongs to and how big it was, not what it said. Replay rebuilds each
+turn as filler text of the recorded length plus a synthetic image of the recorded
+dimensions, and sends it at its recorded offset (divided by `speedup`), so the
+server sees the production mix of concurrency and history lengths.
+
+A turn cannot be sent before its session's previous answer arrives. When the
+endpoint is slower than production, the turn goes out late; that lag is recorded
+and, as in bench.openloop, latency is measured from the scheduled time.
+"""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+from bench.datasets import filler_text, image_message, synthetic_image_url
+from bench.histogram import LatencyHistogram
+from bench.history import FullHistory
+from bench.load import PERCENTILES
+from bench.metrics import CSV_COLUMNS
+from bench.payload import ChatRequestBuilder
+
+# column -> default when the trace leaves it out
+TRACE_COLUMNS = {
+    "timestamp": None,  # seconds, or anything pandas parses as a datetime
+    "session": None,
+    "text_chars": None,  # or text_tokens (x4), or the text itself as text
+    "image_width": 0,  # 0: text-only turn
+    "image_height": 0,
+    "max_tokens": None,  # falls back to the replay default
+}
+
+
+def load_trace(path: str) -> pd.DataFrame:
+    """JSONL, CSV or Parquet trace -> rows sorted by time, with `offset_s` and `depth`"""
+    if path.endswith(".parquet"):
+        trace = pd.read_parquet(path)
+    elif path.endswith(".csv"):
+        trace = pd.read_csv(path)
+    else:
+        trace = pd.read_json(path, lines=True)
+    missing = {"timestamp", "session"} - set(trace.columns)
+    if missing:
+        raise ValueError(f"trace {path} has no {sorted(missing)} column")
+
+    if pd.api.types.is_numeric_dtype(trace["timestamp"]):
+        seconds = trace["timestamp"].astype(float)
+    else:
+        seconds = pd.to_datetime(trace["timestamp"], utc=True).astype("int64") / 1e9
+    trace["offset_s"] = seconds - seconds.min()
+
+    if "text_chars" not in trace.columns:
+        if "text" in trace.columns:
+            trace["text_chars"] = trace["text"].fillna("").str.len()
+        elif "text_tokens" in trace.columns:
+            trace["text_chars"] = trace["text_tokens"] * 4
+        else:
+            trace["text_chars"] = 64
+    for column, default in TRACE_COLUMNS.items():
+        if column not in trace.columns:
+            trace[column] = default
+    trace[["image_width", "image_height"]] = (
+        trace[["image_width", "image_height"]].fillna(0).astype(int)
+    )
+
+    trace = trace.sort_values(["offset_s"], kind="stable").reset_index(drop=True)
+    trace["depth"] = trace.groupby("session").cumcount() + 1
+    return trace
+
+
+def trace_message(
+    row: dict,
+    rng: random.Random,
+    pixels: np.random.Generator,
+    entropy: float,
+    format: str,
+    quality: int,
+) -> dict:
+    """the user message a trace row stands for: recorded text if any, else filler"""
+    text = row.get("text")
+    if not isinstance(text, str):
+        text = filler_text(rng, int(row["text_chars"]))
+    if row["image_width"] and row["image_height"]:
+        url = synthetic_image_url(
+            pixels, int(row["image_width"]), int(row["image_height"]), entropy, format, quality
+        )
+        return image_message(url, text)
+    return {"role": "user", "content": text}
+
+
+async def run_replay(
+    backend,
+    trace: pd.DataFrame,
+    speedup: float = 1.0,
+    max_tokens: int = 32,
+    strategy_factory=None,
+    entropy: float = 0.5,
+    format: str = "jpeg",
+    quality: int = 85,
+    seed: int = 1337,
+    prepare_ahead_s: float = 2.0,
+):
+    """
+    Replays `trace` (see load_trace), one task per session. Returns (one row per turn,
+    {"latency", "service_time", "lag"} histograms); `backend` needs `acomplete`.
+    """
+    histograms = {name: LatencyHistogram() for name in ("latency", "service_time", "lag")}
+    rows = []
+    in_flight = 0
+    # the schedule starts prepare_ahead_s from now so first turns are built in time
+    start = time.perf_counter() + prepare_ahead_s
+
+    async def sleep_until(offset: float):
+        delay = offset - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def session(session_id, turns: pd.DataFrame, session_seed: int):
+        nonlocal in_flight
+        strategy = (strategy_factory or FullHistory)()
+        builder = ChatRequestBuilder()
+        rng, pixels = random.Random(session_seed), np.random.default_rng(session_seed)
+
+        def build(row):
+            # off the event loop, and while the previous turn is in flight
+            return asyncio.create_task(
+                asyncio.to_thread(trace_message, row, rng, pixels, entropy, format, quality)
+            )
+
+        rows_in_order = turns.to_dict("records")
+        await sleep_until(rows_in_order[0]["offset_s"] / speedup - prepare_ahead_s)
+        next_message = build(rows_in_order[0])
+        history = []
+        for i, row in enumerate(rows_in_order):
+            scheduled = row["offset_s"] / speedup
+            user_message = strategy.prepare(await next_message)
+            if i + 1 < len(rows_in_order):
+                next_message = build(rows_in_order[i + 1])
+            await sleep_until(scheduled)
+            sent = time.perf_counter() - start
+            in_flight += 1
+            record = {
+                "session": session_id,
+                "depth": row["depth"],
+                "scheduled_at": scheduled,
+                "sent_at": sent,
+                "in_flight": in_flight,
+                "image_pixels": row["image_width"] * row["image_height"],
+            }
+            turn_max_tokens = row["max_tokens"]
+            if turn_max_tokens is None or pd.isna(turn_max_tokens):
+                turn_max_tokens = max_tokens
+            try:
+                metrics = await backend.acomplete(
+                    history + [user_message], int(turn_max_tokens), builder
+                )
+            except Exception as error:  # the session cannot go on without its answer
+                in_flight -= 1
+                rows.append({**record, "error": repr(error)})
+                if i + 1 < len(rows_in_order):
+                    await next_message
+                return
+            in_flight -= 1
+            done = time.perf_counter() - start
+            metrics.turn = row["depth"]
+            record.update(asdict(metrics), error=None, done_at=done)
+            record.update(latency=done - scheduled, lag=sent - scheduled)
+            histograms["latency"].record(done - scheduled)
+            histograms["service_time"].record(done - sent)
+            histograms["lag"].record(sent - scheduled)
+            rows.append(record)
+            history = strategy.advance(history, user_message, metrics.response)
+
+    groups = trace.groupby("session", sort=False)
+    await asyncio.gather(
+        *(session(session_id, turns, seed + k) for k, (session_id, turns) in enumerate(groups))
+    )
+
+    df = pd.DataFrame(rows).sort_values(["sent_at"]).reset_index(drop=True)
+    if "inter_token_latencies" in df.columns:
+        df["inter_token_latencies"] = df["inter_token_latencies"].map(
+            lambda values: json.dumps(values) if isinstance(values, list) else None
+        )
+    return df.rename(columns=CSV_COLUMNS), histograms
+
+
+def depth_report(df: pd.DataFrame) -> pd.DataFrame:
+    """latency percentiles, prompt size and lag per session depth (turn index)"""
+    ok = df[df["error"].isna()]
+    metrics = ["times_to_completion", "latency"]
+    if ok["times_to_first_token"].notna().any():
+        metrics.append("times_to_first_token")
+    per_depth = ok.groupby("depth")[metrics].quantile(PERCENTILES).unstack()
+    per_depth.columns = [f"{metric}_p{int(q * 100)}" for metric, q in per_depth.columns]
+    per_depth.insert(0, "requests", df.groupby("depth").size())
+    per_depth.insert(1, "errors", df.groupby("depth")["error"].count())
+    per_depth["mean_prompt_tokens"] = ok.groupby("depth")["prompt_tokens"].mean()
+    per_depth["mean_lag"] = ok.groupby("depth")["lag"].mean()
+    return per_depth.reset_index()
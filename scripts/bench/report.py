@@ -0,0 +1,233 @@
+"""
+Headless replacement for the charts in plots.ipynb: per-turn statistics with bootstrap
+confidence intervals across runs, latency growth per turn, and regression flags
+against a previous report.
+
+All groups are packed into one NaN padded (group, run, turn) array, so every
+statistic is a single vectorized NumPy call over the whole results set.
+"""
+
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def nan_percentile(values: np.ndarray, q, axis: int) -> np.ndarray:
+    """
+    np.nanpercentile with linear interpolation, but one sort instead of a Python loop
+    over every slice that contains a NaN (which is most of them with padded runs)
+    """
+    values = np.sort(np.moveaxis(values, axis, -1), axis=-1)  # NaNs sort last
+    count = (~np.isnan(values)).sum(axis=-1, keepdims=True)
+    q = np.asarray(q, dtype=float)
+    position = (count - 1).clip(0) * q.reshape(q.shape + (1,) * values.ndim) / 100
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, (count - 1).clip(0))
+    values = np.broadcast_to(values, q.shape + values.shape)
+    value_low = np.take_along_axis(values, low, axis=-1)
+    value_high = np.take_along_axis(values, high, axis=-1)
+    result = value_low + (value_high - value_low) * (position - low)
+    return np.where(count > 0, result, np.nan)[..., 0]
+
+
+STATISTICS = {
+    "mean": lambda values, axis: np.nanmean(values, axis=axis),
+    "p50": lambda values, axis: nan_percentile(values, 50, axis=axis),
+    "p95": lambda values, axis: nan_percentile(values, 95, axis=axis),
+    "p99": lambda values, axis: nan_percentile(values, 99, axis=axis),
+}
+
+
+def run_matrix(df: pd.DataFrame, metric: str, by: list[str]):
+    """
+    store rows -> (group keys, values[group, run, turn - 1], seeds per group); runs
+    are told apart by run_id, missing turns stay NaN
+    """
+    df = df.dropna(subset=[metric])
+    runs = df[by + ["run_id", "seed"]].drop_duplicates("run_id").sort_values(by + ["seed"])
+    runs["group"] = runs.groupby(by, sort=False).ngroup()
+    runs["run"] = runs.groupby("group").cumcount()
+    df = df.merge(runs[["run_id", "group", "run"]], on="run_id")
+
+    values = np.full(
+        (runs["group"].max() + 1, runs["run"].max() + 1, df["turn"].max()), np.nan
+    )
+    values[df["group"], df["run"], df["turn"] - 1] = df[metric]
+    keys = runs.drop_duplicates("group")[by].to_dict("records")
+    seeds = runs.groupby("group")["seed"].apply(list).tolist()
+    return keys, values, seeds
+
+
+def resample_runs(values: np.ndarray, n_boot: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (group, run, ...) -> (group, boot, run, ...) drawing each group's runs with
+    replacement; groups with fewer runs than the widest one draw NaN padding slots
+    """
+    n_runs = (~np.isnan(values)).any(axis=tuple(range(2, values.ndim))).sum(axis=1)
+    draws = rng.random((len(values), n_boot, values.shape[1]))
+    n_runs = n_runs[:, None, None]
+    index = np.floor(draws * n_runs).astype(int)
+    index = np.where(np.arange(values.shape[1]) < n_runs, index, n_runs)
+    padded = np.concatenate([values, np.full_like(values[:, :1], np.nan)], axis=1)
+    return np.take_along_axis(
+        padded[:, None], index.reshape(index.shape + (1,) * (values.ndim - 2)), axis=2
+    )
+
+
+def confidence_interval(samples: np.ndarray, confidence: float, axis: int = 1):
+    tail = (1 - confidence) / 2 * 100
+    return nan_percentile(samples, [tail, 100 - tail], axis=axis)
+
+
+def growth_slopes(values: np.ndarray) -> np.ndarray:
+    """least squares slope of the metric vs turn index for every (…, run), NaN aware"""
+    turns = np.broadcast_to(np.arange(values.shape[-1], dtype=float), values.shape)
+    mask = ~np.isnan(values)
+    count = mask.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.where(mask, turns, 0).sum(axis=-1) / count
+        y_mean = np.nansum(values, axis=-1) / count
+        dx = np.where(mask, turns - x_mean[..., None], 0)
+        dy = np.where(mask, values - y_mean[..., None], 0)
+        return (dx * dy).sum(axis=-1) / (dx * dx).sum(axis=-1)
+
+
+def build_report(
+    df: pd.DataFrame,
+    metric: str = "times_to_completion",
+    by: tuple[str, ...] = ("model", "config"),
+    n_boot: int = 2000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    exclude: tuple[str, ...] = ("warmup", "outlier"),
+) -> dict:
+    """
+    For every group: per-turn and overall mean/p50/p95/p99, the slope of the metric
+    per turn of history, each with a bootstrap CI over the group's runs (seeds).
+    Turns flagged by any of the `exclude` columns (see bench.steady) are left out
+    """
+    by = list(by)
+    flagged = [column for column in exclude if column in df]
+    if flagged:
+        df = df[~df[flagged].eq(True).any(axis=1)]
+    keys, values, seeds = run_matrix(df, metric, by)
+    rng = np.random.default_rng(seed)
+    boot = resample_runs(values, n_boot, rng)  # group, boot, run, turn
+    pooled = boot.reshape(boot.shape[0], n_boot, -1)  # every turn of every drawn run
+
+    per_turn, overall = {}, {}
+    # all-NaN slices (padding, turns only some runs reached) are expected here
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for name, statistic in STATISTICS.items():
+            per_turn[name] = statistic(values, 1)
+            per_turn[f"{name}_ci"] = confidence_interval(statistic(boot, 2), confidence)
+            overall[name] = statistic(values.reshape(len(values), -1), 1)
+            overall[f"{name}_ci"] = confidence_interval(statistic(pooled, 2), confidence)
+
+        slope = np.nanmean(growth_slopes(values), axis=1)  # mean over the group's runs
+        slope_ci = confidence_interval(np.nanmean(growth_slopes(boot), axis=2), confidence)
+
+    groups = []
+    for g, key in enumerate(keys):
+        n_turns = int(np.flatnonzero((~np.isnan(values[g])).any(axis=0))[-1]) + 1
+        groups.append(
+            {
+                "key": key,
+                "seeds": [int(s) for s in seeds[g]],
+                "runs": len(seeds[g]),
+                "turns": n_turns,
+                "overall": {
+                    name: {
+                        "value": float(overall[name][g]),
+                        "ci": overall[f"{name}_ci"][:, g].tolist(),
+                    }
+                    for name in STATISTICS
+                },
+                "slope_per_turn": {
+                    "value": float(slope[g]),
+                    "ci": slope_ci[:, g].tolist(),
+                },
+                "per_turn": {
+                    name: {
+                        "value": per_turn[name][g, :n_turns].tolist(),
+                        "ci_low": per_turn[f"{name}_ci"][0, g, :n_turns].tolist(),
+                        "ci_high": per_turn[f"{name}_ci"][1, g, :n_turns].tolist(),
+                    }
+                    for name in STATISTICS
+                },
+            }
+        )
+    return {
+        "metric": metric,
+        "by": by,
+        "n_boot": n_boot,
+        "confidence": confidence,
+        "excluded": flagged,
+        "groups": groups,
+    }
+
+
+def find_regressions(report: dict, baseline: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    A statistic regresses when it got worse than the baseline by more than `threshold`
+    (relative) and the confidence intervals no longer overlap.
+    """
+    baseline_groups = {json.dumps(g["key"], sort_keys=True): g for g in baseline["groups"]}
+    regressions = []
+    for group in report["groups"]:
+        before = baseline_groups.get(json.dumps(group["key"], sort_keys=True))
+        if before is None:
+            continue
+        pairs = [(name, group["overall"][name], before["overall"][name]) for name in STATISTICS]
+        pairs.append(("slope_per_turn", group["slope_per_turn"], before["slope_per_turn"]))
+        for name, current, previous in pairs:
+            change = (current["value"] - previous["value"]) / abs(previous["value"] or np.nan)
+            if change > threshold and current["ci"][0] > previous["ci"][1]:
+                regressions.append(
+                    {
+                        "key": group["key"],
+                        "statistic": name,
+                        "baseline": previous["value"],
+                        "current": current["value"],
+                        "change": change,
+                    }
+                )
+    return regressions
+
+
+def plot_report(report: dict, path: str, statistics=("p50", "p95")):
+    """per-turn curves with their CI bands, one panel per statistic, in ms like the notebook"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(
+        1, len(statistics), figsize=(12 * len(statistics), 8), squeeze=False
+    )
+    colors = plt.cm.Set1(np.linspace(0, 1, max(len(report["groups"]), 1)))
+    for ax, name in zip(axes[0], statistics):
+        for color, group in zip(colors, report["groups"]):
+            curve = group["per_turn"][name]
+            turns = np.arange(1, len(curve["value"]) + 1)
+            label = " | ".join(str(v) for v in group["key"].values())
+            label += f" (+{group['slope_per_turn']['value'] * 1000:.1f} ms/turn)"
+            ax.plot(turns, np.array(curve["value"]) * 1000, label=label, color=color, linewidth=2)
+            ax.fill_between(
+                turns,
+                np.array(curve["ci_low"]) * 1000,
+                np.array(curve["ci_high"]) * 1000,
+                color=color,
+                alpha=0.2,
+            )
+        ax.set_xlabel("Turn")
+        ax.set_ylabel(f"{report['metric']} {name} (ms)")
+        ax.set_title(f"{name} with {report['confidence']:.0%} bootstrap CI across seeds")
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
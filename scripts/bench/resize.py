@@ -0,0 +1,75 @@
+"""
+Client-side downscaling to a visual-token budget.
+
+Qwen2.5-VL turns every 28x28 pixel block into one visual token (14px patches,
+merged 2x2), so an image resized to h x w on the 28px grid costs h*w / 784 tokens
+of prefill. `smart_resize` follows the model's own image processor, so the server
+does not resize again and the token count is known before sending.
+"""
+
+import io
+import math
+from dataclasses import dataclass
+
+PATCH = 28
+MIN_PIXELS = 4 * PATCH * PATCH
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+@dataclass(frozen=True)
+class ImageBudget:
+    """
+    Target size and encoding of every image. `max_pixels` None keeps the resolution
+    (only snapped to the 28px grid) and just re-encodes.
+    """
+
+    max_pixels: int | None = None
+    format: str = "jpeg"
+    quality: int = 85
+
+    @classmethod
+    def from_tokens(cls, visual_tokens: int, **kwargs):
+        return cls(max_pixels=visual_tokens * PATCH * PATCH, **kwargs)
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def key(self) -> str:
+        """file name safe id, part of the payload cache key"""
+        return f"{self.max_pixels or 'native'}px-{self.format}-q{self.quality}"
+
+
+def smart_resize(height: int, width: int, max_pixels: int | None, min_pixels: int = MIN_PIXELS):
+    """(height, width) rounded to the 28px grid with min_pixels <= h*w <= max_pixels, aspect kept"""
+    h = max(PATCH, round(height / PATCH) * PATCH)
+    w = max(PATCH, round(width / PATCH) * PATCH)
+    if max_pixels is not None and h * w > max_pixels:
+        scale = math.sqrt(height * width / max_pixels)
+        h = max(PATCH, math.floor(height / scale / PATCH) * PATCH)
+        w = max(PATCH, math.floor(width / scale / PATCH) * PATCH)
+    elif h * w < min_pixels:
+        scale = math.sqrt(min_pixels / (height * width))
+        h = math.ceil(height * scale / PATCH) * PATCH
+        w = math.ceil(width * scale / PATCH) * PATCH
+    return h, w
+
+
+def visual_tokens(height: int, width: int) -> int:
+    """tokens of an image that is already on the 28px grid"""
+    return (height // PATCH) * (width // PATCH)
+
+
+def encode_image(image_path: str, budget: ImageBudget) -> bytes:
+    """the image resized to the budget and re-encoded"""
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+        height, width = smart_resize(image.height, image.width, budget.max_pixels)
+        if (height, width) != (image.height, image.width):
+            image = image.resize((width, height), Image.Resampling.BICUBIC)
+        buffer = io.BytesIO()
+        image.save(buffer, format=budget.format.upper(), quality=budget.quality)
+    return buffer.getvalue()
@@ -0,0 +1,167 @@
+"""
+Client-side routing of conversations across several OpenAI compatible replicas.
+
+Each replica has its own prefix cache, so where a conversation's next turn lands
+decides whether its history is prefilled again. The policies:
+
+    round_robin        turn after turn over the replicas, ignoring sessions
+    least_outstanding  the replica with fewest requests in flight
+    session_affinity   consistent hash of the session onto a ring of replicas, so a
+                       conversation stays put and only 1/N of them move when a
+                       replica is added or removed
+
+A session is one request builder: every conversation in bench.engine, bench.load,
+bench.openloop and bench.replay owns exactly one.
+"""
+
+import bisect
+import hashlib
+import itertools
+import uuid
+import weakref
+
+import httpx
+import pandas as pd
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig
+from bench.load import PERCENTILES
+from bench.server_metrics import MetricsScraper, metrics_url
+
+
+class Replica:
+    def __init__(self, base_url: str, backend: OpenAIBackend):
+        self.base_url = base_url
+        self.backend = backend
+        self.outstanding = 0
+
+
+class RoundRobin:
+    name = "round_robin"
+
+    def __init__(self, replicas: list[Replica]):
+        self._next = itertools.cycle(replicas)
+
+    def choose(self, session: str) -> Replica:
+        return next(self._next)
+
+
+class LeastOutstanding:
+    name = "least_outstanding"
+
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = replicas
+        self._ties = itertools.count()
+
+    def choose(self, session: str) -> Replica:
+        # rotate the starting point so ties do not all go to the first replica
+        start = next(self._ties) % len(self.replicas)
+        order = self.replicas[start:] + self.replicas[:start]
+        return min(order, key=lambda replica: replica.outstanding)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class SessionAffinity:
+    name = "session_affinity"
+
+    def __init__(self, replicas: list[Replica], virtual_nodes: int = 128):
+        ring = sorted(
+            (_hash(f"{replica.base_url}#{i}"), replica)
+            for replica in replicas
+            for i in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in ring]
+        self._replicas = [replica for _, replica in ring]
+
+    def choose(self, session: str) -> Replica:
+        index = bisect.bisect(self._points, _hash(session)) % len(self._points)
+        return self._replicas[index]
+
+
+POLICIES = {policy.name: policy for policy in (RoundRobin, LeastOutstanding, SessionAffinity)}
+
+
+class RoutedBackend:
+    """
+    `acomplete` over several replicas; each turn's `endpoint` records where it went.
+    One pooled keep-alive httpx.AsyncClient per replica, built from `client_config`
+    (see bench.clients); its HTTP/2 needs a server or proxy that speaks it, vLLM's
+    own server is HTTP/1.1 only.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        model_name: str,
+        base_urls: list[str],
+        policy: str = "session_affinity",
+        stream: bool = False,
+        client_config: ClientConfig | None = None,
+    ):
+        self.model_name = model_name
+        self.stream = stream
+        self.replicas = []
+        for base_url in base_urls:
+            backend = OpenAIBackend(
+                model_name, base_url=base_url, stream=stream, client_config=client_config
+            )
+            self.replicas.append(Replica(base_url, backend))
+        self.policy = POLICIES[policy](self.replicas)
+        self._sessions = weakref.WeakKeyDictionary()  # builder -> session key
+
+    def session_key(self, builder) -> str:
+        if builder not in self._sessions:
+            self._sessions[builder] = uuid.uuid4().hex
+        return self._sessions[builder]
+
+    async def acomplete(self, messages: list[dict], max_tokens: int, builder):
+        replica = self.policy.choose(self.session_key(builder))
+        replica.outstanding += 1
+        try:
+            metrics = await replica.backend.acomplete(messages, max_tokens, builder)
+        finally:
+            replica.outstanding -= 1
+        metrics.endpoint = replica.base_url
+        return metrics
+
+    def scrape(self) -> dict:
+        """/metrics of every replica that exposes one, by base url"""
+        snapshots = {}
+        for replica in self.replicas:
+            try:
+                snapshots[replica.base_url] = MetricsScraper(
+                    metrics_url(replica.base_url), self.model_name
+                ).scrape()
+            except httpx.HTTPError:
+                snapshots[replica.base_url] = None
+        return snapshots
+
+
+def replica_summary(df: pd.DataFrame, before: dict | None = None, after: dict | None = None):
+    """
+    Per replica: requests, latency percentiles and the prefix cache hit rate, from
+    the server's own counters when scraped `before`/`after` the run, else from the
+    `cached_tokens` each response reported
+    """
+    grouped = df.groupby("endpoint")
+    summary = grouped["times_to_completion"].quantile(PERCENTILES).unstack()
+    summary.columns = [f"times_to_completion_p{int(q * 100)}" for q in summary.columns]
+    summary.insert(0, "requests", grouped.size())
+    if "session" in df:
+        summary.insert(1, "sessions", grouped["session"].nunique())
+    if df["times_to_first_token"].notna().any():
+        summary["times_to_first_token_p50"] = grouped["times_to_first_token"].median()
+    summary["prompt_tokens"] = grouped["prompt_tokens"].sum()
+    summary["cached_tokens"] = grouped["cache_read_input_tokens"].sum(min_count=1)
+    summary["cache_hit_rate"] = summary["cached_tokens"] / summary["prompt_tokens"]
+    for endpoint in summary.index:
+        start, end = (before or {}).get(endpoint), (after or {}).get(endpoint)
+        if start and end and start["prefix_cache_queries"] is not None:
+            queries = end["prefix_cache_queries"] - start["prefix_cache_queries"]
+            hits = end["prefix_cache_hits"] - start["prefix_cache_hits"]
+            summary.loc[endpoint, "server_prefix_cache_hit_rate"] = hits / queries if queries else None
+    return summary.reset_index()
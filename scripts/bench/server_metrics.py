@@ -0,0 +1,161 @@
+"""
+Per-turn server-side attribution from vLLM's Prometheus `/metrics` endpoint.
+
+`/metrics` is scraped right before and right after each turn; counter and
+histogram deltas between the two belong to that turn as long as nothing else
+talks to the server meanwhile (single conversation runs, not s7/s14 load).
+"""
+
+import re
+import time
+
+import httpx
+
+# field -> metric families it is read from, newest vLLM name first
+COUNTERS = {
+    "prefix_cache_queries": ["vllm:prefix_cache_queries", "vllm:gpu_prefix_cache_queries"],
+    "prefix_cache_hits": ["vllm:prefix_cache_hits", "vllm:gpu_prefix_cache_hits"],
+    "mm_cache_queries": ["vllm:mm_cache_queries"],
+    "mm_cache_hits": ["vllm:mm_cache_hits"],
+}
+GAUGES = {
+    "kv_cache_usage": ["vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc"],
+}
+HISTOGRAMS = {
+    "queue_time": ["vllm:request_queue_time_seconds"],
+    "prefill_time": ["vllm:request_prefill_time_seconds"],
+    "decode_time": ["vllm:request_decode_time_seconds"],
+    "requests": ["vllm:e2e_request_latency_seconds"],  # only its count is used
+}
+
+SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)")
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> dict[str, list[tuple[dict, float]]]:
+    """Prometheus text exposition -> sample name -> [(labels, value)]"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        samples.setdefault(name, []).append((dict(LABEL.findall(labels or "")), float(value)))
+    return samples
+
+
+def metrics_url(base_url: str) -> str:
+    """http://host:8000/v1 -> http://host:8000/metrics"""
+    base_url = base_url.rstrip("/")
+    if base_url.endswith("/v1"):
+        base_url = base_url[: -len("/v1")]
+    return base_url + "/metrics"
+
+
+class MetricsScraper:
+    def __init__(self, url: str, model_name: str | None = None, timeout: float = 5.0):
+        self.url = url
+        self.model_name = model_name
+        self.client = httpx.Client(timeout=timeout)
+
+    def _total(self, samples: dict, families: list[str], suffixes: tuple[str, ...]):
+        """sum over this model's label sets of the first family the server exposes"""
+        for family in families:
+            for suffix in suffixes:
+                if family + suffix in samples:
+                    return sum(
+                        value
+                        for labels, value in samples[family + suffix]
+                        if self.model_name is None
+                        or labels.get("model_name", self.model_name) == self.model_name
+                    )
+        return None
+
+    def scrape(self) -> dict[str, float | None]:
+        response = self.client.get(self.url)
+        response.raise_for_status()
+        samples = parse_metrics(response.text)
+        snapshot = {}
+        for field, families in COUNTERS.items():
+            # prometheus_client appends _total to counters, some exporters do not
+            snapshot[field] = self._total(samples, families, ("_total", ""))
+        for field, families in GAUGES.items():
+            snapshot[field] = self._total(samples, families, ("",))
+        for field, families in HISTOGRAMS.items():
+            snapshot[field + "_sum"] = self._total(samples, families, ("_sum",))
+            snapshot[field + "_count"] = self._total(samples, families, ("_count",))
+        return snapshot
+
+    def scrape_after(self, before: dict, timeout: float = 1.0, interval: float = 0.01) -> dict:
+        """
+        Scrapes until the finished request shows up in the histograms: vLLM records
+        them in its output loop, which can run just after the response was sent.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            after = self.scrape()
+            if (
+                before["requests_count"] is None
+                or after["requests_count"] > before["requests_count"]
+                or time.perf_counter() > deadline
+            ):
+                return after
+            time.sleep(interval)
+
+
+def _delta(before: dict, after: dict, key: str):
+    if before.get(key) is None or after.get(key) is None:
+        return None
+    return after[key] - before[key]
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+
+def turn_server_metrics(before: dict, after: dict) -> dict:
+    """TurnMetrics fields from the scrapes around one turn; None when not exposed"""
+    requests = _delta(before, after, "requests_count") or None
+    per_request = {
+        field: _ratio(_delta(before, after, field + "_sum"), requests)
+        for field in ("queue_time", "prefill_time", "decode_time")
+    }
+    prefix_queries = _delta(before, after, "prefix_cache_queries")
+    return {
+        "prefix_cache_queries": prefix_queries,
+        "prefix_cache_hits": _delta(before, after, "prefix_cache_hits"),
+        "prefix_cache_hit_rate": _ratio(_delta(before, after, "prefix_cache_hits"), prefix_queries),
+        "mm_cache_hit_rate": _ratio(
+            _delta(before, after, "mm_cache_hits"), _delta(before, after, "mm_cache_queries")
+        ),
+        "kv_cache_usage": after.get("kv_cache_usage"),
+        "server_queue_time": per_request["queue_time"],
+        "server_prefill_time": per_request["prefill_time"],
+        "server_decode_time": per_request["decode_time"],
+    }
+
+
+class ScrapedBackend:
+    """
+    Wraps a backend so every `complete` is bracketed by two scrapes. The scrapes
+    run outside the wrapped call, so they never count toward its latency.
+    """
+
+    def __init__(self, backend, scraper: MetricsScraper):
+        self.backend = backend
+        self.scraper = scraper
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def complete(self, messages: list[dict], max_tokens: int):
+        before = self.scraper.scrape()
+        metrics = self.backend.complete(messages, max_tokens)
+        after = self.scraper.scrape_after(before)
+        for key, value in turn_server_metrics(before, after).items():
+            setattr(metrics, key, value)
+        return metrics
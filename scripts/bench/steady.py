@@ -0,0 +1,163 @@
+"""
+Warm-up, outliers and a stopping rule for per-turn latencies.
+
+A conversation's turn latencies grow with its history, so they are never
+stationary. Every test here runs on the residuals of a Theil-Sen line through the
+run (robust to the very spikes it is looking for):
+
+    warm-up   MSER: the truncation point, within the first half of the run, that
+              minimizes the standard error of the mean of the remaining residuals
+    outliers  modified z-score of the residuals, 0.6745 (r - median) / MAD, above
+              a threshold (3.5 after Iglewicz and Hoaglin)
+    level     the mean of the remaining turns, detrended to the run's middle turn,
+              so runs with different truncation points stay comparable
+
+Turns are only flagged (`warmup`, `outlier`), never dropped; bench.report leaves
+flagged turns out of its statistics.
+"""
+
+import itertools
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+
+def theil_sen(x: np.ndarray, y: np.ndarray) -> tuple[float, float]:
+    """(slope, intercept): median of the pairwise slopes, median of the offsets"""
+    i, j = np.triu_indices(len(x), k=1)
+    dx = x[j] - x[i]
+    slope = float(np.median((y[j] - y[i])[dx != 0] / dx[dx != 0])) if len(x) > 1 else 0.0
+    return slope, float(np.median(y - slope * x))
+
+
+def mser(residuals: np.ndarray) -> int:
+    """leading values to drop: argmin over d <= n/2 of var(r[d:]) / (n - d)"""
+    n = len(residuals)
+    if n < 4:
+        return 0
+    statistics = [np.var(residuals[d:]) / (n - d) for d in range(n // 2 + 1)]
+    return int(np.argmin(statistics))
+
+
+def mad_outliers(residuals: np.ndarray, threshold: float = 3.5) -> np.ndarray:
+    median = np.median(residuals)
+    mad = np.median(np.abs(residuals - median))
+    if mad == 0:
+        return np.zeros(len(residuals), dtype=bool)
+    return 0.6745 * np.abs(residuals - median) / mad > threshold
+
+
+def flag_turns(
+    turns: list,
+    warmup_turns: int = 0,
+    metric: str = "time_to_completion",
+    threshold: float = 3.5,
+):
+    """
+    Sets `warmup` and `outlier` on a run's TurnMetrics in place: the first
+    `warmup_turns`, then as many more as MSER finds, are warm-up; outliers are
+    looked for among the rest
+    """
+    values = np.array([getattr(turn, metric) for turn in turns], dtype=float)
+    x = np.array([turn.turn for turn in turns], dtype=float)
+    ok = ~np.isnan(values)
+    if not ok.any():
+        return turns
+    slope, intercept = theil_sen(x[ok], values[ok])
+    residuals = values - (slope * x + intercept)
+
+    measured = np.flatnonzero(ok)
+    start = min(warmup_turns, len(turns))
+    later = measured[measured >= start]
+    start += mser(residuals[later]) if len(later) else 0
+    outliers = set()
+    steady = measured[measured >= start]
+    if len(steady):
+        outliers = set(steady[mad_outliers(residuals[steady], threshold)].tolist())
+    for k, turn in enumerate(turns):
+        turn.warmup = k < start
+        turn.outlier = k in outliers
+    return turns
+
+
+def steady_level(turns: list, metric: str = "time_to_completion") -> float:
+    """
+    One number per run for comparing runs and seeds: the metric over the turns
+    flag_turns kept, detrended to the middle turn of the run
+    """
+    x = np.array([turn.turn for turn in turns], dtype=float)
+    values = np.array([getattr(turn, metric) for turn in turns], dtype=float)
+    keep = ~np.isnan(values) & ~np.array([bool(t.warmup or t.outlier) for t in turns])
+    if not keep.any():
+        return math.nan
+    slope, _ = theil_sen(x[keep], values[keep])
+    return float(np.mean(values[keep] - slope * (x[keep] - x.mean())))
+
+
+def t_quantile(p: float, df: int) -> float:
+    """Student t quantile from the normal one (Cornish-Fisher), within 1% from df = 2"""
+    z = NormalDist().inv_cdf(p)
+    terms = [
+        (z**3 + z) / 4,
+        (5 * z**5 + 16 * z**3 + 3 * z) / 96,
+        (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384,
+        (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160,
+    ]
+    return z + sum(term / df ** (k + 1) for k, term in enumerate(terms))
+
+
+def mean_ci(values: list[float], confidence: float = 0.95) -> tuple[float, float]:
+    """(mean, half width of its t confidence interval); inf with fewer than 2 values"""
+    values = np.asarray([v for v in values if not math.isnan(v)], dtype=float)
+    if len(values) < 2:
+        return (float(values.mean()) if len(values) else math.nan), math.inf
+    half = t_quantile(1 - (1 - confidence) / 2, len(values) - 1)
+    return float(values.mean()), half * float(values.std(ddof=1)) / math.sqrt(len(values))
+
+
+def seeds_until_precise(
+    seeds: list[int],
+    levels: list[float],
+    target: float | None = None,
+    min_seeds: int = 3,
+    max_seeds: int = 20,
+    confidence: float = 0.95,
+):
+    """
+    Yields `seeds`, then fresh ones after the largest. With a relative `target`, stops
+    as soon as the CI on the mean of `levels` (the caller appends one per run) is
+    within ±target of it, after at least `min_seeds` and at most `max_seeds` runs
+    """
+    candidates = itertools.chain(seeds, itertools.count(max(seeds) + 1))
+    for n, seed in enumerate(candidates):
+        if target is None:
+            if n == len(seeds):
+                return
+        elif n >= max_seeds:
+            return
+        elif n >= min_seeds:
+            mean, half = mean_ci(levels, confidence)
+            if half <= target * abs(mean):
+                return
+        yield seed
+
+
+def add_steady_arguments(parser):
+    group = parser.add_argument_group("steady state")
+    group.add_argument(
+        "--warmup_turns",
+        type=int,
+        default=0,
+        help="leading turns of each run flagged as warm-up, before MSER looks for more",
+    )
+    group.add_argument(
+        "--ci_target",
+        type=float,
+        default=None,
+        help="run seeds until the CI on the steady-state mean is within ±this fraction of it",
+    )
+    group.add_argument("--min_seeds", type=int, default=3)
+    group.add_argument("--max_seeds", type=int, default=20)
+    group.add_argument("--confidence", type=float, default=0.95)
+    return group
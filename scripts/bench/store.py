@@ -0,0 +1,97 @@
+"""
+One Parquet dataset for all results, hive partitioned as
+`<root>/model=<model>/config=<config key>/seed=<seed>/<run_id>-0.parquet`.
+
+Every row is one turn and carries the run metadata (backend, strategy, quantization,
+tensor parallel size, token usage, ...), so analysis is a filtered scan instead of
+globbing CSVs and parsing their file names.
+"""
+
+import datetime
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+DEFAULT_STORE = "results/store"
+PARTITIONING = ds.partitioning(
+    pa.schema([("model", pa.string()), ("config", pa.string()), ("seed", pa.int64())]),
+    flavor="hive",
+)
+
+
+def config_label(config: dict) -> str:
+    """partition value for everything that is neither model nor seed"""
+    return ",".join(f"{key}={value}" for key, value in sorted(config.items())) or "default"
+
+
+def append_run(
+    df: pd.DataFrame,
+    model: str,
+    seed: int,
+    config: dict,
+    root: str = DEFAULT_STORE,
+    **metadata,
+) -> str:
+    """
+    Appends the per-turn frame of one run (see bench.metrics.to_frame) to the store.
+    `config` names the variant (strategy, quantization, tensor_parallel, ...) and is
+    also stored as columns; `metadata` is stored as columns only. Returns the run id.
+    """
+    run_id = uuid.uuid4().hex
+    df = df.drop(columns=["model", "seed"], errors="ignore").copy()
+    columns = {
+        "run_id": run_id,
+        "run_started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        **{key: value for key, value in config.items() if key not in df},
+        **{key: value for key, value in metadata.items() if key not in df},
+    }
+    for position, (key, value) in enumerate(columns.items()):
+        df.insert(position, key, value)
+    df["model"] = model
+    df["config"] = config_label(config)
+    df["seed"] = int(seed)
+
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        use_threads=False,  # one small run per call; threaded writes can abort at exit
+    )
+    return run_id
+
+
+def _filter(filters: dict):
+    expression = None
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            condition = pc.field(key).isin(list(value))
+        else:
+            condition = pc.field(key) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_results(
+    root: str = DEFAULT_STORE, columns: list[str] | None = None, **filters
+) -> pd.DataFrame:
+    """
+    Reads the store into pandas. Keyword filters are pushed down to the scan, and a
+    list value means "any of", e.g. `load_results(model="Qwen/...", seed=[1337, 66])`.
+    Partition keys are pruned by directory, other columns by Parquet statistics.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    # runs differ in columns (legacy imports, backends without ttft), so the scan uses
+    # the union of the file schemas instead of the first file's
+    schema = pa.unify_schemas(
+        [dataset.schema] + [fragment.physical_schema for fragment in dataset.get_fragments()],
+        promote_options="permissive",
+    )
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING, schema=schema)
+    table = dataset.to_table(columns=columns, filter=_filter(filters) if filters else None)
+    return table.to_pandas()
@@ -0,0 +1,128 @@
+import time
+
+from openai.types.chat import ChatCompletionChunk
+
+from bench.payload import JSON_HEADERS
+from bench.timing import RequestPhases
+
+
+class StreamTimer:
+    """Records arrival time of every streamed content chunk of one request.
+
+    vLLM emits one chunk per generated token, so chunk arrivals are used as
+    token arrivals. Create the timer right before sending the request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.arrivals = []
+        self.end = None
+
+    def tick(self):
+        self.arrivals.append(time.perf_counter())
+
+    def stop(self):
+        self.end = time.perf_counter()
+
+    def summary(self, completion_tokens=None):
+        """ttft, inter-token latencies and decode throughput (tokens/s after the first token)"""
+        end = self.end if self.end is not None else time.perf_counter()
+        if not self.arrivals:
+            return {
+                "time_to_completion": end - self.start,
+                "time_to_first_token": None,
+                "inter_token_latencies": [],
+                "decode_tokens_per_s": None,
+            }
+        first, last = self.arrivals[0], self.arrivals[-1]
+        n_tokens = completion_tokens or len(self.arrivals)
+        decode_time = last - first
+        return {
+            "time_to_completion": end - self.start,
+            "time_to_first_token": first - self.start,
+            "inter_token_latencies": [
+                b - a for a, b in zip(self.arrivals, self.arrivals[1:])
+            ],
+            "decode_tokens_per_s": (
+                (n_tokens - 1) / decode_time if decode_time > 0 else None
+            ),
+        }
+
+
+def _chunk(line: str):
+    """parses one server-sent event line, None for keep-alives and [DONE]"""
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    return ChatCompletionChunk.model_validate_json(data)
+
+
+def stream_chat_completion(client, body: bytes, headers: dict = JSON_HEADERS):
+    """
+    Streams one chat completion from a pre-built body (see bench.payload) with an
+    httpx.Client and returns (text, usage, timing summary)
+    """
+    timer = StreamTimer()
+    pieces = []
+    usage = None
+    parse_time = 0.0
+    phases = RequestPhases()
+    with client.stream(
+        "POST",
+        "/chat/completions",
+        content=body,
+        headers=headers,
+        extensions={"trace": phases},
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            parse_start = time.perf_counter()
+            chunk = _chunk(line)
+            parse_time += time.perf_counter() - parse_start
+            if chunk is None:
+                continue
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                timer.tick()
+                pieces.append(chunk.choices[0].delta.content)
+    timer.stop()
+    completion_tokens = usage.completion_tokens if usage is not None else None
+    timing = timer.summary(completion_tokens)
+    timing.update(request_bytes=len(body), **phases.summary(), parse_time=parse_time)
+    return "".join(pieces), usage, timing
+
+
+async def astream_chat_completion(client, body: bytes, headers: dict = JSON_HEADERS):
+    """async twin of stream_chat_completion for an httpx.AsyncClient"""
+    timer = StreamTimer()
+    pieces = []
+    usage = None
+    parse_time = 0.0
+    phases = RequestPhases()
+    async with client.stream(
+        "POST",
+        "/chat/completions",
+        content=body,
+        headers=headers,
+        extensions={"trace": phases.atrace},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            parse_start = time.perf_counter()
+            chunk = _chunk(line)
+            parse_time += time.perf_counter() - parse_start
+            if chunk is None:
+                continue
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                timer.tick()
+                pieces.append(chunk.choices[0].delta.content)
+    timer.stop()
+    completion_tokens = usage.completion_tokens if usage is not None else None
+    timing = timer.summary(completion_tokens)
+    timing.update(request_bytes=len(body), **phases.summary(), parse_time=parse_time)
+    return "".join(pieces), usage, timing
@@ -0,0 +1,232 @@
+"""
+Declarative sweeps: every configuration of a matrix gets a fresh server, a readiness
+wait on /v1/models, and the full set of seeds × strategies run against it.
+
+A spec is a JSON file, see sweeps/qwen2.5_vl.json. `server.start` / `server.stop`
+are argument lists formatted with the configuration, so the default drives the
+Makefile (`make run MODEL=...`) and a test can point it at a local stand-in server.
+"""
+
+import itertools
+import json
+import os
+import re
+import subprocess
+import time
+
+import httpx
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, warm_up
+from bench.datasets import make_dataset
+from bench.engine import conversation_turns
+from bench.history import make_strategy
+from bench.live import LiveRun, RegressionAbort, TurnSink, baseline_latencies
+from bench.metrics import to_frame
+from bench.steady import flag_turns, seeds_until_precise, steady_level
+from bench.store import DEFAULT_STORE, append_run
+
+DEFAULT_SERVER = {
+    "start": [
+        "make",
+        "run",
+        "MODEL={model}",
+        "QUANTIZATION={quantization}",
+        "TENSOR_PARALLEL={tensor_parallel}",
+        "PORT={port}",
+    ],
+    "stop": ["make", "stop"],
+    "ready_timeout": 1800,
+}
+
+
+class ServerStartError(RuntimeError):
+    pass
+
+
+def expand_matrix(spec: dict) -> list[dict]:
+    """
+    cross product of `matrix`, minus every config matching an entry of `exclude`,
+    plus the explicit configs listed in `include`
+    """
+    matrix = spec.get("matrix", {})
+    keys = list(matrix)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*matrix.values())]
+    excludes = spec.get("exclude", [])
+    configs = [
+        config
+        for config in configs
+        if not any(all(config.get(k) == v for k, v in rule.items()) for rule in excludes)
+    ]
+    return configs + spec.get("include", [])
+
+
+def config_key(config: dict) -> str:
+    """stable directory name, e.g. model=Qwen--Qwen2.5-VL-7B-Instruct,quantization=awq"""
+    parts = []
+    for key, value in config.items():
+        value = re.sub(r"[^A-Za-z0-9._-]+", "--", str(value)) or "none"
+        parts.append(f"{key}={value}")
+    return ",".join(parts)
+
+
+class ManagedServer:
+    """Starts the server for one configuration and stops it again"""
+
+    def __init__(self, server: dict, base_url: str, config: dict):
+        self.server = {**DEFAULT_SERVER, **server}
+        self.base_url = base_url.rstrip("/")
+        self.config = config
+        self.process = None
+
+    def _command(self, name: str):
+        port = httpx.URL(self.base_url).port or 8000
+        values = {"port": port, "quantization": "", "tensor_parallel": 1, **self.config}
+        return [arg.format(**values) for arg in self.server[name]]
+
+    def start(self) -> float:
+        """starts the server and blocks until it serves the model; returns cold start seconds"""
+        start = time.perf_counter()
+        # `make run` detaches the container and returns, a stand-in server keeps running
+        self.process = subprocess.Popen(self._command("start"))
+        self.wait_ready(start)
+        return time.perf_counter() - start
+
+    def wait_ready(self, start: float):
+        deadline = start + self.server["ready_timeout"]
+        model = self.config.get("model")
+        while time.perf_counter() < deadline:
+            try:
+                response = httpx.get(f"{self.base_url}/models", timeout=5)
+                if response.status_code == 200:
+                    served = {m["id"] for m in response.json().get("data", [])}
+                    if model is None or model in served:
+                        return
+            except httpx.HTTPError:
+                pass  # still starting
+            if self.process.poll() not in (None, 0):
+                raise ServerStartError(f"server start command exited with {self.process.returncode}")
+            time.sleep(1)
+        raise ServerStartError(f"server not ready after {self.server['ready_timeout']}s: {self.config}")
+
+    def stop(self):
+        if self.server.get("stop"):
+            subprocess.run(self._command("stop"), check=False)
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def run_sweep(spec: dict, results_dir: str, store: str = DEFAULT_STORE):
+    """
+    Runs every configuration of the spec and writes
+    `<results_dir>/<name>/<config_key>/<strategy>_seed_<seed>.csv` plus a `config.json`
+    with the configuration and its cold start time. Configurations with a config.json
+    are skipped, so an interrupted sweep can be rerun as is; one whose server did not
+    start is recorded there under `failed`. Every run is also appended to the Parquet
+    store, see bench.store, and marked with `<strategy>_seed_<seed>.stored` once it is.
+    """
+    base_url = spec.get("base_url", "http://localhost:8000/v1")
+    strategies = spec.get("strategies", ["full"])
+    seeds = spec.get("seeds", [1337, 66, 88])
+    data_repeat = spec.get("data_repeat", 3)
+    dataset = make_dataset(spec.get("data", "image"), repeat=data_repeat)
+    # "client": ClientConfig fields, e.g. {"gzip": true, "retries": 0}
+    client_config = ClientConfig(**spec.get("client", {}))
+    # "abort": {"baseline": CSV or sink, "ratio": 1.5, "p95": seconds}, see bench.live
+    abort_rule = spec.get("abort", {})
+
+    sweep_dir = os.path.join(results_dir, spec["name"])
+    for config in expand_matrix(spec):
+        config_dir = os.path.join(sweep_dir, config_key(config))
+        if os.path.exists(os.path.join(config_dir, "config.json")):
+            print(f"=== skipping {config}, already done")
+            continue
+        os.makedirs(config_dir, exist_ok=True)
+        # every turn as it finishes; a rerun resumes the configuration's runs from it
+        live = LiveRun(
+            sink=TurnSink(os.path.join(config_dir, "turns.jsonl"), resume=True),
+            baseline=baseline_latencies(abort_rule["baseline"]) if "baseline" in abort_rule else None,
+            abort_ratio=abort_rule.get("ratio"),
+            abort_p95=abort_rule.get("p95"),
+        )
+        cold_start = aborted = failed = None
+
+        print(f"=== starting server for {config}")
+        server = ManagedServer(spec.get("server", {}), base_url, config)
+        try:
+            cold_start = server.start()
+            print(f"=== ready after {cold_start:.1f}s")
+            backend = OpenAIBackend(
+                config["model"],
+                base_url=base_url,
+                stream=spec.get("stream", False),
+                client_config=client_config,
+            )
+            warm_up(backend, spec.get("warmup", 1))
+            for strategy_name in strategies:
+                levels = []
+                # "ci_target": run seeds until the steady-state mean is this precise
+                for seed in seeds_until_precise(
+                    seeds,
+                    levels,
+                    target=spec.get("ci_target"),
+                    min_seeds=spec.get("min_seeds", 3),
+                    max_seeds=spec.get("max_seeds", 20),
+                ):
+                    run = f"{strategy_name}/seed={seed}"
+                    done = live.done(run)
+                    turns, iterator = list(done), conversation_turns(
+                        backend,
+                        dataset.messages(seed),
+                        max_tokens=spec.get("max_tokens", 32),
+                        strategy=make_strategy(strategy_name),
+                        verbose=False,
+                        resume=done,
+                    )
+                    while live.step(run, iterator, turns) is not None:
+                        pass
+                    turns = flag_turns(turns, spec.get("warmup_turns", 0))
+                    levels.append(steady_level(turns))
+                    df = to_frame(turns, strategy=strategy_name, seed=seed)
+                    df.to_csv(
+                        os.path.join(config_dir, f"{strategy_name}_seed_{seed}.csv"),
+                        index=False,
+                    )
+                    stored = os.path.join(config_dir, f"{strategy_name}_seed_{seed}.stored")
+                    if os.path.exists(stored):
+                        continue  # finished before an interruption, already in the store
+                    variant = {key: value for key, value in config.items() if key != "model"}
+                    append_run(
+                        df,
+                        model=config["model"],
+                        seed=seed,
+                        config={**variant, "strategy": strategy_name},
+                        root=store,
+                        sweep=spec["name"],
+                        backend="openai",
+                        data=dataset.label(),
+                        max_tokens=spec.get("max_tokens", 32),
+                        data_repeat=data_repeat,
+                        stream=spec.get("stream", False),
+                        cold_start_s=cold_start,
+                    )
+                    open(stored, "w").close()
+                    print(f"    {strategy_name} / seed {seed} done")
+        except ServerStartError as error:
+            # e.g. a tensor parallel size that does not fit: this configuration fails, the sweep goes on
+            print(f"=== server for {config} did not start: {error}")
+            failed = str(error)
+        except RegressionAbort as abort:
+            print(f"=== aborting {config}: {abort}")
+            aborted = str(abort)
+        finally:
+            server.stop()
+            live.close()
+
+        # written last, it marks the configuration as complete
+        with open(os.path.join(config_dir, "config.json"), "w") as f:
+            json.dump({**config, "cold_start_s": cold_start, "aborted": aborted, "failed": failed}, f, indent=2)
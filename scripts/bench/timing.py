@@ -0,0 +1,93 @@
+import time
+
+import httpx
+
+
+class RequestPhases:
+    """
+    httpcore `trace` extension that timestamps the phases of one HTTP request.
+
+    Pass an instance as `extensions={"trace": phases}` (sync clients) or
+    `extensions={"trace": phases.atrace}` (async clients). Event names are stored
+    without their protocol prefix, so HTTP/1.1 and HTTP/2 produce the same keys.
+    """
+
+    def __init__(self):
+        self.stamps = {}
+
+    def __call__(self, name: str, info: dict):
+        self.stamps[name.split(".", 1)[1]] = time.perf_counter()
+
+    async def atrace(self, name: str, info: dict):
+        self(name, info)
+
+    @property
+    def first_stamp(self):
+        return min(self.stamps.values()) if self.stamps else None
+
+    def _span(self, start: str, end: str):
+        if start in self.stamps and end in self.stamps:
+            return self.stamps[end] - self.stamps[start]
+        return None
+
+    def summary(self):
+        """
+        connect: TCP + TLS setup, 0 on a reused keep-alive connection
+        upload: request headers and body written to the socket
+        server: body written until response headers arrive. For non-streaming
+            requests this is the whole server side (queue, prefill and decode)
+        download: response headers until the last body byte
+        """
+        connect = self._span("connect_tcp.started", "connect_tcp.complete") or 0.0
+        connect += self._span("start_tls.started", "start_tls.complete") or 0.0
+        return {
+            "connection_reused": "connect_tcp.started" not in self.stamps,
+            "connect_time": connect,
+            "upload_time": self._span(
+                "send_request_headers.started", "send_request_body.complete"
+            ),
+            "server_time": self._span(
+                "send_request_body.complete", "receive_response_headers.complete"
+            ),
+            "download_time": self._span(
+                "receive_response_headers.complete", "receive_response_body.complete"
+            ),
+        }
+
+
+class TracedHTTPClient(httpx.Client):
+    """
+    httpx.Client that attaches a fresh RequestPhases to every request it sends.
+
+    For SDK clients (`Anthropic(http_client=...)`, `OpenAI(http_client=...)`) that
+    build and send requests themselves. `last_phases` and `last_request_bytes`
+    describe the most recent request, so use one client per sequential conversation.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.last_phases = None
+        self.last_request_bytes = None
+
+    def send(self, request: httpx.Request, **kwargs):
+        self.last_phases = RequestPhases()
+        self.last_request_bytes = len(request.content)
+        request.extensions["trace"] = self.last_phases
+        return super().send(request, **kwargs)
+
+
+def sdk_call_timing(http_client: TracedHTTPClient, call_start: float, call_end: float):
+    """
+    Per-phase timing of the last SDK call made through `http_client`.
+
+    The SDK serializes the body before the first trace event and parses the
+    response after the last body byte, so both are taken from the call bounds.
+    """
+    phases = http_client.last_phases
+    body_done = phases.stamps.get("receive_response_body.complete", call_end)
+    return {
+        "request_bytes": http_client.last_request_bytes,
+        "serialize_time": phases.first_stamp - call_start,
+        **phases.summary(),
+        "parse_time": call_end - body_done,
+    }
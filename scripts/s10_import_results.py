@@ -0,0 +1,88 @@
+import os
+import re
+import argparse
+import pandas as pd
+
+from bench.store import DEFAULT_STORE, append_run, load_results
+
+# results/<stem>_run_<n>.csv -> what the file name encodes; runs 1/2/3 used seeds 1337/66/88
+RUN_SEEDS = {1: 1337, 2: 66, 3: 88}
+QWEN_32B = "Qwen/Qwen2.5-VL-32B-Instruct"
+QWEN_7B = "Qwen/Qwen2.5-VL-7B-Instruct"
+LEGACY_RESULTS = {
+    "32B_wo_image_cache": (QWEN_32B, {"strategy": "full"}),
+    "32B_w_image_cache": (QWEN_32B, {"strategy": "image_uuid_cached"}),
+    "single_image": (QWEN_32B, {"strategy": "single_image"}),
+    "claude-sonnet-4-20250514_results": ("claude-sonnet-4-20250514", {"backend": "anthropic"}),
+    "claude_sonnet_4_20250514_txt_only_results": (
+        "claude-sonnet-4-20250514",
+        {"backend": "anthropic", "data": "text"},
+    ),
+    "qwen2.5_3B_instruct_text_only_results": ("Qwen/Qwen2.5-VL-3B-Instruct", {"data": "text"}),
+    "qwen2.5_vl_3b_instruct_results": ("Qwen/Qwen2.5-VL-3B-Instruct", {}),
+    "qwen2.5_vl_3b_instruct_awq_results": (
+        "Qwen/Qwen2.5-VL-3B-Instruct-AWQ",
+        {"quantization": "awq"},
+    ),
+    "qwen2.5_vl_7b_instruct_results": (QWEN_7B, {}),
+    "qwen2.5_vl_7b_instruct_results_1x_gpu": (QWEN_7B, {"tensor_parallel": 1}),
+    "qwen2.5_vl_7b_instruct_results_local": (QWEN_7B, {"host": "local"}),
+    "qwen2.5_vl_7b_instruct_results_runpod": (QWEN_7B, {"host": "runpod"}),
+    "qwen2.5_vl_7b_instruct_text_only_results": (QWEN_7B, {"data": "text"}),
+    "qwen2.5_vl_7b_instruct_awq_results": ("Qwen/Qwen2.5-VL-7B-Instruct-AWQ", {"quantization": "awq"}),
+    "qwen2.5_vl_32b_instruct_results": (QWEN_32B, {"tensor_parallel": 2}),
+    "qwen2.5_vl_32b_instruct_awq_results": (
+        "Qwen/Qwen2.5-VL-32B-Instruct-AWQ",
+        {"quantization": "awq"},
+    ),
+    "qwen2.5_vl_32b_4x_gpu_instruct_results": (QWEN_32B, {"tensor_parallel": 4}),
+    "qwen2.5_vl_32b_4x_gpu_instruct_text_only_results": (
+        QWEN_32B,
+        {"tensor_parallel": 4, "data": "text"},
+    ),
+    "qwen3_30b_4x_gpu_instruct_text_only_results": (
+        "Qwen/Qwen3-30B-A3B",
+        {"tensor_parallel": 4, "data": "text"},
+    ),
+}
+DEFAULT_CONFIG = {"backend": "openai", "strategy": "full", "data": "image"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append the legacy results/*_run_N.csv files to the Parquet store."
+    )
+    parser.add_argument("--results_dir", default="results")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    # files already imported are skipped, so rerunning does not add them as more seeds
+    imported = set()
+    if os.path.isdir(args.store) and os.listdir(args.store):
+        store = load_results(args.store)
+        if "source_file" in store:
+            imported = set(store["source_file"].dropna())
+
+    for file_name in sorted(os.listdir(args.results_dir)):
+        match = re.fullmatch(r"(.+)_run_(\d+)\.csv", file_name)
+        if match is None:
+            continue
+        stem, run = match.group(1), int(match.group(2))
+        if stem not in LEGACY_RESULTS:
+            print(f"skipping {file_name}, unknown configuration")
+            continue
+        if file_name in imported:
+            print(f"skipping {file_name}, already in the store")
+            continue
+        model, config = LEGACY_RESULTS[stem]
+        df = pd.read_csv(os.path.join(args.results_dir, file_name))
+        df.insert(0, "turn", range(1, len(df) + 1))
+        append_run(
+            df,
+            model=model,
+            seed=RUN_SEEDS.get(run, run),
+            config={**DEFAULT_CONFIG, **config},
+            root=args.store,
+            source_file=file_name,
+        )
+        print(f"imported {file_name}: {model} {config}")
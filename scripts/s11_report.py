@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import argparse
+
+from bench.report import build_report, find_regressions, plot_report
+from bench.store import DEFAULT_STORE, load_results
+
+
+def parse_filter(value: str):
+    key, _, value = value.partition("=")
+    values = [int(v) if v.lstrip("-").isdigit() else v for v in value.split(",")]
+    return key, values if len(values) > 1 else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-turn latency statistics with bootstrap CIs across seeds, as PNG + JSON."
+    )
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument(
+        "--where",
+        nargs="*",
+        default=[],
+        type=parse_filter,
+        help="store filters, e.g. model=Qwen/Qwen2.5-VL-7B-Instruct seed=1337,66",
+    )
+    parser.add_argument("--metric", default="times_to_completion")
+    parser.add_argument("--by", nargs="+", default=["model", "config"])
+    parser.add_argument("--n_boot", type=int, default=2000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0, help="bootstrap seed")
+    parser.add_argument(
+        "--include_flagged",
+        action="store_true",
+        help="keep turns flagged as warm-up or outliers (see bench/steady.py)",
+    )
+    parser.add_argument("--baseline", help="a previous report.json to flag regressions against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative change that counts as a regression"
+    )
+    parser.add_argument("--output_dir", default="results/report")
+    args = parser.parse_args()
+
+    df = load_results(args.store, **dict(args.where))
+    report = build_report(
+        df,
+        metric=args.metric,
+        by=args.by,
+        n_boot=args.n_boot,
+        confidence=args.confidence,
+        seed=args.seed,
+        exclude=() if args.include_flagged else ("warmup", "outlier"),
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.threshold)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    plot_report(report, os.path.join(args.output_dir, "report.png"))
+
+    for group in report["groups"]:
+        overall = group["overall"]
+        print(
+            f"{' | '.join(str(v) for v in group['key'].values())}: runs {group['runs']}, "
+            f"p50 {overall['p50']['value']:.3f}s, p95 {overall['p95']['value']:.3f}s, "
+            f"p99 {overall['p99']['value']:.3f}s, "
+            f"+{group['slope_per_turn']['value'] * 1000:.2f} ms/turn"
+        )
+    for regression in report.get("regressions", []):
+        print(
+            f"REGRESSION {regression['key']} {regression['statistic']}: "
+            f"{regression['baseline']:.4f} -> {regression['current']:.4f} "
+            f"({regression['change']:+.1%})"
+        )
+    # non-zero exit so upgrades can be gated on the report
+    sys.exit(1 if report.get("regressions") else 0)
@@ -0,0 +1,99 @@
+import argparse
+import pandas as pd
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.data import load_image_messages
+from bench.engine import run_conversation
+from bench.history import STRATEGIES
+from bench.metrics import to_frame
+from bench.resize import MEDIA_TYPES, ImageBudget
+from bench.store import DEFAULT_STORE, append_run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark latency, payload bytes and prompt tokens per image visual-token budget."
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-7B-Instruct")
+    parser.add_argument("--base_url", default="http://localhost:8000/v1")
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument("--data_seed", type=int, default=1337)
+    parser.add_argument(
+        "--visual_tokens",
+        nargs="+",
+        type=int,
+        default=[0, 1280, 640, 320, 160],
+        help="max visual tokens per image (x 28*28 pixels); 0 sends the original files",
+    )
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="jpeg")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="processes used to re-encode images"
+    )
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="full")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--output_file", type=str, default="results/image_budget.csv")
+    parser.add_argument(
+        "--summary_file", type=str, default="results/image_budget_summary.csv"
+    )
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    backend = OpenAIBackend(
+        args.model_name,
+        base_url=args.base_url,
+        stream=args.stream,
+        client_config=ClientConfig.from_args(args),
+    )
+    warm_up(backend, args.warmup)
+    frames = []
+    for tokens in args.visual_tokens:
+        budget = (
+            ImageBudget.from_tokens(tokens, format=args.format, quality=args.quality)
+            if tokens
+            else None
+        )
+        label = budget.key if budget else "original"
+        print(f"=== {label}")
+        turns = run_conversation(
+            backend,
+            load_image_messages(
+                repeat=args.data_repeat, seed=args.data_seed, budget=budget, workers=args.workers
+            ),
+            max_tokens=args.max_tokens,
+            strategy=STRATEGIES[args.strategy](),
+            verbose=False,
+        )
+        df = to_frame(turns, image_budget=label, visual_tokens=tokens or None)
+        append_run(
+            df,
+            model=args.model_name,
+            seed=args.data_seed,
+            config={
+                "backend": "openai",
+                "strategy": args.strategy,
+                "data": "image",
+                "image_budget": label,
+            },
+            root=args.store,
+            max_tokens=args.max_tokens,
+            data_repeat=args.data_repeat,
+            stream=args.stream,
+        )
+        frames.append(df)
+
+    df = pd.concat(frames)
+    df.to_csv(args.output_file, index=False)
+    summary = df.groupby("image_budget", sort=False).agg(
+        visual_tokens=("visual_tokens", "first"),
+        mean_request_bytes=("request_bytes", "mean"),
+        mean_prompt_tokens=("prompt_tokens", "mean"),
+        p50_time_to_completion=("times_to_completion", "median"),
+        p95_time_to_completion=("times_to_completion", lambda s: s.quantile(0.95)),
+        p50_time_to_first_token=("times_to_first_token", "median"),
+    )
+    print(summary.to_string())
+    summary.to_csv(args.summary_file)
@@ -0,0 +1,55 @@
+import asyncio
+import argparse
+
+from bench.mock_server import LatencyModel, MockServer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the vLLM / Anthropic APIs with a parametric latency model."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--served_model_name",
+        nargs="*",
+        default=None,
+        help="model names listed on /v1/models and accepted (default: any)",
+    )
+    defaults = LatencyModel()
+    parser.add_argument("--base_s", type=float, default=defaults.base_s)
+    parser.add_argument("--prefill_per_token_s", type=float, default=defaults.prefill_per_token_s)
+    parser.add_argument("--prefill_per_image_s", type=float, default=defaults.prefill_per_image_s)
+    parser.add_argument("--decode_per_token_s", type=float, default=defaults.decode_per_token_s)
+    parser.add_argument("--completion_tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument(
+        "--cache_tokens",
+        type=int,
+        default=defaults.cache_tokens,
+        help="prefix cache capacity; 0 disables prefix caching",
+    )
+    parser.add_argument(
+        "--encoder_cache_images",
+        type=int,
+        default=defaults.encoder_cache_images,
+        help="images whose encoding is reused when seen again (by uuid or content); 0 disables it",
+    )
+    parser.add_argument(
+        "--error_rate",
+        type=float,
+        default=0.0,
+        help="fraction of completions answered 503, to exercise client retries",
+    )
+    args = parser.parse_args()
+
+    latency = LatencyModel(
+        base_s=args.base_s,
+        prefill_per_token_s=args.prefill_per_token_s,
+        prefill_per_image_s=args.prefill_per_image_s,
+        decode_per_token_s=args.decode_per_token_s,
+        completion_tokens=args.completion_tokens,
+        cache_tokens=args.cache_tokens,
+        encoder_cache_images=args.encoder_cache_images,
+    )
+    print(f"mock server on http://{args.host}:{args.port}/v1 with {latency}")
+    asyncio.run(MockServer(latency, args.served_model_name, error_rate=args.error_rate).serve(args.host, args.port))
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+
+import pandas as pd
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, awarm_up
+from bench.datasets import make_dataset
+from bench.history import make_strategy
+from bench.openloop import find_max_rate, run_open_loop, trial_summary
+from bench.routing import POLICIES, RoutedBackend, replica_summary
+from bench.store import DEFAULT_STORE, append_run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Open-loop load at a fixed request rate, or search for the highest rate meeting a p99 latency SLO."
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-7B-Instruct")
+    parser.add_argument("--base_url", default="http://localhost:8000/v1")
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument(
+        "--dataset",
+        default="image",
+        help="image, text, dir:PATH, synthetic[:key=value...] or trace:FILE, see bench/datasets.py",
+    )
+    parser.add_argument(
+        "--data_seed",
+        type=int,
+        default=1337,
+        help="conversations are built with seeds data_seed, data_seed + 1, ...",
+    )
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of issuing requests")
+    parser.add_argument("--arrival", choices=["poisson", "fixed"], default="poisson")
+    parser.add_argument(
+        "--num_sessions",
+        type=int,
+        default=64,
+        help="conversations kept open; a request waits when all of them are busy",
+    )
+    parser.add_argument(
+        "--slo_p99",
+        type=float,
+        default=None,
+        help="seconds; search for the highest rate whose p99 latency meets this instead of running --rate",
+    )
+    parser.add_argument("--min_rate", type=float, default=0.5)
+    parser.add_argument("--max_rate", type=float, default=256.0)
+    parser.add_argument(
+        "--tolerance", type=float, default=0.05, help="relative width at which the rate search stops"
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--strategy", default="full", help="history strategy, e.g. full or image_window:3")
+    parser.add_argument("--output_file", type=str, default="results/open_loop.csv")
+    parser.add_argument(
+        "--histogram_file", type=str, default="results/open_loop_histogram.csv"
+    )
+    parser.add_argument("--search_file", type=str, default="results/open_loop_search.csv")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=None,
+        help="base urls of several replicas to route conversations across, instead of --base_url",
+    )
+    parser.add_argument("--routing", choices=sorted(POLICIES), default="session_affinity")
+    parser.add_argument("--replica_file", type=str, default="results/open_loop_replicas.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    client_config = ClientConfig.from_args(args)
+
+    if args.endpoints:
+        backend = RoutedBackend(
+            args.model_name,
+            args.endpoints,
+            policy=args.routing,
+            stream=args.stream,
+            client_config=client_config,
+        )
+    else:
+        backend = OpenAIBackend(
+            args.model_name,
+            base_url=args.base_url,
+            stream=args.stream,
+            client_config=client_config,
+        )
+
+    build_messages = make_dataset(args.dataset, repeat=args.data_repeat)
+
+    trial_seed = args.data_seed
+
+    async def trial(rate: float):
+        global trial_seed
+        # fresh conversations per trial so one rate does not warm the cache for the next
+        df, histograms = await run_open_loop(
+            backend,
+            build_messages,
+            max_tokens=args.max_tokens,
+            rate=rate,
+            duration_s=args.duration,
+            arrival=args.arrival,
+            num_sessions=args.num_sessions,
+            base_seed=trial_seed,
+            strategy_factory=lambda: make_strategy(args.strategy),
+        )
+        trial_seed = int(df["seed"].max()) + 1
+        return df, histograms
+
+    scraped_before = None
+
+    async def main():
+        global scraped_before
+        await awarm_up(backend, args.warmup)
+        if args.endpoints:
+            # after the warm-up, whose requests would otherwise count in the replicas' cache hit rates
+            scraped_before = backend.scrape()
+        if args.slo_p99 is None:
+            return args.rate, await trial(args.rate)
+        best, trials = await find_max_rate(
+            trial,
+            slo_p99_s=args.slo_p99,
+            start_rate=args.min_rate,
+            max_rate=args.max_rate,
+            tolerance=args.tolerance,
+        )
+        pd.DataFrame(trials).to_csv(args.search_file, index=False)
+        print(f"max rate meeting p99 <= {args.slo_p99}s: {best}")
+        if best is None:
+            raise SystemExit(1)
+        # the reported run is a fresh trial at the rate found
+        return best, await trial(best)
+
+    rate, (df, histograms) = asyncio.run(main())
+    summary = trial_summary(rate, df, histograms)
+    print(json.dumps(summary, indent=2))
+    df.to_csv(args.output_file, index=False)
+    histograms["latency"].to_frame().to_csv(args.histogram_file, index=False)
+    if args.endpoints:
+        replicas = replica_summary(df, scraped_before, backend.scrape())
+        print(replicas.to_string(index=False))
+        replicas.to_csv(args.replica_file, index=False)
+    append_run(
+        df.rename(columns={"seed": "session_seed"}),
+        model=args.model_name,
+        seed=args.data_seed,
+        config={
+            "backend": "openai",
+            "strategy": args.strategy,
+            **({"routing": f"{args.routing}x{len(args.endpoints)}"} if args.endpoints else {}),
+            "data": build_messages.label(),
+            "arrival": args.arrival,
+            "rate": f"{summary['offered_rate']:g}",
+        },
+        root=args.store,
+        max_tokens=args.max_tokens,
+        data_repeat=args.data_repeat,
+        stream=args.stream,
+        num_sessions=args.num_sessions,
+    )
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import os
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, awarm_up
+from bench.history import make_strategy
+from bench.replay import depth_report, load_trace, run_replay
+from bench.routing import POLICIES, RoutedBackend, replica_summary
+from bench.resize import MEDIA_TYPES
+from bench.store import DEFAULT_STORE, append_run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay an anonymized session trace against an endpoint with its original inter-arrival times."
+    )
+    parser.add_argument(
+        "--trace",
+        required=True,
+        help="JSONL, CSV or Parquet; one row per user turn with timestamp, session, "
+        "text_chars (or text_tokens), image_width, image_height and max_tokens",
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-7B-Instruct")
+    parser.add_argument("--base_url", default="http://localhost:8000/v1")
+    parser.add_argument(
+        "--max_tokens", type=int, default=32, help="for turns the trace has no max_tokens for"
+    )
+    parser.add_argument(
+        "--speedup", type=float, default=1.0, help="divide the trace's inter-arrival times by this"
+    )
+    parser.add_argument(
+        "--entropy",
+        type=float,
+        default=0.5,
+        help="of the synthetic images standing in for the recorded ones, see bench/datasets.py",
+    )
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="jpeg")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--data_seed", type=int, default=1337)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--strategy", default="full", help="history strategy, e.g. full or image_window:3")
+    parser.add_argument("--output_file", type=str, default="results/replay.csv")
+    parser.add_argument("--summary_file", type=str, default="results/replay_by_depth.csv")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=None,
+        help="base urls of several replicas to route conversations across, instead of --base_url",
+    )
+    parser.add_argument("--routing", choices=sorted(POLICIES), default="session_affinity")
+    parser.add_argument("--replica_file", type=str, default="results/replay_replicas.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    client_config = ClientConfig.from_args(args)
+
+    trace = load_trace(args.trace)
+    print(
+        f"{len(trace)} turns in {trace['session'].nunique()} sessions over "
+        f"{trace['offset_s'].max():.0f}s, replayed in {trace['offset_s'].max() / args.speedup:.0f}s"
+    )
+
+    if args.endpoints:
+        backend = RoutedBackend(
+            args.model_name,
+            args.endpoints,
+            policy=args.routing,
+            stream=args.stream,
+            client_config=client_config,
+        )
+    else:
+        backend = OpenAIBackend(
+            args.model_name,
+            base_url=args.base_url,
+            stream=args.stream,
+            client_config=client_config,
+        )
+
+    async def main():
+        await awarm_up(backend, args.warmup)
+        # after the warm-up, whose requests would otherwise count in the replicas' cache hit rates
+        scraped_before = backend.scrape() if args.endpoints else None
+        return scraped_before, await run_replay(
+            backend,
+            trace,
+            speedup=args.speedup,
+            max_tokens=args.max_tokens,
+            strategy_factory=lambda: make_strategy(args.strategy),
+            entropy=args.entropy,
+            format=args.format,
+            quality=args.quality,
+            seed=args.data_seed,
+        )
+
+    scraped_before, (df, histograms) = asyncio.run(main())
+
+    per_depth = depth_report(df)
+    print(per_depth.to_string(index=False))
+    summary = {
+        "turns": len(df),
+        "errors": int(df["error"].notna().sum()),
+        "max_in_flight": int(df["in_flight"].max()),
+        **{f"latency_{key}": value for key, value in histograms["latency"].summary().items()},
+        "lag_p99": histograms["lag"].percentile(99),
+    }
+    print(json.dumps(summary, indent=2))
+
+    df.to_csv(args.output_file, index=False)
+    per_depth.to_csv(args.summary_file, index=False)
+    if args.endpoints:
+        replicas = replica_summary(df, scraped_before, backend.scrape())
+        print(replicas.to_string(index=False))
+        replicas.to_csv(args.replica_file, index=False)
+    append_run(
+        # trace session ids may be strings, kept apart from the integer `session` of s4/s7
+        df.rename(columns={"session": "trace_session"}).astype({"trace_session": str}),
+        model=args.model_name,
+        seed=args.data_seed,
+        config={
+            "backend": "openai",
+            "strategy": args.strategy,
+            **({"routing": f"{args.routing}x{len(args.endpoints)}"} if args.endpoints else {}),
+            "data": f"replay:{os.path.basename(args.trace)}",
+            "speedup": f"{args.speedup:g}",
+        },
+        root=args.store,
+        max_tokens=args.max_tokens,
+        stream=args.stream,
+        entropy=args.entropy,
+    )
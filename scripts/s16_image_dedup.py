@@ -0,0 +1,127 @@
+import argparse
+import uuid
+
+import pandas as pd
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.datasets import make_dataset
+from bench.engine import run_conversation
+from bench.history import ImageDedup, make_strategy
+from bench.metrics import to_frame
+from bench.server_metrics import MetricsScraper, ScrapedBackend, metrics_url
+from bench.store import DEFAULT_STORE, append_run
+
+
+class RecordMatches:
+    """passes a strategy through, keeping how each turn's images were keyed"""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.kinds = []
+
+    def prepare(self, user_message):
+        user_message = self.strategy.prepare(user_message)
+        matches = getattr(self.strategy, "matches", [])
+        kinds = {match.kind for match in matches}
+        # a turn is as new as its newest image
+        self.kinds.append(next((k for k in ("new", "near", "exact") if k in kinds), "none"))
+        return user_message
+
+    def advance(self, history, user_message, response):
+        return self.strategy.advance(history, user_message, response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Key images by perceptual hash so near-duplicate screenshots hit the "
+        "server's encoder cache, and compare against exact content keys."
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-32B-Instruct")
+    parser.add_argument("--base_url", default="http://192.222.53.119:443/v1")
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument(
+        "--dataset",
+        default="screen:jitter=2",
+        help="dataset spec, see bench/datasets.py; screen captures change a little per turn",
+    )
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1337])
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=["image_dedup:-1", "image_dedup:4:1", "image_dedup:4:1:1"],
+        help="the first is the baseline; image_dedup:THRESHOLD:TOLERANCE[:SUBSTITUTE], "
+        "threshold -1 only matches identical pixels",
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--scrape_metrics",
+        action="store_true",
+        help="scrape /metrics around every turn for the server's own encoder cache hit rate",
+    )
+    parser.add_argument("--output_file", type=str, default="results/image_dedup.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.dataset, repeat=args.data_repeat)
+    backend = OpenAIBackend(
+        args.model_name,
+        base_url=args.base_url,
+        stream=args.stream,
+        client_config=ClientConfig.from_args(args),
+    )
+    warm_up(backend, args.warmup)
+    if args.scrape_metrics:
+        backend = ScrapedBackend(
+            backend, MetricsScraper(metrics_url(args.base_url), args.model_name)
+        )
+
+    run_id = uuid.uuid4().hex
+    frames, hit_rates = [], {}
+    for spec in args.strategies:
+        for seed in args.seeds:
+            strategy = RecordMatches(make_strategy(spec))
+            if isinstance(strategy.strategy, ImageDedup):
+                # fresh keys per run, or an earlier run would have warmed the caches for it
+                strategy.strategy.index.namespace = f"{run_id}:{spec}:{seed}"
+            turns = run_conversation(
+                backend,
+                dataset.messages(seed),
+                max_tokens=args.max_tokens,
+                strategy=strategy,
+                verbose=False,
+            )
+            df = to_frame(turns)
+            append_run(
+                df,
+                model=args.model_name,
+                seed=seed,
+                config={"backend": backend.name, "strategy": spec, "data": dataset.label()},
+                root=args.store,
+                max_tokens=args.max_tokens,
+                data_repeat=args.data_repeat,
+                stream=args.stream,
+            )
+            frames.append(df.assign(strategy=spec, seed=seed, match=strategy.kinds))
+            if isinstance(strategy.strategy, ImageDedup):
+                hit_rates.setdefault(spec, []).append(strategy.strategy.index.hit_rate())
+
+    df = pd.concat(frames)
+    df.to_csv(args.output_file, index=False)
+    columns = ["times_to_completion", "request_bytes"]
+    if args.scrape_metrics:
+        columns.append("mm_cache_hit_rates")
+    summary = df.groupby("strategy", sort=False)[columns].mean()
+    summary["key_hit_rate"] = pd.Series({spec: sum(r) / len(r) for spec, r in hit_rates.items()})
+    baseline = summary["times_to_completion"].iloc[0]
+    summary["saved"] = 1 - summary["times_to_completion"] / baseline
+    print(summary.to_string(float_format="{:.3f}".format))
+    print()
+    print("time to completion by how the turn's images were keyed")
+    print(
+        df.pivot_table(
+            index="strategy", columns="match", values="times_to_completion", aggfunc="mean", sort=False
+        ).to_string(float_format="{:.3f}".format)
+    )
@@ -0,0 +1,111 @@
+import argparse
+
+import pandas as pd
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.datasets import make_dataset
+from bench.delta import image_payload
+from bench.engine import run_conversation
+from bench.history import make_strategy
+from bench.metrics import to_frame
+from bench.store import DEFAULT_STORE, append_run
+
+
+class RecordPayload:
+    """passes a strategy through, keeping what images each turn actually sent"""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.rows = []
+
+    def prepare(self, user_message):
+        user_message = self.strategy.prepare(user_message)
+        images, image_bytes, tokens = image_payload(user_message)
+        self.rows.append(
+            {
+                "mode": getattr(self.strategy, "mode", None) or ("full" if images else "text"),
+                "images_sent": images,
+                "image_bytes": image_bytes,
+                "visual_tokens": tokens,
+            }
+        )
+        return user_message
+
+    def advance(self, history, user_message, response):
+        return self.strategy.advance(history, user_message, response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Send only the changed regions of each screenshot as crops and compare "
+        "payload, visual tokens and latency against sending full frames."
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-32B-Instruct")
+    parser.add_argument("--base_url", default="http://192.222.53.119:443/v1")
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument(
+        "--dataset",
+        default="screen",
+        help="dataset spec, see bench/datasets.py; the frames of a conversation should share a size",
+    )
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1337])
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=["full", "region_crop:25"],
+        help="the first is the baseline; region_crop:MAX_AREA_PERCENT:TOLERANCE",
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--output_file", type=str, default="results/frame_delta.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.dataset, repeat=args.data_repeat)
+    backend = OpenAIBackend(
+        args.model_name,
+        base_url=args.base_url,
+        stream=args.stream,
+        client_config=ClientConfig.from_args(args),
+    )
+    warm_up(backend, args.warmup)
+
+    frames = []
+    for spec in args.strategies:
+        for seed in args.seeds:
+            strategy = RecordPayload(make_strategy(spec))
+            turns = run_conversation(
+                backend,
+                dataset.messages(seed),
+                max_tokens=args.max_tokens,
+                strategy=strategy,
+                verbose=False,
+            )
+            df = to_frame(turns)
+            append_run(
+                df,
+                model=args.model_name,
+                seed=seed,
+                config={"backend": backend.name, "strategy": spec, "data": dataset.label()},
+                root=args.store,
+                max_tokens=args.max_tokens,
+                data_repeat=args.data_repeat,
+                stream=args.stream,
+            )
+            frames.append(pd.concat([df, pd.DataFrame(strategy.rows)], axis=1).assign(strategy=spec, seed=seed))
+
+    df = pd.concat(frames)
+    df.to_csv(args.output_file, index=False)
+    columns = ["image_bytes", "visual_tokens", "request_bytes", "prompt_tokens", "times_to_completion"]
+    if args.stream:
+        columns.append("times_to_first_token")
+    summary = df.groupby("strategy", sort=False)[columns].mean()
+    print(summary.to_string(float_format="{:.3f}".format))
+    print()
+    print("relative to", args.strategies[0])
+    print((summary / summary.iloc[0]).to_string(float_format="{:.3f}".format))
+    print()
+    print("turns by mode")
+    print(df.groupby(["strategy", "mode"], sort=False).size().unstack(fill_value=0).to_string())
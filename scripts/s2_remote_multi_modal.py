@@ -1,131 +1,17 @@
 import os
-import time
-import base64
-import glob
-import random
 import argparse
-import copy
-from anthropic import Anthropic
-import pandas as pd
 from dotenv import load_dotenv
 
-load_dotenv()
-
-
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
-
-def load_user_messages(repeat=3, seed=1337):
-    """Returns a random list of user questions about some 720p images"""
-    random.seed(seed)
-    img_paths = sorted(glob.glob("data/test-img-*.jpg"))
-    questions = [
-        "What do you see in this image?",
-        "Describe the content of this image concisely.",
-        "What's in the image?",
-        "Where is this image taken?",
-        "Summarize the content of this image in one sentence.",
-        "What's the main subject of this image?",
-        "What's the background of this image?",
-        "What's the color of the background?",
-        "What's the texture of the background?",
-        "How many objects can you count in this image?",
-        "What emotions or mood does this image convey?",
-        "What time of day do you think this photo was taken?",
-        "Are there any people visible in this image?",
-        "What style or genre would you classify this image as?",
-        "What details can you notice about the lighting?",
-        "What is the meaning of this image?",
-        "How would you name this image?",
-        "What do you find most interesting about this image?",
-        "What is the message of this image?",
-        "What is the moral of this image?",
-        "What did you learn from this image about B2B SaaS?",
-    ]
-
-    img_paths = img_paths * repeat
-    questions = questions * repeat
-
-    random.shuffle(img_paths)
-    random.shuffle(questions)
-
-    user_messages = []
-    for image, question in zip(img_paths, questions):
-        img_b64 = encode_image(image)
-        user_messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": img_b64,
-                        },
-                    },
-                    {"type": "text", "text": question},
-                ],
-            }
-        )
-    return user_messages
-
-
-def wrap_prompt_caching_signature(messages: list[dict]):
-    """
-    For fairness, we use Anthropic's prompt caching to (ideally) speed up inference and save token money.
-
-    Official documentation: https://docs.claude.com/en/docs/build-with-claude/prompt-caching
-    """
-    messages_copy = copy.deepcopy(messages)
-    final_message = messages_copy[-1]
-    final_message_content_dict = final_message["content"][-1]
-    final_message_content_dict["cache_control"] = {"type": "ephemeral"}
-    return messages_copy
-
-
-def run_conversation(
-    client: Anthropic,
-    model_name: str,
-    max_tokens: int,
-    repeat: int,
-    seed: int,
-):
-    """have LLM answer each user message in one multi-turn conversation and record time to completion on each turn"""
-    user_messages = load_user_messages(repeat=repeat, seed=seed)
-
-    # stats storage
-    times_to_completion = []
-    assistant_responses = []
+from bench.backends import AnthropicBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.data import load_image_messages
+from bench.engine import conversation_turns
+from bench.live import LiveRun, add_live_arguments
+from bench.metrics import to_frame
+from bench.parallel import add_seed_arguments, run_seeds, seed_path
+from bench.store import DEFAULT_STORE, append_run
 
-    chat_history = []
-    for i, user_message in enumerate(user_messages):
-        chat_history.append(user_message)
-        start_time = time.time()
-        chat_history_w_prompt_caching = wrap_prompt_caching_signature(chat_history)
-
-        response = client.messages.create(
-            model=model_name,
-            messages=chat_history_w_prompt_caching,
-            max_tokens=max_tokens,
-            temperature=0.0,
-            stream=False,
-        )
-
-        assistant_response = response.content
-        end_time = time.time() - start_time
-
-        print(f"Turn {i+1} Time to completion: {end_time:.3f}s")
-        print(f"Turn {i+1} Response: {assistant_response}")
-        print()
-
-        times_to_completion.append(end_time)
-        assistant_responses.append(assistant_response)
-        chat_history.append({"role": "assistant", "content": assistant_response})
-
-    return times_to_completion, assistant_responses
+load_dotenv()
 
 
 if __name__ == "__main__":
@@ -135,27 +21,63 @@ if __name__ == "__main__":
     parser.add_argument("--model_name", default="claude-sonnet-4-20250514")
     parser.add_argument("--max_tokens", type=int, default=32)
     parser.add_argument("--data_repeat", type=int, default=3)
-    parser.add_argument("--data_seed", type=int, default=1337)
     parser.add_argument(
         "--output_file",
         type=str,
         default="results/claude_sonnet_4_20250514_results.csv",
     )
-    args = parser.parse_args()
-
-    client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-    times_to_completion, responses = run_conversation(
-        client=client,
-        model_name=args.model_name,
-        max_tokens=args.max_tokens,
-        repeat=args.data_repeat,
-        seed=args.data_seed,
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream responses to record time to first token and inter-token latencies",
+    )
+    parser.add_argument(
+        "--store", default=DEFAULT_STORE, help="Parquet dataset the run is also appended to"
     )
+    add_live_arguments(parser)
+    add_seed_arguments(parser, 1337)
+    add_client_arguments(parser)
+    args = parser.parse_args()
 
-    df = pd.DataFrame(
-        {
-            "times_to_completion": times_to_completion,
-            "assistant_responses": responses,
-        }
+    # one backend per seed: its traced client times one conversation's requests
+    backends = {
+        seed: AnthropicBackend(
+            args.model_name,
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            stream=args.stream,
+            client_config=ClientConfig.from_args(args),
+        )
+        for seed in args.seeds
+    }
+    for backend in backends.values():
+        warm_up(backend, args.warmup)  # each has its own connection pool
+    live = LiveRun.from_args(args)
+    runs = run_seeds(
+        lambda seed, done: conversation_turns(
+            backends[seed],
+            load_image_messages(repeat=args.data_repeat, seed=seed),
+            max_tokens=args.max_tokens,
+            verbose=len(args.seeds) == 1 and not args.dashboard,
+            resume=done,
+        ),
+        args.seeds,
+        args.schedule,
+        args.parallel_seeds,
+        warmup_turns=args.warmup_turns,
+        live=live,
     )
-    df.to_csv(args.output_file, index=False)
+    live.finish()  # exits after an abort, the turns stay in the sink
+
+    for seed, turns in runs.items():
+        df = to_frame(turns)
+        df.to_csv(seed_path(args.output_file, seed, args.seeds), index=False)
+        append_run(
+            df,
+            model=args.model_name,
+            seed=seed,
+            config={"backend": "anthropic", "strategy": "full", "data": "image"},
+            root=args.store,
+            max_tokens=args.max_tokens,
+            data_repeat=args.data_repeat,
+            stream=args.stream,
+        )
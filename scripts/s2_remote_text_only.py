@@ -1,119 +1,17 @@
 import os
-import time
-import base64
-import glob
-import random
 import argparse
-import copy
-from anthropic import Anthropic
-import pandas as pd
 from dotenv import load_dotenv
 
-load_dotenv()
-
-
-def load_user_messages(repeat=3, seed=1337):
-    """Returns a random list of user questions about some 1000+ token texts"""
-    random.seed(seed)
-    txt_paths = sorted(glob.glob("data/test-txt-*.txt"))
-    texts = []
-    for txt_path in txt_paths:
-        with open(txt_path, "r", encoding="utf-8") as f:
-            texts.append(f.read())
-
-    questions = [
-        "What is the main topic of this text?",
-        "Summarize this text in one sentence.",
-        "What is the key message in this text?",
-        "What genre or type of writing is this?",
-        "What is the tone of this text?",
-        "Who is the intended audience for this text?",
-        "What emotions does this text convey?",
-        "What is the author's main argument?",
-        "What evidence does the text provide?",
-        "What conclusions can you draw from this text?",
-        "What is the most important sentence in this text?",
-        "What questions does this text raise?",
-        "What is the writing style of this text?",
-        "What themes are present in this text?",
-        "What is the purpose of this text?",
-        "What did you learn from this text?",
-        "How would you categorize this text?",
-        "What is the central idea of this text?",
-        "What perspective does this text represent?",
-        "What makes this text compelling or interesting?",
-    ]
-
-    texts = texts * repeat
-    questions = questions * repeat
-
-    random.shuffle(texts)
-    random.shuffle(questions)
-
-    user_messages = []
-    for text, question in zip(texts, questions):
-        user_messages.append(
-            {
-                "role": "user",
-                "content": [{"type": "text", "text": f"{text}\n\n --- \n\n{question}"}],
-            }
-        )
-    return user_messages
-
-
-def wrap_prompt_caching_signature(messages: list[dict]):
-    """
-    For fairness, we use Anthropic's prompt caching to (ideally) speed up inference and save token money.
-
-    Official documentation: https://docs.claude.com/en/docs/build-with-claude/prompt-caching
-    """
-    messages_copy = copy.deepcopy(messages)
-    final_message = messages_copy[-1]
-    final_message_content_dict = final_message["content"][-1]
-    final_message_content_dict["cache_control"] = {"type": "ephemeral"}
-    return messages_copy
-
-
-def run_conversation(
-    client: Anthropic,
-    model_name: str,
-    max_tokens: int,
-    repeat: int,
-    seed: int,
-):
-    """have LLM answer each user message in one multi-turn conversation and record time to completion on each turn"""
-    user_messages = load_user_messages(repeat=repeat, seed=seed)
-
-    # stats storage
-    times_to_completion = []
-    assistant_responses = []
-
-    chat_history = []
-    for i, user_message in enumerate(user_messages):
-        chat_history.append(user_message)
-        start_time = time.time()
-        chat_history_w_prompt_caching = wrap_prompt_caching_signature(chat_history)
+from bench.backends import AnthropicBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.data import load_text_messages
+from bench.engine import conversation_turns
+from bench.live import LiveRun, add_live_arguments
+from bench.metrics import to_frame
+from bench.parallel import add_seed_arguments, run_seeds, seed_path
+from bench.store import DEFAULT_STORE, append_run
 
-        response = client.messages.create(
-            model=model_name,
-            messages=chat_history_w_prompt_caching,
-            max_tokens=max_tokens,
-            temperature=0.0,
-            stream=False,
-        )
-
-        assistant_response = response.content[0].text
-        end_time = time.time() - start_time
-
-        print(f"Turn {i+1} Time to completion: {end_time:.3f}s")
-        print(f"Turn {i+1} Response: {assistant_response}")
-        print()
-
-        times_to_completion.append(end_time)
-        assistant_responses.append(assistant_response)
-        chat_history.append({"role": "assistant", "content": assistant_response})
-
-    return times_to_completion, assistant_responses
+load_dotenv()
 
 
 if __name__ == "__main__":
@@ -123,27 +21,63 @@ if __name__ == "__main__":
     parser.add_argument("--model_name", default="claude-sonnet-4-20250514")
     parser.add_argument("--max_tokens", type=int, default=32)
     parser.add_argument("--data_repeat", type=int, default=3)
-    parser.add_argument("--data_seed", type=int, default=88)
     parser.add_argument(
         "--output_file",
         type=str,
         default="results/claude_sonnet_4_20250514_txt_only_results_run_3.csv",
     )
-    args = parser.parse_args()
-
-    client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-    times_to_completion, responses = run_conversation(
-        client=client,
-        model_name=args.model_name,
-        max_tokens=args.max_tokens,
-        repeat=args.data_repeat,
-        seed=args.data_seed,
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream responses to record time to first token and inter-token latencies",
+    )
+    parser.add_argument(
+        "--store", default=DEFAULT_STORE, help="Parquet dataset the run is also appended to"
     )
+    add_live_arguments(parser)
+    add_seed_arguments(parser, 88)
+    add_client_arguments(parser)
+    args = parser.parse_args()
 
-    df = pd.DataFrame(
-        {
-            "times_to_completion": times_to_completion,
-            "assistant_responses": responses,
-        }
+    # one backend per seed: its traced client times one conversation's requests
+    backends = {
+        seed: AnthropicBackend(
+            args.model_name,
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            stream=args.stream,
+            client_config=ClientConfig.from_args(args),
+        )
+        for seed in args.seeds
+    }
+    for backend in backends.values():
+        warm_up(backend, args.warmup)  # each has its own connection pool
+    live = LiveRun.from_args(args)
+    runs = run_seeds(
+        lambda seed, done: conversation_turns(
+            backends[seed],
+            load_text_messages(repeat=args.data_repeat, seed=seed),
+            max_tokens=args.max_tokens,
+            verbose=len(args.seeds) == 1 and not args.dashboard,
+            resume=done,
+        ),
+        args.seeds,
+        args.schedule,
+        args.parallel_seeds,
+        warmup_turns=args.warmup_turns,
+        live=live,
     )
-    df.to_csv(args.output_file, index=False)
+    live.finish()  # exits after an abort, the turns stay in the sink
+
+    for seed, turns in runs.items():
+        df = to_frame(turns)
+        df.to_csv(seed_path(args.output_file, seed, args.seeds), index=False)
+        append_run(
+            df,
+            model=args.model_name,
+            seed=seed,
+            config={"backend": "anthropic", "strategy": "full", "data": "text"},
+            root=args.store,
+            max_tokens=args.max_tokens,
+            data_repeat=args.data_repeat,
+            stream=args.stream,
+        )
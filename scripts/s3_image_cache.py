@@ -1,114 +1,15 @@
-import time
-import base64
-import glob
-import random
 import argparse
-import uuid
-from openai import OpenAI
-import pandas as pd
 
-
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
-
-def load_user_messages(repeat=3, seed=1337):
-    """Returns a random list of user questions about some 720p images"""
-    random.seed(seed)
-    img_paths = sorted(glob.glob("data/test-img-*.jpg"))
-    questions = [
-        "What do you see in this image?",
-        "Describe the content of this image concisely.",
-        "What's in the image?",
-        "Where is this image taken?",
-        "Summarize the content of this image in one sentence.",
-        "What's the main subject of this image?",
-        "What's the background of this image?",
-        "What's the color of the background?",
-        "What's the texture of the background?",
-        "How many objects can you count in this image?",
-        "What emotions or mood does this image convey?",
-        "What time of day do you think this photo was taken?",
-        "Are there any people visible in this image?",
-        "What style or genre would you classify this image as?",
-        "What details can you notice about the lighting?",
-        "What is the meaning of this image?",
-        "How would you name this image?",
-        "What do you find most interesting about this image?",
-        "What is the message of this image?",
-        "What is the moral of this image?",
-        "What did you learn from this image about B2B SaaS?",
-    ]
-
-    img_paths = img_paths * repeat
-    questions = questions * repeat
-
-    random.shuffle(img_paths)
-    random.shuffle(questions)
-
-    user_messages = []
-    for image, question in zip(img_paths, questions):
-        img_b64 = encode_image(image)
-        img_url = f"data:image/jpeg;base64,{img_b64}"
-        uuid_str = str(uuid.uuid4())
-        user_messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": img_url},
-                        "uuid": uuid_str,
-                    },
-                    {"type": "text", "text": question},
-                ],
-            }
-        )
-    return user_messages
-
-
-def run_conversation(
-    client: OpenAI,
-    model_name: str,
-    max_tokens: int,
-    repeat: int,
-    seed: int,
-):
-    """have LLM answer each user message in one multi-turn conversation and record time to first token total time to completion on each turn"""
-    user_messages = load_user_messages(repeat=repeat, seed=seed)
-
-    # stats storage
-    times_to_completion = []
-    assistant_responses = []
-
-    chat_history = []
-    for i, user_message in enumerate(user_messages):
-        chat_history.append(user_message)
-        start_time = time.time()
-        response = client.chat.completions.create(
-            messages=chat_history,
-            model=model_name,
-            max_tokens=max_tokens,
-            temperature=0.0,
-            stream=False,
-        )
-        assistant_response = response.choices[0].message.content
-        end_time = time.time() - start_time
-
-        print(f"Turn {i+1} Time to completion: {end_time:.3f}s")
-        print(f"Turn {i+1} Response: {assistant_response}")
-        print()
-
-        times_to_completion.append(end_time)
-        assistant_responses.append(assistant_response)
-        
-        # For subsequent turns, set image url to None to trigger cache hit
-        chat_history[-1]["content"][0]["image_url"]["url"] = ""
-
-        chat_history.append({"role": "assistant", "content": assistant_response})
-
-    return times_to_completion, assistant_responses
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.data import load_image_messages
+from bench.engine import conversation_turns
+from bench.history import ImageUUIDCached
+from bench.live import LiveRun, add_live_arguments
+from bench.metrics import to_frame
+from bench.parallel import add_seed_arguments, run_seeds, seed_path
+from bench.server_metrics import MetricsScraper, ScrapedBackend, metrics_url
+from bench.store import DEFAULT_STORE, append_run
 
 
 if __name__ == "__main__":
@@ -119,27 +20,75 @@ if __name__ == "__main__":
     parser.add_argument("--base_url", default="http://192.222.53.119:443/v1")
     parser.add_argument("--max_tokens", type=int, default=32)
     parser.add_argument("--data_repeat", type=int, default=3)
-    parser.add_argument("--data_seed", type=int, default=1337)
     parser.add_argument(
         "--output_file",
         type=str,
         default="results/32B_w_image_cache_run_1.csv",
     )
-    args = parser.parse_args()
-
-    client = OpenAI(base_url=args.base_url, api_key="EMPTY")
-    times_to_completion, responses = run_conversation(
-        client=client,
-        model_name=args.model_name,
-        max_tokens=args.max_tokens,
-        repeat=args.data_repeat,
-        seed=args.data_seed,
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream responses to record time to first token and inter-token latencies",
     )
-
-    df = pd.DataFrame(
-        {
-            "times_to_completion": times_to_completion,
-            "assistant_responses": responses,
-        }
+    parser.add_argument(
+        "--scrape_metrics",
+        action="store_true",
+        help="scrape the server's Prometheus /metrics around every turn (prefix cache, queue, prefill, decode)",
     )
-    df.to_csv(args.output_file, index=False)
\ No newline at end of file
+    parser.add_argument(
+        "--store", default=DEFAULT_STORE, help="Parquet dataset the run is also appended to"
+    )
+    add_live_arguments(parser)
+    add_seed_arguments(parser, 1337)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    if args.scrape_metrics and len(args.seeds) > 1 and args.schedule != "serial" and args.parallel_seeds != 1:
+        # counters scraped around a turn would also count the other seeds' turns
+        parser.error("--scrape_metrics needs one turn at a time: --schedule serial or --parallel_seeds 1")
+
+    # one backend per seed, its request builder follows one conversation; they share a pool
+    backends = {
+        seed: OpenAIBackend(
+            args.model_name,
+            base_url=args.base_url,
+            stream=args.stream,
+            client_config=ClientConfig.from_args(args),
+        )
+        for seed in args.seeds
+    }
+    warm_up(backends[args.seeds[0]], args.warmup)
+    if args.scrape_metrics:
+        scraper = MetricsScraper(metrics_url(args.base_url), args.model_name)
+        backends = {seed: ScrapedBackend(backend, scraper) for seed, backend in backends.items()}
+    live = LiveRun.from_args(args)
+    runs = run_seeds(
+        lambda seed, done: conversation_turns(
+            backends[seed],
+            load_image_messages(repeat=args.data_repeat, seed=seed),
+            max_tokens=args.max_tokens,
+            # image urls are blanked after their first turn, served by uuid from vLLM's cache
+            strategy=ImageUUIDCached(),
+            verbose=len(args.seeds) == 1 and not args.dashboard,
+            resume=done,
+        ),
+        args.seeds,
+        args.schedule,
+        args.parallel_seeds,
+        warmup_turns=args.warmup_turns,
+        live=live,
+    )
+    live.finish()  # exits after an abort, the turns stay in the sink
+
+    for seed, turns in runs.items():
+        df = to_frame(turns)
+        df.to_csv(seed_path(args.output_file, seed, args.seeds), index=False)
+        append_run(
+            df,
+            model=args.model_name,
+            seed=seed,
+            config={"backend": "openai", "strategy": "image_uuid_cached", "data": "image"},
+            root=args.store,
+            max_tokens=args.max_tokens,
+            data_repeat=args.data_repeat,
+            stream=args.stream,
+        )
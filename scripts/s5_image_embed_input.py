@@ -1,63 +1,117 @@
-from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor
-from PIL import Image
-
-# default: Load the model on the available device(s)
-model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-    "Qwen/Qwen2.5-VL-32B-Instruct", torch_dtype="auto", device_map="auto"
-)
-
-# We recommend enabling flash_attention_2 for better acceleration and memory saving, especially in multi-image and video scenarios.
-# model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-#     "Qwen/Qwen2.5-VL-32B-Instruct",
-#     torch_dtype=torch.bfloat16,
-#     attn_implementation="flash_attention_2",
-#     device_map="auto",
-# )
-
-# default processer
-processor = AutoProcessor.from_pretrained("Qwen/Qwen2.5-VL-32B-Instruct")
-
-# The default range for the number of visual tokens per image in the model is 4-16384.
-# You can set min_pixels and max_pixels according to your needs, such as a token range of 256-1280, to balance performance and cost.
-# min_pixels = 256*28*28
-# max_pixels = 1280*28*28
-# processor = AutoProcessor.from_pretrained("Qwen/Qwen2.5-VL-32B-Instruct", min_pixels=min_pixels, max_pixels=max_pixels)
-
-messages = [
-    {
-        "role": "user",
-        "content": [
-            {
-                "type": "image",
-                "image": "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen-VL/assets/demo.jpeg",
-            },
-            {"type": "text", "text": "Describe this image."},
-        ],
-    }
-]
-
-# Preparation for inference
-text = processor.apply_chat_template(
-    messages, tokenize=False, add_generation_prompt=True
-)
-
-image = Image.open("data/test-img-1.jpg")
-
-# image_inputs, video_inputs = process_vision_info(messages)
-inputs = processor(
-    text=[text],
-    images=[image],
-    padding=True,
-    return_tensors="pt",
-)
-inputs = inputs.to("cuda")
-
-# Inference: Generation of the output
-generated_ids = model.generate(**inputs, max_new_tokens=128)
-generated_ids_trimmed = [
-    out_ids[len(in_ids) :] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-]
-output_text = processor.batch_decode(
-    generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
-)
-print(output_text)
+import argparse
+import time
+
+import pandas as pd
+
+from bench.backends import HFBackend, VLLMBackend
+from bench.clients import warm_up
+from bench.datasets import make_dataset
+from bench.embeddings import EmbeddingStore, precompute, processor_kwargs, unique_image_urls
+from bench.engine import run_conversation
+from bench.history import make_strategy
+from bench.image_cache import DEFAULT_CACHE_DIR
+from bench.metrics import to_frame
+from bench.store import DEFAULT_STORE, append_run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the vision tower once per unique image, store the embeddings, and compare "
+        "turns fed precomputed embeddings against turns fed pixels."
+    )
+    parser.add_argument(
+        "--model_name",
+        default="Qwen/Qwen2.5-VL-7B-Instruct",
+        help="a Qwen2-VL family model; a tiny random one runs on CPU for testing",
+    )
+    parser.add_argument(
+        "--dataset",
+        default="image",
+        help="image, dir:PATH, synthetic[:key=value...] or trace:FILE, see bench/datasets.py",
+    )
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1337])
+    parser.add_argument(
+        "--max_pixels", type=int, default=None, help="processor pixel limit, part of the store key"
+    )
+    parser.add_argument("--batch_size", type=int, default=8, help="images per vision tower call")
+    parser.add_argument("--device", default="auto", help="device_map of the HF model, e.g. cpu")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--compare",
+        choices=["none", "hf", "vllm"],
+        default="hf",
+        help="backend to benchmark pixels vs embeddings on after precomputing",
+    )
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument("--strategy", default="full", help="history strategy, e.g. full or image_window:3")
+    parser.add_argument("--output_file", type=str, default="results/image_embeds.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.dataset, repeat=args.data_repeat)
+    embeddings = EmbeddingStore(args.model_name, args.max_pixels, args.cache_dir)
+
+    if args.compare == "vllm":
+        from transformers import AutoModelForImageTextToText, AutoProcessor
+
+        model = AutoModelForImageTextToText.from_pretrained(
+            args.model_name, torch_dtype="auto", device_map=args.device
+        )
+        processor = AutoProcessor.from_pretrained(args.model_name, **processor_kwargs(embeddings))
+    else:
+        backend = HFBackend(args.model_name, embeddings=embeddings, device_map=args.device)
+        model, processor = backend.model, backend.processor
+
+    urls = unique_image_urls(dataset.messages(seed) for seed in args.seeds)
+    start = time.perf_counter()
+    encoded = precompute(model, processor, embeddings, urls, args.batch_size)
+    print(
+        f"{len(urls)} unique images, {encoded} encoded in {time.perf_counter() - start:.2f}s, "
+        f"the rest already in {embeddings.root}"
+    )
+    if args.compare == "none":
+        raise SystemExit(0)
+
+    if args.compare == "vllm":
+        del model  # the engine needs the memory
+        backend = VLLMBackend(args.model_name, embeddings=embeddings)
+    warm_up(backend)
+
+    frames = []
+    for image_input in ("pixels", "embeds"):
+        # the same backend and processor both times, only the image path changes
+        backend.embeddings = embeddings if image_input == "embeds" else None
+        for seed in args.seeds:
+            turns = run_conversation(
+                backend,
+                dataset.messages(seed),
+                max_tokens=args.max_tokens,
+                strategy=make_strategy(args.strategy),
+                verbose=False,
+            )
+            df = to_frame(turns, image_input=image_input, seed=seed)
+            frames.append(df)
+            append_run(
+                df.drop(columns=["image_input", "seed"]),
+                model=args.model_name,
+                seed=seed,
+                config={
+                    "backend": backend.name,
+                    "strategy": args.strategy,
+                    "data": dataset.label(),
+                    "image_input": image_input,
+                },
+                root=args.store,
+                max_tokens=args.max_tokens,
+                data_repeat=args.data_repeat,
+            )
+
+    df = pd.concat(frames)
+    df.to_csv(args.output_file, index=False)
+    summary = df.groupby("image_input")[
+        ["times_to_completion", "times_to_serialize", "prompt_tokens"]
+    ].mean()
+    print(summary.to_string())
+    pixels, embeds = (summary.loc[name, "times_to_completion"] for name in ("pixels", "embeds"))
+    print(f"embeddings save {pixels - embeds:.3f}s per turn ({(pixels - embeds) / pixels:.1%})")
@@ -0,0 +1,109 @@
+import asyncio
+import argparse
+
+from bench.backends import OpenAIBackend
+from bench.clients import ClientConfig, add_client_arguments, awarm_up
+from bench.datasets import make_dataset
+from bench.history import make_strategy
+from bench.load import run_load, summarize
+from bench.metrics import CSV_COLUMNS
+from bench.routing import POLICIES, RoutedBackend, replica_summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark local model multi-modal inference latency under concurrent conversations."
+    )
+    parser.add_argument("--model_name", default="Qwen/Qwen2.5-VL-7B-Instruct")
+    parser.add_argument("--base_url", default="http://localhost:8000/v1")
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument(
+        "--dataset",
+        default="image",
+        help="image, text, dir:PATH, synthetic[:key=value...] or trace:FILE, see bench/datasets.py",
+    )
+    parser.add_argument(
+        "--data_seed",
+        type=int,
+        default=1337,
+        help="conversation k is built with seed data_seed + k",
+    )
+    parser.add_argument("--num_conversations", type=int, default=16)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="max conversations in flight (default: all at once)",
+    )
+    parser.add_argument(
+        "--arrival_rate",
+        type=float,
+        default=None,
+        help="start conversations as a Poisson process with this many arrivals per second",
+    )
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--strategy", default="full", help="history strategy, e.g. full or image_window:3")
+    parser.add_argument(
+        "--output_file", type=str, default="results/load_test_turns.csv"
+    )
+    parser.add_argument(
+        "--summary_file", type=str, default="results/load_test_summary.csv"
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=None,
+        help="base urls of several replicas to route conversations across, instead of --base_url",
+    )
+    parser.add_argument("--routing", choices=sorted(POLICIES), default="session_affinity")
+    parser.add_argument("--replica_file", type=str, default="results/load_test_replicas.csv")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    client_config = ClientConfig.from_args(args)
+
+    if args.endpoints:
+        backend = RoutedBackend(
+            args.model_name,
+            args.endpoints,
+            policy=args.routing,
+            stream=args.stream,
+            client_config=client_config,
+        )
+    else:
+        backend = OpenAIBackend(
+            args.model_name,
+            base_url=args.base_url,
+            stream=args.stream,
+            client_config=client_config,
+        )
+
+    async def main():
+        await awarm_up(backend, args.warmup)
+        # after the warm-up, whose requests would otherwise count in the replicas' cache hit rates
+        scraped_before = backend.scrape() if args.endpoints else None
+        return scraped_before, await run_load(
+            backend=backend,
+            build_messages=make_dataset(args.dataset, repeat=args.data_repeat),
+            max_tokens=args.max_tokens,
+            num_conversations=args.num_conversations,
+            base_seed=args.data_seed,
+            concurrency=args.concurrency,
+            arrival_rate=args.arrival_rate,
+            strategy_factory=lambda: make_strategy(args.strategy),
+        )
+
+    scraped_before, (df, wall_time) = asyncio.run(main())
+    per_turn, totals = summarize(df, wall_time)
+
+    for key, value in totals.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+    df = df.rename(columns=CSV_COLUMNS)
+    df.to_csv(args.output_file, index=False)
+    per_turn.to_csv(args.summary_file, index=False)
+    if args.endpoints:
+        replicas = replica_summary(df, scraped_before, backend.scrape())
+        print(replicas.to_string(index=False))
+        replicas.to_csv(args.replica_file, index=False)
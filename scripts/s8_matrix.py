@@ -0,0 +1,138 @@
+import os
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+
+from bench.backends import BACKENDS
+from bench.clients import ClientConfig, add_client_arguments, warm_up
+from bench.datasets import make_dataset
+from bench.engine import run_conversation
+from bench.history import STRATEGIES, make_strategy
+from bench.metrics import to_frame
+from bench.server_metrics import MetricsScraper, ScrapedBackend, metrics_url
+from bench.steady import add_steady_arguments, mean_ci, seeds_until_precise, steady_level
+from bench.store import DEFAULT_STORE, append_run
+
+load_dotenv()
+
+
+def make_backend(backend_name, model_name, args):
+    if backend_name == "openai":
+        backend = BACKENDS["openai"](
+            model_name,
+            base_url=args.base_url,
+            stream=args.stream,
+            client_config=ClientConfig.from_args(args),
+        )
+        warm_up(backend, args.warmup)
+        if args.scrape_metrics:
+            scraper = MetricsScraper(metrics_url(args.base_url), model_name)
+            backend = ScrapedBackend(backend, scraper)
+        return backend
+    if backend_name == "anthropic":
+        backend = BACKENDS["anthropic"](
+            model_name,
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            stream=args.stream,
+            client_config=ClientConfig.from_args(args),
+        )
+    else:
+        backend = BACKENDS[backend_name](model_name)
+    warm_up(backend, args.warmup)
+    return backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark a cross product of models x history strategies x seeds in one process."
+    )
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="openai")
+    parser.add_argument("--models", nargs="+", default=["Qwen/Qwen2.5-VL-7B-Instruct"])
+    parser.add_argument("--base_url", default="http://localhost:8000/v1")
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=["full"],
+        help=f"history policies, optionally with arguments, e.g. image_window:3; one of {sorted(STRATEGIES)}",
+    )
+    parser.add_argument(
+        "--seeds",
+        nargs="+",
+        type=int,
+        default=[1337, 66, 88],
+        help="with --ci_target, the first seeds tried; more follow the largest as needed",
+    )
+    parser.add_argument(
+        "--data",
+        default="image",
+        help="image, text, dir:PATH, synthetic[:key=value...] or trace:FILE, see bench/datasets.py",
+    )
+    parser.add_argument("--max_tokens", type=int, default=32)
+    parser.add_argument("--data_repeat", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--scrape_metrics",
+        action="store_true",
+        help="scrape the server's Prometheus /metrics around every turn; openai backend only",
+    )
+    parser.add_argument("--output_file", type=str, default="results/matrix.csv")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    add_client_arguments(parser)
+    add_steady_arguments(parser)
+    args = parser.parse_args()
+
+    # conversations are generated lazily per run, turn by turn
+    dataset = make_dataset(args.data, repeat=args.data_repeat)
+
+    frames = []
+    for model_name in args.models:
+        backend = make_backend(args.backend, model_name, args)
+        for strategy_name in args.strategies:
+            levels = []  # steady-state mean of every run, for --ci_target
+            seeds = seeds_until_precise(
+                args.seeds,
+                levels,
+                target=args.ci_target,
+                min_seeds=args.min_seeds,
+                max_seeds=args.max_seeds,
+                confidence=args.confidence,
+            )
+            for seed in seeds:
+                print(f"=== {model_name} / {strategy_name} / seed {seed}")
+                turns = run_conversation(
+                    backend,
+                    dataset.messages(seed),
+                    max_tokens=args.max_tokens,
+                    strategy=make_strategy(strategy_name),
+                    verbose=False,
+                    warmup_turns=args.warmup_turns,
+                )
+                levels.append(steady_level(turns))
+                df = to_frame(
+                    turns,
+                    backend=args.backend,
+                    model=model_name,
+                    strategy=strategy_name,
+                    seed=seed,
+                )
+                frames.append(df)
+                append_run(
+                    df,
+                    model=model_name,
+                    seed=seed,
+                    config={"backend": args.backend, "strategy": strategy_name, "data": dataset.label()},
+                    root=args.store,
+                    max_tokens=args.max_tokens,
+                    data_repeat=args.data_repeat,
+                    stream=args.stream,
+                )
+                # write after every run so a crash keeps what finished
+                pd.concat(frames).to_csv(args.output_file, index=False)
+                mean, half = mean_ci(levels, args.confidence)
+                spread = f" ± {half:.3f}s" if len(levels) > 1 else ""
+                print(
+                    f"    steady from turn {int(df['warmup'].sum()) + 1}, "
+                    f"{int(df['outlier'].sum())} outliers, "
+                    f"mean {mean:.3f}s{spread} over {len(levels)} seeds"
+                )
+        del backend
@@ -0,0 +1,27 @@
+import json
+import argparse
+
+from bench.store import DEFAULT_STORE
+from bench.sweep import expand_matrix, run_sweep
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a model x quantization x tensor-parallel sweep, restarting the server per configuration."
+    )
+    parser.add_argument("--spec", default="sweeps/qwen2.5_vl.json")
+    parser.add_argument("--results_dir", default="results/sweeps")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument(
+        "--dry_run", action="store_true", help="only list the configurations"
+    )
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    if args.dry_run:
+        for config in expand_matrix(spec):
+            print(config)
+    else:
+        run_sweep(spec, args.results_dir, store=args.store)